@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Frames-per-second benchmark: Wav2Lip ONNX engine vs the heuristic renderer
+
+Usage (from backend/):
+    python -m ai_engine.benchmark face.jpg reply.mp3 --batch-size 32 --threads 4
+"""
+import argparse
+import os
+import time
+
+
+def time_frames(frames):
+    start = time.perf_counter()
+    count = sum(1 for _ in frames)
+    elapsed = time.perf_counter() - start
+    return count, elapsed
+
+
+def main():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    import django
+    django.setup()
+
+    import cv2
+    from django.conf import settings
+    from video_animation.animation_service import AvatarAnimationService
+    from video_animation.audio_asset import AudioAsset
+    from ai_engine.wav2lip_engine import Wav2LipEngine
+    from ai_engine.model_registry import get_model_registry
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('image')
+    parser.add_argument('audio')
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[settings.WAV2LIP_BATCH_SIZE])
+    parser.add_argument('--threads', type=int, nargs='+', default=[settings.WAV2LIP_THREADS])
+    parser.add_argument('--model', default=str(get_model_registry().path('wav2lip_gan_onnx')))
+    args = parser.parse_args()
+
+    service = AvatarAnimationService()
+    image = cv2.resize(cv2.imread(args.image), service.video_resolution)
+    audio = AudioAsset.load(args.audio)
+    audio.mel_windows(service.video_fps)  # features are shared, keep them out of the timing
+    # Detected once per image in production too, so also outside the timing
+    landmarks = service.expressions.get_landmarks(image, args.image)
+
+    count, elapsed = time_frames(
+        service._generate_talking_frames(image, audio, 'neutral', landmarks=landmarks)
+    )
+    print(f"heuristic: {count} frames in {elapsed:.2f}s = {count / elapsed:.1f} fps")
+
+    if not os.path.exists(args.model):
+        print(f"wav2lip: model not found at {args.model}, skipping")
+        return
+
+    for threads in args.threads:
+        for batch_size in args.batch_size:
+            engine = Wav2LipEngine(args.model, batch_size=batch_size, intra_op_threads=threads)
+            face_box = engine.detect_face_box(image)
+            count, elapsed = time_frames(
+                engine.render_frames(image, audio, service.video_fps, face_box=face_box)
+            )
+            print(
+                f"wav2lip batch={batch_size} threads={threads}: "
+                f"{count} frames in {elapsed:.2f}s = {count / elapsed:.1f} fps"
+            )
+
+
+if __name__ == '__main__':
+    main()
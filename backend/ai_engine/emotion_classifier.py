@@ -0,0 +1,135 @@
+"""
+Fast keyword emotion classifier for avatar replies
+
+Per-language lexicons (codes match Avatar.LANGUAGE_CHOICES) are compiled
+into one regular expression per emotion and language, so checking an
+emotion is one scan instead of one substring search per keyword. Emotions
+are checked separately, in priority order: with a single alternation, a
+keyword of one emotion could consume text that overlaps a keyword of
+another and hide it. English is always included because replies are often
+code-mixed.
+
+Matching is by substring, like the original keyword check: Indic words
+inflect by suffix and Python's \\b does not treat combining vowel signs as
+word characters.
+"""
+import re
+from functools import lru_cache
+
+# Checked in this order; the first emotion with any hit wins
+EMOTION_PRIORITY = ['happy', 'sad', 'angry', 'surprised']
+DEFAULT_EMOTION = 'neutral'
+
+LEXICONS = {
+    'en': {
+        'happy': ['happy', 'joy', 'wonderful', 'great', 'love'],
+        'sad': ['sad', 'sorry', 'miss', 'unfortunately'],
+        'angry': ['angry', 'upset', 'frustrated'],
+        'surprised': ['wow', 'amazing', 'really', '!'],
+    },
+    'hi': {
+        'happy': ['खुश', 'आनंद', 'प्यार', 'बढ़िया', 'शानदार', 'khush', 'pyaar', 'pyar'],
+        'sad': ['दुख', 'दुःख', 'उदास', 'माफ', 'याद आ', 'अफ़सोस', 'अफसोस', 'udaas', 'maaf'],
+        'angry': ['गुस्सा', 'नाराज', 'क्रोध', 'gussa', 'naraz'],
+        'surprised': ['वाह', 'सच में', 'कमाल', 'waah', 'sach mein'],
+    },
+    'mr': {
+        'happy': ['आनंद', 'खूश', 'प्रेम', 'छान', 'मस्त'],
+        'sad': ['दुःख', 'दु:ख', 'उदास', 'माफ', 'आठवण'],
+        'angry': ['संताप', 'चिडले', 'रागाव'],
+        'surprised': ['अरे वा', 'खरंच', 'कमाल'],
+    },
+    'bn': {
+        'happy': ['খুশি', 'আনন্দ', 'ভালোবাসা', 'দারুণ'],
+        'sad': ['দুঃখ', 'মন খারাপ', 'মনে পড়'],
+        'angry': ['রাগ', 'বিরক্ত'],
+        'surprised': ['বাহ', 'সত্যি', 'আশ্চর্য'],
+    },
+    'ta': {
+        'happy': ['மகிழ்ச்சி', 'சந்தோஷ', 'அன்பு', 'அருமை'],
+        'sad': ['வருத்த', 'சோக', 'மன்னிக்க', 'நினைவு'],
+        'angry': ['கோப', 'எரிச்சல்'],
+        'surprised': ['ஆஹா', 'அடடா', 'உண்மையா', 'ஆச்சரிய'],
+    },
+    'te': {
+        'happy': ['సంతోష', 'ఆనంద', 'ప్రేమ', 'అద్భుత'],
+        'sad': ['బాధ', 'విచార', 'క్షమించ', 'గుర్తు'],
+        'angry': ['కోప', 'చిరాకు'],
+        'surprised': ['అబ్బా', 'నిజమా', 'ఆశ్చర్య'],
+    },
+    'gu': {
+        'happy': ['ખુશ', 'આનંદ', 'પ્રેમ', 'સરસ'],
+        'sad': ['દુઃખ', 'ઉદાસ', 'માફ', 'યાદ'],
+        'angry': ['ગુસ્સ', 'નારાજ'],
+        'surprised': ['વાહ', 'ખરેખર', 'આશ્ચર્ય'],
+    },
+    'kn': {
+        'happy': ['ಸಂತೋಷ', 'ಖುಷಿ', 'ಪ್ರೀತಿ', 'ಅದ್ಭುತ'],
+        'sad': ['ದುಃಖ', 'ಬೇಸರ', 'ಕ್ಷಮಿಸಿ', 'ನೆನಪು'],
+        'angry': ['ಕೋಪ', 'ಸಿಟ್ಟು'],
+        'surprised': ['ಅಬ್ಬಾ', 'ನಿಜವಾಗ', 'ಆಶ್ಚರ್ಯ'],
+    },
+    'ml': {
+        'happy': ['സന്തോഷ', 'ആനന്ദ', 'സ്നേഹ', 'അടിപൊളി'],
+        'sad': ['ദുഃഖ', 'സങ്കട', 'ക്ഷമിക്ക', 'ഓർമ്മ'],
+        'angry': ['ദേഷ്യ', 'കോപ'],
+        'surprised': ['ശരിക്കും', 'അത്ഭുത', 'അമ്പോ'],
+    },
+    'pa': {
+        'happy': ['ਖੁਸ਼', 'ਖ਼ੁਸ਼', 'ਆਨੰਦ', 'ਪਿਆਰ'],
+        'sad': ['ਦੁੱਖ', 'ਉਦਾਸ', 'ਮਾਫ਼', 'ਯਾਦ'],
+        'angry': ['ਗੁੱਸ', 'ਨਾਰਾਜ਼'],
+        'surprised': ['ਵਾਹ', 'ਸੱਚੀਂ', 'ਹੈਰਾਨ'],
+    },
+}
+
+
+def _compile(languages):
+    keywords = {emotion: set() for emotion in EMOTION_PRIORITY}
+    for language in languages:
+        for emotion, words in LEXICONS.get(language, {}).items():
+            keywords[emotion].update(word.lower() for word in words)
+
+    patterns = []
+    for emotion in EMOTION_PRIORITY:
+        if keywords[emotion]:
+            alternatives = '|'.join(re.escape(word) for word in sorted(keywords[emotion], key=len, reverse=True))
+            patterns.append((emotion, re.compile(alternatives)))
+    return patterns
+
+
+@lru_cache(maxsize=None)
+def get_matcher(language=None):
+    """
+    (emotion, pattern) pairs in priority order for a language (plus
+    English), or for all languages
+    """
+    if language in LEXICONS:
+        return _compile({'en', language})
+    return _compile(LEXICONS.keys())
+
+
+def classify(text, language=None):
+    """
+    Emotion for one text: 'happy', 'sad', 'angry', 'surprised' or 'neutral'
+    """
+    if not text:
+        return DEFAULT_EMOTION
+
+    text = text.lower()
+    for emotion, pattern in get_matcher(language):
+        if pattern.search(text):
+            return emotion
+    return DEFAULT_EMOTION
+
+
+def classify_batch(texts, language=None):
+    """
+    Classify many texts with one shared matcher
+
+    `language` may be a single code for all texts or a list with one code
+    per text.
+    """
+    if isinstance(language, (list, tuple)):
+        return [classify(text, lang) for text, lang in zip(texts, language)]
+    return [classify(text, language) for text in texts]
@@ -0,0 +1,57 @@
+"""
+Gemini client helper shared by chat replies and conversation summaries
+"""
+import os
+
+MODEL_NAMES = [
+    'gemini-1.5-flash',
+    'gemini-1.5-pro-latest',
+    'gemini-pro',
+    'models/gemini-1.5-flash',
+    'models/gemini-pro'
+]
+
+_model = None
+
+
+def get_gemini_model():
+    """
+    Return a working Gemini model, or None if no key / no model is usable
+
+    The first model that answers a quick probe is remembered for the life
+    of the process, so the probe is not repeated on every chat turn.
+    """
+    global _model
+    if _model is not None:
+        return _model
+
+    gemini_key = os.environ.get('GEMINI_API_KEY', '')
+    if not gemini_key:
+        return None
+
+    import google.generativeai as genai
+    genai.configure(api_key=gemini_key)
+
+    for model_name in MODEL_NAMES:
+        try:
+            model = genai.GenerativeModel(model_name)
+            # Quick test
+            model.generate_content("Hi")
+            print(f"Using model: {model_name}")
+            _model = model
+            break
+        except Exception:
+            continue
+
+    return _model
+
+
+def generate_text(prompt):
+    """
+    Run prompt through Gemini and return the reply text, or None
+    """
+    model = get_gemini_model()
+    if model is None:
+        return None
+    response = model.generate_content(prompt)
+    return response.text
@@ -0,0 +1,225 @@
+"""
+Model artifact registry
+
+Knows which model files the renderer needs, where they come from, and
+what their checksums are. Downloaded or copied artifacts must match the
+sha256 pinned in ARTIFACTS (or its `sha256_env` override). An artifact
+with no pin has its digest recorded in `models/manifest.json` by fetch(),
+with a warning to pin it; loading never records anything, so a file that
+did not come through fetch() or the export is refused. The ONNX export
+is recorded only after its source checkpoint has been verified. The
+checksum of the active model is also the renderer version used in render
+cache keys.
+
+The ONNX model is graph-optimized once at export and stored with external
+weight data. Nothing rewrites the weights at load time, so workers map
+the .data file read-only and share its pages (see
+wav2lip_engine.map_external_weights).
+
+This module does not import Django at module level, so download_models.py
+can use it standalone.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import urllib.request
+from pathlib import Path
+
+# sha256 is the pinned digest; sha256_env names an environment variable
+# that overrides it (e.g. for a mirrored or re-exported file). The ONNX
+# model is built locally, so its digest is recorded at export instead.
+ARTIFACTS = {
+    'wav2lip_gan': {
+        'filename': 'wav2lip_gan.pth',
+        'url': 'https://github.com/Rudrabha/Wav2Lip/releases/download/models/wav2lip_gan.pth',
+        'sha256': None,
+        'sha256_env': 'WAV2LIP_GAN_SHA256',
+    },
+    'wav2lip_gan_onnx': {
+        'filename': 'wav2lip_gan.onnx',
+        'data_filename': 'wav2lip_gan.onnx.data',
+        'url': None,  # exported from wav2lip_gan, see export_wav2lip_onnx()
+        'sha256': None,
+        'sha256_env': 'WAV2LIP_GAN_ONNX_SHA256',
+    },
+}
+
+HEURISTIC_RENDERER_VERSION = 'heuristic-1'
+
+
+class ModelIntegrityError(Exception):
+    pass
+
+
+class ModelRegistry:
+    """
+    Locate, fetch, verify and version model artifacts in one directory
+    """
+
+    def __init__(self, models_dir):
+        self.models_dir = Path(models_dir)
+        self.manifest_path = self.models_dir / 'manifest.json'
+        self._verified = {}
+
+    def path(self, name):
+        return self.models_dir / ARTIFACTS[name]['filename']
+
+    def files(self, name):
+        spec = ARTIFACTS[name]
+        names = [spec['filename']] + ([spec['data_filename']] if spec.get('data_filename') else [])
+        return [self.models_dir / filename for filename in names]
+
+    def exists(self, name):
+        return all(path.exists() for path in self.files(name))
+
+    # Manifest
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _record(self, name, checksum):
+        manifest = self.load_manifest()
+        manifest[name] = {
+            'sha256': checksum,
+            'size': sum(path.stat().st_size for path in self.files(name)),
+        }
+        self.models_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _forget(self, name):
+        manifest = self.load_manifest()
+        if manifest.pop(name, None) is not None:
+            with open(self.manifest_path, 'w') as f:
+                json.dump(manifest, f, indent=2, sort_keys=True)
+        self._verified.pop(name, None)
+
+    # Integrity
+
+    def checksum(self, name):
+        """
+        sha256 over all files of an artifact, streamed in 1 MB chunks
+        """
+        digest = hashlib.sha256()
+        for path in self.files(name):
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+        return digest.hexdigest()
+
+    def pinned_checksum(self, name):
+        spec = ARTIFACTS[name]
+        return (os.environ.get(spec['sha256_env'], '') if spec.get('sha256_env') else '').lower() or spec.get('sha256')
+
+    def expected_checksum(self, name):
+        return self.pinned_checksum(name) or self.load_manifest().get(name, {}).get('sha256')
+
+    def verify(self, name):
+        """
+        Check an artifact against its pinned or recorded checksum
+
+        Returns the checksum; raises ModelIntegrityError on mismatch or when
+        no checksum is known, so an unpinned file is never loaded.
+        """
+        if name in self._verified:
+            return self._verified[name]
+        if not self.exists(name):
+            raise ModelIntegrityError(f"{name} is missing from {self.models_dir}")
+
+        expected = self.expected_checksum(name)
+        if not expected:
+            env_var = ARTIFACTS[name].get('sha256_env')
+            raise ModelIntegrityError(f"{name} has no pinned checksum" + (f"; set {env_var}" if env_var else ''))
+        actual = self.checksum(name)
+        if actual != expected:
+            raise ModelIntegrityError(f"{name} checksum mismatch: expected {expected}, got {actual}")
+
+        self._verified[name] = actual
+        return actual
+
+    def version(self, name):
+        return f"{name}@{self.verify(name)[:12]}"
+
+    def renderer_version(self):
+        """
+        Version string of the active renderer, for render cache keys
+        """
+        try:
+            return self.version('wav2lip_gan_onnx')
+        except ModelIntegrityError:
+            return HEURISTIC_RENDERER_VERSION
+
+    # Fetching
+
+    def fetch(self, name, source_dir=None):
+        """
+        Make an artifact available locally and verify it
+
+        With source_dir the files are copied from a local directory and the
+        network is never touched.
+        """
+        if self.exists(name):
+            return self.verify(name)
+
+        spec = ARTIFACTS[name]
+        self.models_dir.mkdir(parents=True, exist_ok=True)
+        for path in self.files(name):
+            tmp_path = path.with_name(path.name + '.part')
+            if source_dir is not None:
+                shutil.copyfile(Path(source_dir) / path.name, tmp_path)
+            elif spec.get('url') and path.name == spec['filename']:
+                urllib.request.urlretrieve(spec['url'], tmp_path)
+            else:
+                raise ModelIntegrityError(f"{name} has no download source for {path.name}")
+            os.replace(tmp_path, path)
+
+        self._verified.pop(name, None)
+        if not self.pinned_checksum(name):
+            checksum = self.checksum(name)
+            self._record(name, checksum)
+            print(f"Warning: {name} has no pinned checksum; recorded sha256 {checksum}. "
+                  f"Pin it in ARTIFACTS or {spec['sha256_env']}.")
+        try:
+            return self.verify(name)
+        except ModelIntegrityError:
+            for path in self.files(name):
+                path.unlink(missing_ok=True)
+            raise
+
+    def export_wav2lip_onnx(self):
+        """
+        Export wav2lip_gan.pth to a pre-optimized ONNX model with external weights
+        """
+        from .wav2lip_engine import export_onnx, optimize_onnx
+
+        self.verify('wav2lip_gan')
+        self._forget('wav2lip_gan_onnx')
+        spec = ARTIFACTS['wav2lip_gan_onnx']
+        with tempfile.TemporaryDirectory(dir=self.models_dir) as work_dir:
+            raw_path = Path(work_dir) / 'raw.onnx'
+            export_onnx(self.path('wav2lip_gan'), raw_path)
+            optimize_onnx(raw_path, Path(work_dir) / spec['filename'], spec['data_filename'])
+            for path in self.files('wav2lip_gan_onnx'):
+                os.replace(Path(work_dir) / path.name, path)
+        # Derived from a verified checkpoint, so its digest can be recorded
+        self._record('wav2lip_gan_onnx', self.checksum('wav2lip_gan_onnx'))
+        return self.verify('wav2lip_gan_onnx')
+
+
+_registry = None
+
+
+def get_model_registry():
+    global _registry
+    if _registry is None:
+        from django.conf import settings
+        _registry = ModelRegistry(settings.MODELS_DIR)
+    return _registry
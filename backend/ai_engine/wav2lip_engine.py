@@ -0,0 +1,231 @@
+"""
+CPU Wav2Lip inference through ONNX Runtime
+
+The face is detected and cropped once per avatar image. Mel windows and
+face crops are fed to the model in batches of `batch_size` frames per
+session.run() call, and each predicted mouth crop is pasted back into a
+copy of the full frame.
+
+Throughput knobs (settings / env):
+- WAV2LIP_BATCH_SIZE: frames per inference call
+- WAV2LIP_THREADS: ONNX Runtime intra-op threads per render
+
+Weights stay in the external .data file written by optimize_onnx. They are
+memory-mapped read-only and fed to the session as graph inputs, so every
+worker reads the same page-cache pages instead of holding its own copy.
+"""
+import os
+import threading
+import cv2
+import numpy as np
+from django.conf import settings
+
+FACE_SIZE = 96
+MEL_STEP = 16
+
+
+class Wav2LipEngine:
+    """
+    Wav2Lip generator running in an ONNX Runtime CPU session
+    """
+
+    def __init__(self, onnx_path, batch_size=None, intra_op_threads=None):
+        import onnxruntime as ort
+
+        self.onnx_path = str(onnx_path)
+        self.batch_size = batch_size or settings.WAV2LIP_BATCH_SIZE
+        threads = intra_op_threads or settings.WAV2LIP_THREADS
+
+        options = ort.SessionOptions()
+        # The model is optimized at export (optimize_onnx); fusing again here
+        # would fold the weights into private per-process copies
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_BASIC
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        # Don't keep a second, repacked copy of the weights per process
+        options.add_session_config_entry('session.disable_prepacking', '1')
+
+        model, self.weights = map_external_weights(self.onnx_path)
+        self.session = ort.InferenceSession(
+            model,
+            sess_options=options,
+            providers=['CPUExecutionProvider']
+        )
+        inputs = [i.name for i in self.session.get_inputs() if i.name not in self.weights]
+        self.mel_input = inputs[0]
+        self.face_input = inputs[1]
+
+    def detect_face_box(self, image):
+        """
+        Face box (top, bottom, left, right) with Wav2Lip's chin padding
+        """
+        try:
+            import face_recognition
+            locations = face_recognition.face_locations(image[:, :, ::-1])
+        except Exception:
+            locations = []
+
+        if locations:
+            top, right, bottom, left = locations[0]
+        else:
+            # No detector / no face: assume a centered portrait
+            h, w = image.shape[:2]
+            top, bottom, left, right = h // 5, h * 9 // 10, w // 5, w * 4 // 5
+
+        h, w = image.shape[:2]
+        return max(0, top), min(h, bottom + 10), max(0, left), min(w, right)
+
+    def prepare_face(self, image, face_box=None):
+        """
+        Crop and normalize the face once; returns (face_box, model face input)
+
+        The model input stacks the crop with its lower half masked (the region
+        to generate) and the unmasked crop as identity reference.
+        """
+        face_box = face_box or self.detect_face_box(image)
+        top, bottom, left, right = face_box
+        crop = cv2.resize(image[top:bottom, left:right], (FACE_SIZE, FACE_SIZE))
+
+        masked = crop.copy()
+        masked[FACE_SIZE // 2:] = 0
+        face_input = np.concatenate([masked, crop], axis=2).astype(np.float32) / 255.0
+        return face_box, face_input.transpose(2, 0, 1)
+
+    def infer(self, mel_batch, face_batch):
+        """
+        Run one batch: mel (B, 80, 16), faces (B, 6, 96, 96) -> BGR uint8 (B, 96, 96, 3)
+        """
+        feeds = dict(self.weights)
+        feeds[self.mel_input] = mel_batch[:, None].astype(np.float32)
+        feeds[self.face_input] = face_batch.astype(np.float32)
+        outputs = self.session.run(None, feeds)[0]
+        return (np.clip(outputs.transpose(0, 2, 3, 1), 0, 1) * 255).astype(np.uint8)
+
+    def render_frames(self, image, audio, fps, face_box=None):
+        """
+        Yield lip-synced frames for a still image and an AudioAsset
+        """
+        face_box, face_input = self.prepare_face(image, face_box)
+        top, bottom, left, right = face_box
+        mel_windows = audio.mel_windows(fps, MEL_STEP)
+
+        for start in range(0, len(mel_windows), self.batch_size):
+            mel_batch = mel_windows[start:start + self.batch_size]
+            face_batch = np.broadcast_to(face_input, (len(mel_batch),) + face_input.shape)
+            for mouth in self.infer(mel_batch, face_batch):
+                frame = image.copy()
+                frame[top:bottom, left:right] = cv2.resize(mouth, (right - left, bottom - top))
+                yield frame
+
+
+def map_external_weights(onnx_path):
+    """
+    Serialized model with its external initializers turned into graph inputs
+
+    Returns (model bytes, {name: ndarray}) where each array is a read-only
+    view into the memory-mapped data file. ONNX Runtime copies initializers
+    it loads from disk into private memory; inputs are read in place.
+    """
+    import onnx
+    from onnx.external_data_helper import ExternalDataInfo, uses_external_data
+
+    model = onnx.load(onnx_path, load_external_data=False)
+    base_dir = os.path.dirname(onnx_path)
+    files = {}
+    weights = {}
+    kept = []
+    for tensor in model.graph.initializer:
+        if not uses_external_data(tensor):
+            kept.append(tensor)
+            continue
+        info = ExternalDataInfo(tensor)
+        if info.location not in files:
+            files[info.location] = np.memmap(os.path.join(base_dir, info.location), dtype=np.uint8, mode='r')
+        dtype = np.dtype(onnx.helper.tensor_dtype_to_np_dtype(tensor.data_type))
+        count = int(np.prod(tensor.dims, dtype=np.int64))
+        weights[tensor.name] = np.frombuffer(
+            files[info.location], dtype=dtype, count=count, offset=info.offset or 0
+        ).reshape(tuple(tensor.dims))
+        model.graph.input.append(
+            onnx.helper.make_tensor_value_info(tensor.name, tensor.data_type, list(tensor.dims))
+        )
+    del model.graph.initializer[:]
+    model.graph.initializer.extend(kept)
+    return model.SerializeToString(), weights
+
+
+def export_onnx(checkpoint_path, onnx_path):
+    """
+    Export a Wav2Lip .pth checkpoint to ONNX
+
+    Needs torch and the Wav2Lip model definition (`models.Wav2Lip` from the
+    Wav2Lip repository) importable; only run once at build time.
+    """
+    import torch
+    from models import Wav2Lip
+
+    model = Wav2Lip()
+    checkpoint = torch.load(checkpoint_path, map_location='cpu')
+    state = checkpoint.get('state_dict', checkpoint)
+    model.load_state_dict({key.replace('module.', ''): value for key, value in state.items()})
+    model.eval()
+
+    torch.onnx.export(
+        model,
+        (torch.zeros(1, 1, 80, MEL_STEP), torch.zeros(1, 6, FACE_SIZE, FACE_SIZE)),
+        str(onnx_path),
+        input_names=['mel', 'face'],
+        output_names=['mouth'],
+        dynamic_axes={'mel': {0: 'batch'}, 'face': {0: 'batch'}, 'mouth': {0: 'batch'}},
+        opset_version=13
+    )
+    return str(onnx_path)
+
+
+def optimize_onnx(source_path, onnx_path, data_filename):
+    """
+    Write a graph-optimized copy of source_path with external weights
+
+    Fusions (Conv+BatchNorm etc.) are applied once here so workers load
+    the final weights as-is. EXTENDED, not ALL: ALL adds layout transforms
+    tied to the CPU the export ran on.
+    """
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    options.optimized_model_filepath = str(onnx_path)
+    options.add_session_config_entry('session.optimized_model_external_initializers_file_name', data_filename)
+    options.add_session_config_entry('session.optimized_model_external_initializers_min_size_in_bytes', '1024')
+    ort.InferenceSession(str(source_path), sess_options=options, providers=['CPUExecutionProvider'])
+    return str(onnx_path)
+
+
+# Set to _FAILED when loading raised, so a broken model is verified and
+# reported once per process instead of on every render
+_FAILED = object()
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_wav2lip_engine():
+    """
+    Shared engine, or None if the ONNX model or onnxruntime is unavailable
+    """
+    global _engine
+    if _engine is None:
+        from .model_registry import get_model_registry
+
+        registry = get_model_registry()
+        if not registry.exists('wav2lip_gan_onnx'):
+            return None
+        with _engine_lock:
+            if _engine is None:
+                try:
+                    registry.verify('wav2lip_gan_onnx')
+                    _engine = Wav2LipEngine(registry.path('wav2lip_gan_onnx'))
+                except Exception as e:
+                    print(f"Could not load Wav2Lip engine: {e}")
+                    _engine = _FAILED
+    return None if _engine is _FAILED else _engine
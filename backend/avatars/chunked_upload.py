@@ -0,0 +1,221 @@
+"""
+Resumable chunked uploads
+
+Protocol (per avatar):
+1. POST   uploads/                      start: kind, filename, size, sha256
+2. PUT    uploads/<id>/                 raw bytes at `Upload-Offset`
+   GET    uploads/<id>/                 current offset, to resume
+3. POST   uploads/<id>/complete/        verify checksum, attach file
+
+Chunks are streamed from the request straight into a partial file, never
+held in memory as a whole. No row lock or transaction is held while the
+body streams: a write claims the session ('writing') in a short locked
+update and commits the new size with a conditional update afterwards.
+"""
+import hashlib
+import os
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.core.files import File
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from .models import AvatarImage, AvatarVoice, UploadSession
+
+COPY_BUFFER = 64 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def partial_path(session):
+    directory = Path(settings.MEDIA_ROOT) / 'uploads' / 'partial'
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / f"{session.id}.part"
+
+
+def start_upload(avatar, kind, filename, total_size, sha256):
+    if total_size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+        raise UploadError("File is too large", status_code=413)
+    session = UploadSession.objects.create(
+        avatar=avatar,
+        kind=kind,
+        filename=os.path.basename(filename),
+        total_size=total_size,
+        sha256=sha256.lower()
+    )
+    partial_path(session).touch()
+    return session
+
+
+def _claim(session):
+    """
+    Lock the session row for the current transaction
+
+    A second writer for the same upload gets a 409 instead of waiting, so
+    two PUTs can never write the partial file at the same time.
+    """
+    try:
+        return UploadSession.objects.select_for_update(nowait=True).get(pk=session.pk)
+    except DatabaseError:
+        raise UploadError("Concurrent write to the same upload", status_code=409)
+
+
+def _claim_write(session, offset, length):
+    """
+    Move an open session to 'writing' for one chunk at offset
+
+    Returns the claim's updated_at, which the write must still see when it
+    commits. A claim older than CHUNKED_UPLOAD_WRITE_TIMEOUT belongs to a
+    dead request and may be taken over.
+    """
+    with transaction.atomic():
+        claimed = _claim(session)
+        session.status = claimed.status
+        session.received_size = claimed.received_size
+        if session.status == 'writing':
+            stale = timezone.now() - timedelta(seconds=settings.CHUNKED_UPLOAD_WRITE_TIMEOUT)
+            if claimed.updated_at > stale:
+                raise UploadError("Concurrent write to the same upload", status_code=409)
+        elif session.status != 'open':
+            raise UploadError("Upload is not open", status_code=409)
+        if offset != session.received_size:
+            raise UploadError(f"Expected offset {session.received_size}", status_code=409)
+        if length is not None and length > session.total_size - offset:
+            raise UploadError("Chunk runs past the declared size", status_code=413)
+
+        session.status = 'writing'
+        session.save(update_fields=['status', 'updated_at'])
+        return session.updated_at
+
+
+def _release_write(session, offset, claimed_at, received_size=None, status='open'):
+    """
+    End a write claim; False if another request has taken the session over
+    """
+    updated = UploadSession.objects.filter(
+        pk=session.pk, status='writing', received_size=offset, updated_at=claimed_at
+    ).update(
+        status=status,
+        received_size=offset if received_size is None else received_size,
+        updated_at=timezone.now()
+    )
+    if updated:
+        session.status = status
+        session.received_size = offset if received_size is None else received_size
+    return bool(updated)
+
+
+def write_chunk(session, stream, offset, length=None):
+    """
+    Append bytes from stream at offset; returns the new received size
+
+    The offset must equal what the server already has, so a client that
+    lost a response resumes by asking for the offset first.
+    """
+    claimed_at = _claim_write(session, offset, length)
+    to_read = session.total_size - offset if length is None else length
+
+    written = 0
+    try:
+        with open(partial_path(session), 'r+b') as f:
+            f.seek(offset)
+            f.truncate()
+            while written < to_read:
+                data = stream.read(min(COPY_BUFFER, to_read - written))
+                if not data:
+                    break
+                f.write(data)
+                written += len(data)
+            if length is None and stream.read(1):
+                f.truncate(offset)
+                written = 0
+                raise UploadError("Chunk runs past the declared size", status_code=413)
+    except FileNotFoundError:
+        # Expired and collected, or removed under us: the client must restart
+        _release_write(session, offset, claimed_at, status='failed')
+        raise UploadError("Upload data is gone", status_code=410)
+    except BaseException:
+        _release_write(session, offset, claimed_at)
+        raise
+
+    if not _release_write(session, offset, claimed_at, received_size=offset + written):
+        raise UploadError("Concurrent write to the same upload", status_code=409)
+    return session.received_size
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _fail(session, path):
+    session.status = 'failed'
+    session.save(update_fields=['status', 'updated_at'])
+    path.unlink(missing_ok=True)
+
+
+def complete_upload(session):
+    """
+    Verify the assembled file and attach it as an AvatarImage / AvatarVoice
+
+    The row is claimed and moved to 'completing' before the file is read,
+    so a repeated or concurrent complete gets a 409 instead of attaching
+    the file twice.
+    """
+    with transaction.atomic():
+        claimed = _claim(session)
+        session.status = claimed.status
+        session.received_size = claimed.received_size
+        if session.status != 'open':
+            raise UploadError("Upload is not open", status_code=409)
+        if session.received_size != session.total_size:
+            raise UploadError(f"Upload incomplete: {session.received_size}/{session.total_size} bytes")
+        session.status = 'completing'
+        session.save(update_fields=['status', 'updated_at'])
+
+    path = partial_path(session)
+    try:
+        if file_sha256(path) != session.sha256:
+            _fail(session, path)
+            raise UploadError("Checksum mismatch")
+
+        if session.kind == 'image':
+            try:
+                from PIL import Image
+                with Image.open(path) as image:
+                    image.verify()
+            except Exception:
+                _fail(session, path)
+                raise UploadError("Not a valid image")
+
+        with transaction.atomic():
+            if session.kind == 'image':
+                target = AvatarImage(avatar=session.avatar)
+                field = target.image
+            else:
+                target = AvatarVoice(avatar=session.avatar)
+                field = target.audio_file
+            with open(path, 'rb') as f:
+                field.save(session.filename, File(f), save=True)
+            session.status = 'complete'
+            session.save(update_fields=['status', 'updated_at'])
+    except FileNotFoundError:
+        _fail(session, path)
+        raise UploadError("Upload data is gone", status_code=410)
+    except UploadError:
+        raise
+    except Exception:
+        # Leave it resumable: the client may retry the complete
+        session.status = 'open'
+        session.save(update_fields=['status', 'updated_at'])
+        raise
+
+    path.unlink(missing_ok=True)
+    return target
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.9 on 2026-10-19 12:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('avatars', '0002_avatar_language'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='avatar',
+            name='voice_embedding',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='avatarvoice',
+            name='embedding',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='avatarvoice',
+            name='processed_audio',
+            field=models.FileField(blank=True, null=True, upload_to='avatars/voices/processed/'),
+        ),
+    ]
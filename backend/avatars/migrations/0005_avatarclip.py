@@ -0,0 +1,28 @@
+# Generated by Django 4.2.9 on 2026-10-19 12:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('avatars', '0004_uploadsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvatarClip',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('idle', 'Idle loop'), ('batch', 'Batch render')], max_length=10)),
+                ('emotion', models.CharField(blank=True, max_length=20)),
+                ('quality', models.CharField(blank=True, max_length=10)),
+                ('text', models.TextField(blank=True)),
+                ('video_file', models.FileField(max_length=255, upload_to='generated_videos/')),
+                ('audio_file', models.FileField(blank=True, null=True, upload_to='audio/responses/')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('avatar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='clips', to='avatars.avatar')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.9 on 2026-10-19 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('avatars', '0005_avatarclip'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='status',
+            field=models.CharField(choices=[('open', 'Open'), ('completing', 'Completing'), ('complete', 'Complete'), ('failed', 'Failed')], default='open', max_length=10),
+        ),
+    ]
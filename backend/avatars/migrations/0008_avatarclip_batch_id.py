@@ -0,0 +1,18 @@
+# Generated by Django 4.2.9 on 2026-10-19 13:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('avatars', '0007_uploadsession_writing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='avatarclip',
+            name='batch_id',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
@@ -1,3 +1,4 @@
+import uuid
 from django.db import models
 from django.contrib.auth import get_user_model
 
@@ -38,6 +39,7 @@ class Avatar(models.Model):
     language = models.CharField(max_length=10, choices=LANGUAGE_CHOICES, default='en')  
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='creating')
     personality_traits = models.JSONField(default=dict, blank=True)
+    voice_embedding = models.BinaryField(null=True, blank=True)  # float32 speaker embedding
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -61,8 +63,68 @@ class AvatarImage(models.Model):
 class AvatarVoice(models.Model):
     avatar = models.ForeignKey(Avatar, on_delete=models.CASCADE, related_name='voices')
     audio_file = models.FileField(upload_to='avatars/voices/')
+    processed_audio = models.FileField(upload_to='avatars/voices/processed/', blank=True, null=True)  # 16 kHz mono PCM
     duration = models.FloatField(default=0)
+    embedding = models.BinaryField(null=True, blank=True)  # float32 speaker embedding
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Voice for {self.avatar.name}"
+
+
+class UploadSession(models.Model):
+    """Resumable chunked upload of an avatar image or voice sample"""
+    KIND_CHOICES = [
+        ('image', 'Image'),
+        ('voice', 'Voice'),
+    ]
+
+    STATUS_CHOICES = [
+        ('open', 'Open'),
+        ('writing', 'Writing'),
+        ('completing', 'Completing'),
+        ('complete', 'Complete'),
+        ('failed', 'Failed'),
+    ]
+    # Sessions whose partial file is still needed
+    ACTIVE_STATUSES = ('open', 'writing', 'completing')
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    avatar = models.ForeignKey(Avatar, on_delete=models.CASCADE, related_name='upload_sessions')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    filename = models.CharField(max_length=255)
+    total_size = models.PositiveBigIntegerField()
+    received_size = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='open')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.kind} upload for {self.avatar.name} ({self.received_size}/{self.total_size})"
+
+
+class AvatarClip(models.Model):
+    """
+    Pre-rendered clip kept for an avatar: idle loops and batch renders
+
+    The row is what keeps the files alive for the media GC; deleting it
+    (or the avatar) lets them be collected.
+    """
+    KIND_CHOICES = [
+        ('idle', 'Idle loop'),
+        ('batch', 'Batch render'),
+    ]
+
+    avatar = models.ForeignKey(Avatar, on_delete=models.CASCADE, related_name='clips')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    emotion = models.CharField(max_length=20, blank=True)
+    quality = models.CharField(max_length=10, blank=True)
+    text = models.TextField(blank=True)
+    batch_id = models.CharField(max_length=32, blank=True)  # render batch that made it
+    video_file = models.FileField(upload_to='generated_videos/', max_length=255)
+    audio_file = models.FileField(upload_to='audio/responses/', blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.kind} clip for {self.avatar.name}"
@@ -0,0 +1,67 @@
+"""
+Compiled avatar persona prompts
+
+The system prompt and the avatar fields a chat turn needs are cached per
+avatar version, so a turn does no repeated prompt building. Entries are
+dropped when the avatar is saved or deleted.
+"""
+from core.cache import get_cache
+
+PERSONA_CACHE_TIMEOUT = 86400
+
+
+def persona_cache_key(avatar_id):
+    return f"avatar_persona_{avatar_id}"
+
+
+def avatar_version(avatar):
+    return avatar.updated_at.isoformat() if avatar.updated_at else ''
+
+
+def build_persona_prompt(avatar):
+    """
+    Compile the system prompt for an avatar
+    """
+    prompt = f"""You are {avatar.name}, a {avatar.relationship or 'person'}.
+{avatar.description or ''}"""
+
+    traits = avatar.personality_traits or {}
+    if isinstance(traits, dict):
+        trait_lines = [f"- {key}: {value}" for key, value in traits.items() if value not in (None, '')]
+    elif isinstance(traits, (list, tuple)):
+        trait_lines = [f"- {trait}" for trait in traits if trait]
+    else:
+        trait_lines = []
+    if trait_lines:
+        prompt += "\nPersonality:\n" + "\n".join(trait_lines)
+
+    return prompt.strip()
+
+
+def get_persona(avatar):
+    """
+    Return cached persona data for avatar, rebuilding it if stale
+
+    Returns a dict with the compiled prompt and the avatar metadata used by
+    the chat pipeline.
+    """
+    key = persona_cache_key(avatar.pk)
+    version = avatar_version(avatar)
+
+    persona = get_cache('persona').get(key)
+    if persona and persona.get('version') == version:
+        return persona
+
+    persona = {
+        'version': version,
+        'avatar_id': avatar.pk,
+        'name': avatar.name,
+        'language': avatar.language,
+        'prompt': build_persona_prompt(avatar),
+    }
+    get_cache('persona').set(key, persona, timeout=PERSONA_CACHE_TIMEOUT)
+    return persona
+
+
+def invalidate_persona(avatar_id):
+    get_cache('persona').delete(persona_cache_key(avatar_id))
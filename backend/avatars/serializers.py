@@ -1,20 +1,23 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Avatar, AvatarImage, AvatarVoice
+from core.serializers import FastReadMixin
+from video_animation.quality import TIERS_BY_NAME
+from .models import Avatar, AvatarImage, AvatarVoice, UploadSession
 
 
-class AvatarImageSerializer(serializers.ModelSerializer):
+class AvatarImageSerializer(FastReadMixin, serializers.ModelSerializer):
     class Meta:
         model = AvatarImage
         fields = ['id', 'image', 'is_primary', 'uploaded_at']
 
 
-class AvatarVoiceSerializer(serializers.ModelSerializer):
+class AvatarVoiceSerializer(FastReadMixin, serializers.ModelSerializer):
     class Meta:
         model = AvatarVoice
         fields = ['id', 'audio_file', 'duration', 'uploaded_at']
 
 
-class AvatarSerializer(serializers.ModelSerializer):
+class AvatarSerializer(FastReadMixin, serializers.ModelSerializer):
     images = AvatarImageSerializer(many=True, read_only=True)
     voices = AvatarVoiceSerializer(many=True, read_only=True)
 
@@ -30,3 +33,33 @@ class AvatarSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'kind', 'filename', 'total_size', 'received_size', 'status', 'created_at']
+        read_only_fields = fields
+
+
+class UploadStartSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=UploadSession.KIND_CHOICES)
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$')
+
+
+class RenderBatchSerializer(serializers.Serializer):
+    texts = serializers.ListField(child=serializers.CharField(max_length=2000), required=False, default=list)
+    # Render the avatar's existing replies again (e.g. after a new photo)
+    rerender = serializers.BooleanField(default=False)
+    quality = serializers.ChoiceField(choices=list(TIERS_BY_NAME), required=False, allow_null=True)
+
+    def validate(self, attrs):
+        if not attrs['texts'] and not attrs['rerender']:
+            raise serializers.ValidationError("Give texts to speak or set rerender")
+        if len(attrs['texts']) > settings.RENDER_BATCH_MAX_CLIPS:
+            raise serializers.ValidationError(
+                {'texts': f"At most {settings.RENDER_BATCH_MAX_CLIPS} clips per batch"}
+            )
+        return attrs
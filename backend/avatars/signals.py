@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Avatar, AvatarVoice
+from .persona import invalidate_persona
+
+
+@receiver(post_save, sender=Avatar)
+@receiver(post_delete, sender=Avatar)
+def drop_cached_persona(sender, instance, **kwargs):
+    invalidate_persona(instance.pk)
+
+
+@receiver(post_delete, sender=AvatarVoice)
+def refresh_voice_embedding(sender, instance, **kwargs):
+    from .voice_processing import update_avatar_embedding
+    update_avatar_embedding(instance.avatar_id)
@@ -0,0 +1,260 @@
+import hashlib
+import io
+import uuid
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from core import throttling
+from video_animation import animation_service
+from video_animation.batch import create_batch
+from video_animation.quality import get_tier
+from .chunked_upload import partial_path
+from .models import Avatar, AvatarClip, AvatarImage, UploadSession
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), (200, 120, 80)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class ChunkedUploadTests(TestCase):
+
+    def setUp(self):
+        throttling._buckets = None
+        self.user = get_user_model().objects.create_user('uploader', 'uploader@example.com', 'pw')
+        self.avatar = Avatar.objects.create(user=self.user, name='Ma')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.body = png_bytes()
+
+    def url(self, upload_id=None, suffix=''):
+        base = f'/api/avatars/{self.avatar.pk}/uploads/'
+        return f'{base}{upload_id}/{suffix}' if upload_id else base
+
+    def start(self, body=None, sha256=None):
+        body = self.body if body is None else body
+        response = self.client.post(self.url(), {
+            'kind': 'image',
+            'filename': 'face.png',
+            'size': len(body),
+            'sha256': sha256 or hashlib.sha256(body).hexdigest(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def put(self, upload_id, data, offset):
+        return self.client.generic(
+            'PUT', self.url(upload_id), data,
+            content_type='application/octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_upload_in_chunks_and_complete(self):
+        upload_id = self.start()
+        half = len(self.body) // 2
+
+        response = self.put(upload_id, self.body[:half], 0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['received_size'], half)
+
+        # A client resuming asks for the offset first
+        self.assertEqual(self.client.get(self.url(upload_id)).data['received_size'], half)
+
+        response = self.put(upload_id, self.body[half:], half)
+        self.assertEqual(response.data['received_size'], len(self.body))
+
+        response = self.client.post(self.url(upload_id, 'complete/'))
+        self.assertEqual(response.status_code, 201)
+        image = AvatarImage.objects.get(avatar=self.avatar)
+        with image.image.open('rb') as f:
+            self.assertEqual(f.read(), self.body)
+        self.assertEqual(UploadSession.objects.get(pk=upload_id).status, 'complete')
+        self.assertFalse(partial_path(UploadSession.objects.get(pk=upload_id)).exists())
+
+    def test_wrong_offset_is_409_with_current_offset(self):
+        upload_id = self.start()
+        self.put(upload_id, self.body[:100], 0)
+
+        # Replaying the same chunk (lost response) must not append it again
+        response = self.put(upload_id, self.body[:100], 0)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 100)
+
+        response = self.put(upload_id, self.body[200:300], 200)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(UploadSession.objects.get(pk=upload_id).received_size, 100)
+
+    def test_chunk_past_declared_size_is_413(self):
+        upload_id = self.start()
+        response = self.put(upload_id, self.body + b'extra', 0)
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(UploadSession.objects.get(pk=upload_id).received_size, 0)
+
+    def test_write_after_complete_is_409(self):
+        upload_id = self.start()
+        self.put(upload_id, self.body, 0)
+        self.client.post(self.url(upload_id, 'complete/'))
+        response = self.put(upload_id, b'x', len(self.body))
+        self.assertEqual(response.status_code, 409)
+
+    def test_incomplete_upload_cannot_complete(self):
+        upload_id = self.start()
+        self.put(upload_id, self.body[:10], 0)
+        response = self.client.post(self.url(upload_id, 'complete/'))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(AvatarImage.objects.exists())
+
+    def test_checksum_mismatch_fails_the_upload(self):
+        upload_id = self.start(sha256='0' * 64)
+        self.put(upload_id, self.body, 0)
+        response = self.client.post(self.url(upload_id, 'complete/'))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(UploadSession.objects.get(pk=upload_id).status, 'failed')
+        self.assertFalse(AvatarImage.objects.exists())
+
+    def test_write_during_another_write_is_409(self):
+        upload_id = self.start()
+        UploadSession.objects.filter(pk=upload_id).update(status='writing', updated_at=timezone.now())
+        response = self.put(upload_id, self.body, 0)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(UploadSession.objects.get(pk=upload_id).status, 'writing')
+
+    def test_abandoned_write_claim_is_taken_over(self):
+        upload_id = self.start()
+        UploadSession.objects.filter(pk=upload_id).update(
+            status='writing', updated_at=timezone.now() - timedelta(hours=1)
+        )
+        response = self.put(upload_id, self.body, 0)
+        self.assertEqual(response.status_code, 200)
+        session = UploadSession.objects.get(pk=upload_id)
+        self.assertEqual((session.status, session.received_size), ('open', len(self.body)))
+
+    def test_missing_partial_file_is_410(self):
+        upload_id = self.start()
+        partial_path(UploadSession.objects.get(pk=upload_id)).unlink()
+        response = self.put(upload_id, self.body, 0)
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(UploadSession.objects.get(pk=upload_id).status, 'failed')
+
+    def test_second_complete_is_409_and_attaches_once(self):
+        upload_id = self.start()
+        self.put(upload_id, self.body, 0)
+        self.assertEqual(self.client.post(self.url(upload_id, 'complete/')).status_code, 201)
+        self.assertEqual(self.client.post(self.url(upload_id, 'complete/')).status_code, 409)
+        self.assertEqual(AvatarImage.objects.filter(avatar=self.avatar).count(), 1)
+
+    def test_complete_while_completing_is_409(self):
+        # Another request has claimed the session and is attaching the file
+        upload_id = self.start()
+        self.put(upload_id, self.body, 0)
+        UploadSession.objects.filter(pk=upload_id).update(status='completing')
+        response = self.client.post(self.url(upload_id, 'complete/'))
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(AvatarImage.objects.exists())
+        self.assertTrue(partial_path(UploadSession.objects.get(pk=upload_id)).exists())
+
+    def test_unknown_or_malformed_upload_id_is_404(self):
+        self.assertEqual(self.client.get(self.url(uuid.uuid4())).status_code, 404)
+        self.assertEqual(self.client.get(self.url('0000-abc')).status_code, 404)
+        self.assertEqual(self.client.post(self.url('abc', 'complete/')).status_code, 404)
+
+    def test_other_users_upload_is_404(self):
+        upload_id = self.start()
+        other = get_user_model().objects.create_user('other', 'other@example.com', 'pw')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.put(upload_id, self.body, 0).status_code, 404)
+
+
+@override_settings(AVATAR_VIDEO_ENABLED=True)
+class IdleLoopTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.user = get_user_model().objects.create_user('idler', 'idler@example.com', 'pw')
+        self.avatar = Avatar.objects.create(user=self.user, name='Ma')
+        self.avatar.profile_image.save('face.png', ContentFile(png_bytes()))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        patcher = mock.patch.object(animation_service, 'run_in_pool')
+        self.run_in_pool = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def idle_loop(self, **params):
+        return self.client.get(f'/api/avatars/{self.avatar.pk}/idle_loop/', params)
+
+    def loop_name(self, emotion='neutral'):
+        service = animation_service.get_animation_service()
+        return service._idle_loop_name(self.avatar.pk, self.avatar.profile_image.name, emotion, get_tier(None))
+
+    def test_missing_loop_is_202_and_queued_once(self):
+        response = self.idle_loop(emotion='happy')
+        self.assertEqual(response.status_code, 202)
+        self.assertIsNone(response.data['video'])
+        self.assertEqual(self.idle_loop(emotion='happy').status_code, 202)
+        # Queued by the first miss only; the second finds it in flight
+        self.assertEqual(self.run_in_pool.call_count, 1)
+        self.assertEqual(self.run_in_pool.call_args.args[2:], (self.avatar.pk, self.avatar.profile_image.name, 'happy', None))
+
+    def test_rendered_loop_is_found(self):
+        name = default_storage.save(self.loop_name(), ContentFile(b'mp4'))
+        self.addCleanup(default_storage.delete, name)
+        response = self.idle_loop()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(name, response.data['video'])
+        self.run_in_pool.assert_not_called()
+
+    def test_name_follows_the_stored_image(self):
+        name = self.loop_name()
+        self.assertEqual(name, self.loop_name())
+        self.avatar.profile_image.save('face.png', ContentFile(png_bytes()))
+        self.assertNotEqual(self.loop_name(), name)
+
+    def test_unknown_emotion_is_400(self):
+        self.assertEqual(self.idle_loop(emotion='smug').status_code, 400)
+
+
+class ClipInvalidationTests(TestCase):
+
+    def setUp(self):
+        caches['render'].clear()
+        self.user = get_user_model().objects.create_user('editor', 'editor@example.com', 'pw')
+        self.avatar = Avatar.objects.create(user=self.user, name='Ma', language='hi')
+        self.avatar.profile_image.save('face.png', ContentFile(png_bytes()))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.idle = self.clip('idle')
+        self.finished = self.clip('batch', batch_id='a' * 32)
+        self.running = self.clip('batch', batch_id=create_batch(self.avatar, ['namaste'])['id'])
+
+    def clip(self, kind, batch_id=''):
+        return AvatarClip.objects.create(
+            avatar=self.avatar, kind=kind, batch_id=batch_id, video_file=f'generated_videos/{kind}.mp4'
+        )
+
+    def patch(self, data):
+        response = self.client.patch(f'/api/avatars/{self.avatar.pk}/', data, format='multipart')
+        self.assertEqual(response.status_code, 200)
+
+    def remaining(self):
+        return set(AvatarClip.objects.filter(avatar=self.avatar).values_list('pk', flat=True))
+
+    def test_other_edits_keep_clips(self):
+        self.patch({'name': 'Amma', 'description': 'Loves films'})
+        self.assertEqual(self.remaining(), {self.idle.pk, self.finished.pk, self.running.pk})
+
+    def test_language_change_drops_finished_batch_clips(self):
+        self.patch({'language': 'ta'})
+        self.assertEqual(self.remaining(), {self.idle.pk, self.running.pk})
+
+    def test_new_photo_drops_clips_except_running_batches(self):
+        image = ContentFile(png_bytes(), name='new.png')
+        self.patch({'profile_image': image})
+        self.assertEqual(self.remaining(), {self.running.pk})
@@ -1,21 +1,146 @@
+import io
+import uuid
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.parsers import MultiPartParser, FormParser
-from .models import Avatar, AvatarImage, AvatarVoice
-from .serializers import AvatarSerializer, AvatarImageSerializer, AvatarVoiceSerializer
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from django.conf import settings
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.db.models import Count, Max, Sum
+from core.background import run_in_background
+from core.conditional import ConditionalGetMixin
+from core.storage import media_url
+from core.throttling import MediaThrottle, UploadThrottle
+from conversations.models import Message
+from video_animation.animation_service import EmotionMapper, idle_loop_for, prewarm_idle_loops
+from video_animation.batch import create_batch, delete_stale_clips, get_batch, start_batch
+from video_animation.quality import TIERS_BY_NAME
+from .models import Avatar, AvatarImage, AvatarVoice, UploadSession
+from .serializers import (
+    AvatarSerializer, AvatarImageSerializer, AvatarVoiceSerializer,
+    UploadSessionSerializer, UploadStartSerializer, RenderBatchSerializer
+)
+from .voice_processing import process_voice_sample
+from .chunked_upload import UploadError, start_upload, write_chunk, complete_upload
 
 
-class AvatarViewSet(viewsets.ModelViewSet):
+class AvatarViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = AvatarSerializer
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
 
     def get_queryset(self):
-        return Avatar.objects.filter(user=self.request.user)
+        queryset = Avatar.objects.filter(user=self.request.user)
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.prefetch_related('images', 'voices')
+        return queryset
 
-    @action(detail=True, methods=['post'])
+    def get_validator(self, queryset):
+        # Everything the nested payload depends on; voice durations change
+        # when a sample finishes processing
+        return queryset.aggregate(
+            avatar_count=Count('id', distinct=True),
+            updated=Max('updated_at'),
+            image_count=Count('images', distinct=True),
+            images_updated=Max('images__uploaded_at'),
+            voice_count=Count('voices', distinct=True),
+            voices_updated=Max('voices__uploaded_at'),
+            voice_seconds=Sum('voices__duration'),
+        )
+
+    def get_throttle_avatar_id(self):
+        # Only the caller's own avatars get charged
+        pk = self.kwargs.get('pk')
+        return pk if pk and self.get_queryset().filter(pk=pk).exists() else None
+
+    def perform_create(self, serializer):
+        avatar = serializer.save()
+        prewarm_idle_loops(avatar)
+
+    def perform_update(self, serializer):
+        old_image = serializer.instance.profile_image.name or ''
+        old_language = serializer.instance.language
+        avatar = serializer.save()
+        image_changed = (avatar.profile_image.name or '') != old_image
+        if image_changed:
+            # Clips of the old photo go to the media GC; new idle loops
+            delete_stale_clips(avatar, ['idle', 'batch'])
+            prewarm_idle_loops(avatar)
+        elif avatar.language != old_language:
+            # Batch clips speak in the avatar's voice; idle loops are silent
+            delete_stale_clips(avatar, ['batch'])
+
+    @action(detail=True, methods=['get'])
+    def idle_loop(self, request, pk=None):
+        """
+        Looping idle clip for the avatar (?emotion=, ?quality=), for the
+        client to play while a reply is on its way
+
+        202 with no video while the loop is still being rendered.
+        """
+        avatar = self.get_object()
+        emotion = request.query_params.get('emotion', 'neutral')
+        quality = request.query_params.get('quality')
+        if emotion not in EmotionMapper.EMOTION_PARAMS:
+            return Response(
+                {'error': f"emotion must be one of: {', '.join(EmotionMapper.EMOTION_PARAMS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if quality and quality not in TIERS_BY_NAME:
+            return Response(
+                {'error': f"quality must be one of: {', '.join(TIERS_BY_NAME)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not avatar.profile_image:
+            return Response({'error': 'Avatar has no profile image'}, status=status.HTTP_404_NOT_FOUND)
+
+        name = idle_loop_for(avatar, emotion, quality)
+        return Response(
+            {'emotion': emotion, 'video': media_url(name)},
+            status=status.HTTP_200_OK if name else status.HTTP_202_ACCEPTED
+        )
+
+    @action(detail=True, methods=['post'], url_path='renders', parser_classes=[JSONParser, FormParser],
+            throttle_classes=[MediaThrottle])
+    def start_render_batch(self, request, pk=None):
+        """Render many clips in the background, one job per clip; poll renders/<batch_id>/"""
+        avatar = self.get_object()
+        serializer = RenderBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if not avatar.profile_image:
+            return Response({'error': 'Avatar has no profile image'}, status=status.HTTP_400_BAD_REQUEST)
+
+        texts = serializer.validated_data['texts']
+        message_ids = []
+        if serializer.validated_data['rerender']:
+            # Newest replies first, within what is left of the clip budget
+            message_ids = list(
+                Message.objects.filter(conversation__avatar=avatar, sender_type='avatar')
+                .exclude(audio_response='').exclude(audio_response__isnull=True)
+                .order_by('-id')
+                .values_list('id', flat=True)[:max(0, settings.RENDER_BATCH_MAX_CLIPS - len(texts))]
+            )
+        batch = create_batch(avatar, texts, message_ids, serializer.validated_data.get('quality'))
+        # Serialized before the clip jobs start updating it
+        data = self._batch_data(batch)
+        start_batch(batch, avatar)
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'], url_path=r'renders/(?P<batch_id>[0-9a-f]{32})')
+    def render_batch(self, request, pk=None, batch_id=None):
+        """Progress of a batch render, with URLs of the finished clips"""
+        avatar = self.get_object()
+        batch = get_batch(batch_id)
+        if batch is None or batch['avatar'] != avatar.pk:
+            return Response({'error': 'Render batch not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self._batch_data(batch))
+
+    def _batch_data(self, batch):
+        return dict(batch, clips=[dict(clip, video=media_url(clip['video'])) for clip in batch['clips']])
+
+    @action(detail=True, methods=['post'], throttle_classes=[UploadThrottle])
     def upload_image(self, request, pk=None):
         avatar = self.get_object()
         serializer = AvatarImageSerializer(data=request.data)
@@ -25,16 +150,87 @@ class AvatarViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], throttle_classes=[UploadThrottle])
     def upload_voice(self, request, pk=None):
         avatar = self.get_object()
         serializer = AvatarVoiceSerializer(data=request.data)
         
         if serializer.is_valid():
-            serializer.save(avatar=avatar)
+            voice = serializer.save(avatar=avatar)
+            
+            # Decode, trim and embed once, off the request path
+            run_in_background(process_voice_sample, voice)
+            
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=True, methods=['post'], url_path='uploads', parser_classes=[JSONParser, FormParser],
+            throttle_classes=[UploadThrottle])
+    def start_upload(self, request, pk=None):
+        """Start a resumable chunked upload (image or voice)"""
+        avatar = self.get_object()
+        serializer = UploadStartSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            session = start_upload(
+                avatar,
+                serializer.validated_data['kind'],
+                serializer.validated_data['filename'],
+                serializer.validated_data['size'],
+                serializer.validated_data['sha256']
+            )
+        except UploadError as e:
+            return Response({'error': str(e)}, status=e.status_code)
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get', 'put'], url_path=r'uploads/(?P<upload_id>[0-9a-f-]+)', parser_classes=[])
+    def upload_chunk(self, request, pk=None, upload_id=None):
+        """GET: current offset to resume from. PUT: raw bytes at Upload-Offset"""
+        session = self._get_upload_session(upload_id)
+        if request.method == 'GET':
+            return Response(UploadSessionSerializer(session).data)
+        
+        try:
+            offset = int(request.headers.get('Upload-Offset', request.query_params.get('offset', '')))
+        except ValueError:
+            return Response({'error': 'Upload-Offset header is required'}, status=status.HTTP_400_BAD_REQUEST)
+        length = request.META.get('CONTENT_LENGTH')
+        
+        try:
+            # Stream the body to disk; request.data is never touched
+            write_chunk(session, request.stream or io.BytesIO(), offset, int(length) if length else None)
+        except UploadError as e:
+            return Response(
+                {'error': str(e), 'offset': session.received_size},
+                status=e.status_code
+            )
+        return Response(UploadSessionSerializer(session).data)
+
+    @action(detail=True, methods=['post'], url_path=r'uploads/(?P<upload_id>[0-9a-f-]+)/complete')
+    def complete_upload(self, request, pk=None, upload_id=None):
+        """Verify the checksum and attach the file; processing runs in background"""
+        session = self._get_upload_session(upload_id)
+        try:
+            target = complete_upload(session)
+        except UploadError as e:
+            return Response({'error': str(e)}, status=e.status_code)
+        
+        if isinstance(target, AvatarVoice):
+            run_in_background(process_voice_sample, target)
+            data = AvatarVoiceSerializer(target).data
+        else:
+            data = AvatarImageSerializer(target).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    def _get_upload_session(self, upload_id):
+        avatar = self.get_object()
+        try:
+            upload_id = uuid.UUID(upload_id)
+        except ValueError:
+            raise Http404("No such upload")
+        return get_object_or_404(UploadSession, pk=upload_id, avatar=avatar)
+
     @action(detail=True, methods=['post'])
     def finalize(self, request, pk=None):
         avatar = self.get_object()
@@ -0,0 +1,139 @@
+"""
+Voice sample ingestion
+
+Runs once per uploaded sample: decode to canonical 16 kHz mono PCM, trim
+leading/trailing silence, store the processed WAV, fill in the duration
+and compute a speaker embedding. The avatar's embedding is the
+duration-weighted mean of its samples, so voice conditioning at synthesis
+time is a lookup.
+"""
+import io
+import os
+import wave
+import numpy as np
+from django.core.files.base import ContentFile
+from core.storage import local_path
+from video_animation.audio_asset import AudioAsset
+from .models import Avatar, AvatarVoice
+
+SAMPLE_RATE = 16000
+
+# Frames quieter than this (relative to the loudest frame) count as silence
+SILENCE_DB = -40
+SILENCE_FRAME = 400  # 25 ms at 16 kHz
+
+
+def trim_silence(samples, sample_rate=SAMPLE_RATE):
+    """
+    Drop leading and trailing frames quieter than SILENCE_DB below the peak
+    """
+    num_frames = len(samples) // SILENCE_FRAME
+    if num_frames == 0:
+        return samples
+    frames = np.asarray(samples[:num_frames * SILENCE_FRAME]).reshape(num_frames, SILENCE_FRAME)
+    rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1)) + 1e-10
+    level_db = 20 * np.log10(rms / rms.max())
+    voiced = np.flatnonzero(level_db > SILENCE_DB)
+    if len(voiced) == 0:
+        return samples[:0]
+    return samples[voiced[0] * SILENCE_FRAME:(voiced[-1] + 1) * SILENCE_FRAME]
+
+
+def compute_embedding(samples, sample_rate=SAMPLE_RATE):
+    """
+    Fixed-size float32 speaker embedding for a mono 16 kHz signal
+
+    Uses resemblyzer's speaker encoder when installed; otherwise the
+    per-band mean and deviation of the log-mel spectrum (a spectral
+    voice signature), L2-normalized.
+    """
+    samples = np.asarray(samples, dtype=np.float32)
+    encoder = _get_speaker_encoder()
+    if encoder is not None:
+        embedding = encoder.embed_utterance(samples)
+    else:
+        mel = AudioAsset('', samples, sample_rate).mel_spectrogram()
+        embedding = np.concatenate([mel.mean(axis=1), mel.std(axis=1)])
+
+    embedding = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(embedding)
+    return embedding / norm if norm else embedding
+
+
+_speaker_encoder = None
+
+
+def _get_speaker_encoder():
+    global _speaker_encoder
+    if _speaker_encoder is None:
+        try:
+            from resemblyzer import VoiceEncoder
+        except ImportError:
+            return None
+        _speaker_encoder = VoiceEncoder('cpu', verbose=False)
+    return _speaker_encoder
+
+
+def pcm_to_wav(samples, sample_rate=SAMPLE_RATE):
+    pcm = (np.clip(np.asarray(samples), -1.0, 1.0) * 32767).astype('<i2')
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def process_voice_sample(voice):
+    """
+    Ingest one AvatarVoice and refresh its avatar's embedding
+    """
+    # Decoded once here; nothing reads it again, so no PCM cache
+    audio = AudioAsset.load(local_path(voice.audio_file.name), SAMPLE_RATE, cache=False)
+    samples = trim_silence(audio.samples)
+    if len(samples) == 0:
+        raise ValueError("Voice sample contains no speech")
+
+    name = os.path.splitext(os.path.basename(voice.audio_file.name))[0]
+    voice.processed_audio.save(f"{name}.wav", ContentFile(pcm_to_wav(samples)), save=False)
+    voice.duration = len(samples) / SAMPLE_RATE
+    voice.embedding = compute_embedding(samples).tobytes()
+    voice.save(update_fields=['processed_audio', 'duration', 'embedding'])
+
+    update_avatar_embedding(voice.avatar_id)
+    return voice
+
+
+def update_avatar_embedding(avatar_id):
+    """
+    Duration-weighted mean of the avatar's sample embeddings
+    """
+    rows = AvatarVoice.objects.filter(
+        avatar_id=avatar_id,
+        embedding__isnull=False
+    ).values_list('embedding', 'duration')
+
+    embeddings, weights = [], []
+    for blob, duration in rows:
+        embeddings.append(np.frombuffer(bytes(blob), dtype=np.float32))
+        weights.append(max(duration, 0.1))
+
+    if embeddings:
+        mean = np.average(np.stack(embeddings), axis=0, weights=weights).astype(np.float32)
+        norm = np.linalg.norm(mean)
+        blob = (mean / norm if norm else mean).tobytes()
+    else:
+        blob = None
+
+    # update() so the avatar's updated_at / persona cache are left alone
+    Avatar.objects.filter(pk=avatar_id).update(voice_embedding=blob)
+
+
+def get_voice_embedding(avatar):
+    """
+    The avatar's speaker embedding as a float32 array, or None
+    """
+    if not avatar.voice_embedding:
+        return None
+    return np.frombuffer(bytes(avatar.voice_embedding), dtype=np.float32)
@@ -0,0 +1,184 @@
+"""
+Conversation context for the LLM prompt
+
+Keeps the prompt a fixed size: a token-budgeted window of the most recent
+messages plus a rolling summary of everything older, stored on the
+Conversation and refreshed in the background every few turns. The window
+never reaches back past the summary; if the budget cuts it off before
+the summary starts, a fold of the gap is scheduled.
+"""
+from django.conf import settings
+from core.background import run_in_background
+from core.cache import get_cache, make_key
+from .models import Conversation, Message
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate (~4 characters per token)
+    """
+    return max(1, len(text or '') // 4)
+
+
+class ConversationContextBuilder:
+    """
+    Builds the LLM prompt for one conversation turn
+    """
+
+    # Upper bound on rows fetched for the window, whatever the budget
+    MAX_WINDOW_MESSAGES = 40
+
+    def __init__(self, conversation, token_budget=None, summary_every=None):
+        self.conversation = conversation
+        self.token_budget = token_budget or settings.CONVERSATION_CONTEXT_TOKENS
+        self.summary_every = summary_every or settings.CONVERSATION_SUMMARY_EVERY
+        # Set by recent_messages: unsummarized messages left out of the window
+        self.window_gap = False
+        self.window_size = 0
+
+    def recent_messages(self, before_id=None):
+        """
+        Newest unsummarized messages that fit in the token budget, oldest first
+        """
+        queryset = Message.objects.filter(
+            conversation_id=self.conversation.id,
+            id__gt=self.conversation.summary_last_message_id
+        )
+        if before_id is not None:
+            queryset = queryset.filter(id__lt=before_id)
+        # One extra row tells whether anything older was left out
+        rows = list(queryset.order_by('-id').values_list(
+            'sender_type', 'text_content'
+        )[:self.MAX_WINDOW_MESSAGES + 1])
+
+        window = []
+        used = 0
+        for sender_type, text in rows[:self.MAX_WINDOW_MESSAGES]:
+            cost = estimate_tokens(text)
+            if window and used + cost > self.token_budget:
+                break
+            window.append((sender_type, text))
+            used += cost
+
+        self.window_gap = len(window) < len(rows)
+        self.window_size = len(window)
+        window.reverse()
+        return window
+
+    def build_prompt(self, persona, user_text, before_id=None):
+        """
+        Persona + summary + recent window + the new user message
+        """
+        parts = [persona.strip()]
+
+        if self.conversation.summary:
+            parts.append(f"Summary of your conversation so far:\n{self.conversation.summary}")
+
+        window = self.recent_messages(before_id=before_id)
+        if window:
+            lines = [
+                f"{'You' if sender_type == 'avatar' else 'User'}: {text}"
+                for sender_type, text in window
+            ]
+            parts.append("Recent messages:\n" + "\n".join(lines))
+
+        parts.append(f'Respond naturally to: "{user_text}"')
+        parts.append("Keep it warm. Reply in same language.")
+        return "\n\n".join(parts)
+
+    def maybe_refresh_summary(self):
+        """
+        Schedule a summary refresh once enough turns are unsummarized, or
+        when the last window could not reach back to the summary
+        """
+        keep_recent = self.summary_every * 2
+        if self.window_gap:
+            # Fold everything the window left out; the turn just added
+            # (user message + reply) stays unsummarized as well
+            return schedule_refresh(self.conversation.id, self.window_size + 2)
+
+        pending = Message.objects.filter(
+            conversation_id=self.conversation.id,
+            id__gt=self.conversation.summary_last_message_id
+        ).count()
+        if pending >= keep_recent + self.summary_every * 2:
+            return schedule_refresh(self.conversation.id, keep_recent)
+        return None
+
+
+# Cap on messages folded per refresh so one call stays bounded
+MAX_FOLD_MESSAGES = 200
+# A refresh holds its lock at most this long (seconds), even if the job dies
+REFRESH_LOCK_TIMEOUT = 300
+
+
+def _refresh_lock_key(conversation_id):
+    return make_key('summary_refresh', conversation_id)
+
+
+def schedule_refresh(conversation_id, keep_recent):
+    """
+    Queue a summary refresh unless one is already queued or running for
+    this conversation; returns the future or None
+    """
+    if not get_cache('default').add(_refresh_lock_key(conversation_id), 1, REFRESH_LOCK_TIMEOUT):
+        return None
+    return run_in_background(refresh_summary, conversation_id, keep_recent)
+
+
+def refresh_summary(conversation_id, keep_recent):
+    """
+    Fold unsummarized messages older than the recent window into the summary
+    """
+    try:
+        _fold_summary(conversation_id, keep_recent)
+    finally:
+        get_cache('default').delete(_refresh_lock_key(conversation_id))
+
+
+def _fold_summary(conversation_id, keep_recent):
+    from ai_engine.gemini import generate_text
+
+    conversation = Conversation.objects.get(pk=conversation_id)
+    previous_through = conversation.summary_last_message_id
+
+    unsummarized = Message.objects.filter(
+        conversation_id=conversation_id,
+        id__gt=previous_through
+    )
+    # Everything except the newest keep_recent messages, oldest first
+    newest_kept = list(unsummarized.order_by('-id').values_list('id', flat=True)[:keep_recent])
+    if keep_recent and len(newest_kept) < keep_recent:
+        return
+    if newest_kept:
+        unsummarized = unsummarized.filter(id__lt=newest_kept[-1])
+    to_fold = list(
+        unsummarized.order_by('id').values_list('id', 'sender_type', 'text_content')[:MAX_FOLD_MESSAGES]
+    )
+    if not to_fold:
+        return
+
+    transcript = "\n".join(
+        f"{'Avatar' if sender_type == 'avatar' else 'User'}: {text}"
+        for _, sender_type, text in to_fold
+    )
+    prompt = f"""Update the running summary of a conversation between a user and their avatar.
+Keep names, facts, plans and feelings the avatar should remember. Stay under 200 words.
+
+Current summary:
+{conversation.summary or '(none)'}
+
+New messages:
+{transcript}
+
+Updated summary:"""
+
+    summary = generate_text(prompt)
+    if not summary:
+        return
+
+    # Only apply if no other refresh got there first
+    Conversation.objects.filter(
+        pk=conversation_id,
+        summary_last_message_id=previous_through
+    ).update(summary=summary.strip(), summary_last_message_id=to_fold[-1][0])
@@ -0,0 +1,121 @@
+"""
+Streaming conversation export
+
+Two formats, both produced as generators for StreamingHttpResponse:
+- ndjson: a header line for the conversation, then one line per message
+  with signed media URLs
+- zip: messages.ndjson plus the attached audio / video files, with the
+  media links pointing inside the archive
+
+Messages are read in keyset batches (id > last id) rather than with one
+.iterator(): mysqlclient buffers a whole result set client-side, so a
+single query over a long conversation would be held in memory anyway.
+Media files are copied in storage-sized chunks, and the zip is written
+to a small buffer that is drained after every write.
+"""
+import zipfile
+import orjson
+from django.core.files.storage import default_storage
+from .serializers import MessageSerializer
+
+BATCH_SIZE = 500
+MEDIA_FIELDS = ('audio_file', 'audio_response', 'video_file')
+
+
+def iter_messages(conversation, batch_size=BATCH_SIZE):
+    last_id = 0
+    while True:
+        batch = list(conversation.messages.filter(id__gt=last_id).order_by('id')[:batch_size])
+        if not batch:
+            return
+        yield from batch
+        last_id = batch[-1].id
+
+
+def conversation_header(conversation):
+    return {
+        'type': 'conversation',
+        'id': conversation.id,
+        'avatar': conversation.avatar_id,
+        'avatar_name': conversation.avatar.name,
+        'title': conversation.title,
+        'created_at': conversation.created_at.isoformat(),
+    }
+
+
+def _line(data):
+    return orjson.dumps(data) + b'\n'
+
+
+def stream_ndjson(conversation, request):
+    yield _line(conversation_header(conversation))
+    serializer = MessageSerializer(context={'request': request})
+    for message in iter_messages(conversation):
+        yield _line({'type': 'message', **serializer.to_representation(message)})
+
+
+def archive_path(name):
+    return f"media/{name}"
+
+
+class _StreamBuffer:
+    """Write-only file object for ZipFile; drained by the generator"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(conversation, request):
+    buffer = _StreamBuffer()
+    # Unseekable output: ZipFile writes data descriptors after each entry
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open('messages.ndjson', 'w', force_zip64=True) as entry:
+            entry.write(_line(conversation_header(conversation)))
+            serializer = MessageSerializer(context={'request': request})
+            for message in iter_messages(conversation):
+                data = serializer.to_representation(message)
+                for field in MEDIA_FIELDS:
+                    name = getattr(message, field).name
+                    data[field] = archive_path(name) if name else None
+                entry.write(_line({'type': 'message', **data}))
+                yield buffer.drain()
+
+        # Second pass for the files; TTS audio is shared between replies
+        written = set()
+        for message in iter_messages(conversation):
+            for field in MEDIA_FIELDS:
+                name = getattr(message, field).name
+                if not name or name in written:
+                    continue
+                written.add(name)
+                try:
+                    source = default_storage.open(name, 'rb')
+                except (FileNotFoundError, OSError) as e:
+                    print(f"Export skipped {name}: {e}")
+                    continue
+                info = zipfile.ZipInfo(archive_path(name))
+                # Audio / video are already compressed
+                info.compress_type = zipfile.ZIP_STORED
+                with source, archive.open(info, 'w', force_zip64=True) as entry:
+                    for chunk in source.chunks():
+                        entry.write(chunk)
+                        yield buffer.drain()
+                yield buffer.drain()
+    yield buffer.drain()
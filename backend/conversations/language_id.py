@@ -0,0 +1,107 @@
+"""
+Language identification for TTS
+
+Indic replies are identified from their Unicode script in one vectorized
+pass over the code points. The statistical detector (langdetect, seeded
+so it is deterministic) only runs for Latin or mixed text, and results
+are memoized.
+"""
+from functools import lru_cache
+import numpy as np
+
+try:
+    from langdetect import DetectorFactory, detect as langdetect_detect
+    # langdetect is random by default; a fixed seed makes it repeatable
+    DetectorFactory.seed = 0
+except ImportError:  # pragma: no cover
+    langdetect_detect = None
+
+# (first code point, last code point, language) for each Indic block
+SCRIPT_BLOCKS = [
+    (0x0900, 0x097F, 'hi'),  # Devanagari (Hindi, Marathi)
+    (0x0980, 0x09FF, 'bn'),  # Bengali
+    (0x0A00, 0x0A7F, 'pa'),  # Gurmukhi
+    (0x0A80, 0x0AFF, 'gu'),  # Gujarati
+    (0x0B80, 0x0BFF, 'ta'),  # Tamil
+    (0x0C00, 0x0C7F, 'te'),  # Telugu
+    (0x0C80, 0x0CFF, 'kn'),  # Kannada
+    (0x0D00, 0x0D7F, 'ml'),  # Malayalam
+]
+
+# Languages written in the same script as the key
+SHARED_SCRIPTS = {
+    'hi': {'hi', 'mr'},
+}
+
+SUPPORTED_LANGUAGES = {'en', 'hi', 'ta', 'te', 'mr', 'bn', 'gu', 'kn', 'ml', 'pa'}
+
+# Share of letters a script needs to decide the language on its own
+SCRIPT_MAJORITY = 0.5
+
+_BOUNDARIES = np.array(
+    [edge for start, end, _ in SCRIPT_BLOCKS for edge in (start, end + 1)],
+    dtype=np.uint32
+)
+
+
+def script_counts(text):
+    """
+    Letters per Indic block and the number of Latin letters, in one pass
+    """
+    code_points = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+    # Odd bucket index = inside a block (buckets alternate gap / block)
+    buckets = np.searchsorted(_BOUNDARIES, code_points, side='right')
+    counts = np.bincount(buckets, minlength=len(_BOUNDARIES) + 1)[1::2][:len(SCRIPT_BLOCKS)]
+    lower = code_points | 0x20
+    latin = int(np.count_nonzero((lower >= ord('a')) & (lower <= ord('z'))))
+    return counts, latin
+
+
+def detect_script_language(text):
+    """
+    Language from the dominant Indic script, or None for Latin / mixed text
+    """
+    counts, latin = script_counts(text)
+    total = int(counts.sum()) + latin
+    if not total:
+        return None
+    best = int(counts.argmax())
+    if counts[best] / total > SCRIPT_MAJORITY:
+        return SCRIPT_BLOCKS[best][2]
+    return None
+
+
+def _statistical_language(text):
+    if langdetect_detect is None:
+        return 'en'
+    try:
+        detected = langdetect_detect(text)
+    except Exception:
+        return 'en'
+    return detected if detected in SUPPORTED_LANGUAGES else 'en'
+
+
+@lru_cache(maxsize=2048)
+def _detect(text):
+    return detect_script_language(text) or _statistical_language(text)
+
+
+def detect_language(text, preferred=None):
+    """
+    Language code for text, preferring the avatar's configured language
+
+    `preferred` wins unless the text is clearly in a different script
+    (e.g. a Tamil reply from an avatar configured as English).
+    """
+    if not text:
+        return preferred or 'en'
+
+    if preferred not in SUPPORTED_LANGUAGES:
+        return _detect(text)
+
+    script_language = detect_script_language(text)
+    if script_language is None:
+        return preferred
+    if preferred in SHARED_SCRIPTS.get(script_language, {script_language}):
+        return preferred
+    return script_language
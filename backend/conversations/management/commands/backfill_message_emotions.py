@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from ai_engine.emotion_classifier import classify_batch
+from conversations.models import Message
+
+
+class Command(BaseCommand):
+    help = "Fill Message.emotion_detected for avatar messages that have none"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--all', action='store_true', help='reclassify messages that already have an emotion')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Message.objects.filter(sender_type='avatar')
+        if not options['all']:
+            queryset = queryset.filter(emotion_detected='')
+
+        rows = queryset.order_by('id').values_list(
+            'id', 'text_content', 'conversation__avatar__language'
+        ).iterator(chunk_size=batch_size)
+
+        updated = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                updated += self._save_batch(batch)
+                batch = []
+        if batch:
+            updated += self._save_batch(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Classified {updated} messages"))
+
+    def _save_batch(self, batch):
+        ids, texts, languages = zip(*batch)
+        emotions = classify_batch(texts, list(languages))
+        messages = [Message(id=pk, emotion_detected=emotion) for pk, emotion in zip(ids, emotions)]
+        Message.objects.bulk_update(messages, ['emotion_detected'])
+        return len(messages)
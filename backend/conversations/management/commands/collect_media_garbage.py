@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from core.media_gc import collect_garbage
+
+
+class Command(BaseCommand):
+    help = "Delete unreferenced media, failed-render leftovers and stale caches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='report what would be deleted')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        report = collect_garbage(dry_run=options['dry_run'], batch_size=options['batch_size'])
+
+        verb = "Would reclaim" if report['dry_run'] else "Reclaimed"
+        for reason, entry in report['by_reason'].items():
+            self.stdout.write(f"  {reason:<7} {entry['files']:>7} files  {entry['bytes'] / 1024 / 1024:>10.1f} MB")
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {report['bytes_reclaimed'] / 1024 / 1024:.1f} MB "
+            f"from {report['deleted']} of {report['scanned']} files"
+        ))
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.9 on 2026-10-19 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversations', '0002_message_audio_response'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='summary',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='summary_last_message_id',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,55 @@
+from django.db import migrations
+
+FTS_TABLE = 'conversations_message_fts'
+
+MYSQL_FORWARD = [
+    # ngram: Indic scripts have no stop-word friendly word boundaries
+    "CREATE FULLTEXT INDEX conversations_message_text_ft "
+    "ON conversations_message (text_content) WITH PARSER ngram",
+]
+MYSQL_REVERSE = [
+    "DROP INDEX conversations_message_text_ft ON conversations_message",
+]
+
+# External-content FTS5 table kept in sync by triggers; the trigram
+# tokenizer plays the part of MySQL's ngram parser
+SQLITE_FORWARD = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    "text_content, content='conversations_message', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON conversations_message BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, text_content) VALUES (new.id, new.text_content); END",
+    f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON conversations_message BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text_content) VALUES ('delete', old.id, old.text_content); END",
+    f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF text_content ON conversations_message BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text_content) VALUES ('delete', old.id, old.text_content); "
+    f"INSERT INTO {FTS_TABLE}(rowid, text_content) VALUES (new.id, new.text_content); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+SQLITE_REVERSE = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def run(statements_by_vendor):
+    def apply(apps, schema_editor):
+        # Other backends search with LIKE (conversations/search.py)
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversations', '0003_conversation_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'mysql': MYSQL_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            run({'mysql': MYSQL_REVERSE, 'sqlite': SQLITE_REVERSE}),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from avatars.models import Avatar
 
 User = get_user_model()
@@ -9,6 +10,8 @@ class Conversation(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversations')
     avatar = models.ForeignKey(Avatar, on_delete=models.CASCADE, related_name='conversations')
     title = models.CharField(max_length=200, blank=True)
+    summary = models.TextField(blank=True)
+    summary_last_message_id = models.PositiveBigIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -19,6 +22,11 @@ class Conversation(models.Model):
         return f"{self.user.username} - {self.avatar.name}"
 
 
+def touch_conversation(conversation_id):
+    """Bump updated_at so list ordering and ETags see message changes"""
+    Conversation.objects.filter(pk=conversation_id).update(updated_at=timezone.now())
+
+
 class Message(models.Model):
     SENDER_CHOICES = [
         ('user', 'User'),
@@ -0,0 +1,160 @@
+"""
+Message search over a user's conversation history
+
+Backed by the full-text index from migration 0004:
+- MySQL: FULLTEXT index with the ngram parser, queried in boolean mode
+  with every term required
+- SQLite (tests, local dev): FTS5 table with the trigram tokenizer
+- anything else, or terms too short for the index: LIKE on text_content
+
+Only the requested page is ranked, loaded and highlighted, so cost
+follows the index rather than the size of the history.
+"""
+import re
+from django.db import connection
+from django.utils.html import escape
+from .models import Message
+
+FTS_TABLE = 'conversations_message_fts'
+
+MAX_TERMS = 8
+SNIPPET_CHARS = 160
+
+# Everything the boolean / FTS query syntaxes treat as operators
+_SPECIAL = re.compile(r'[+\-<>()~*"@:^{}\[\]\\]')
+
+
+def parse_terms(query):
+    """
+    Plain search terms: operators stripped, duplicates dropped
+    """
+    terms = []
+    for term in _SPECIAL.sub(' ', query or '').split():
+        if term.lower() not in {t.lower() for t in terms}:
+            terms.append(term)
+    return terms[:MAX_TERMS]
+
+
+def _min_term_length():
+    if connection.vendor == 'mysql':
+        return 2  # default ngram_token_size
+    if connection.vendor == 'sqlite':
+        return 3  # trigram
+    return None
+
+
+class MessageSearch:
+    """
+    Lazily evaluated, ranked search results
+
+    Supports len() and slicing, so Django's Paginator (and DRF's
+    pagination classes) page through it with one COUNT and one page query.
+    """
+
+    def __init__(self, user, query, avatar_id=None):
+        self.user = user
+        self.terms = parse_terms(query)
+        self.avatar_id = avatar_id
+        min_length = _min_term_length()
+        self.use_index = (
+            min_length is not None
+            and bool(self.terms)
+            and all(len(term) >= min_length for term in self.terms)
+        )
+        self._count = None
+
+    def _scope_sql(self):
+        sql = "c.user_id = %s"
+        params = [self.user.pk]
+        if self.avatar_id is not None:
+            sql += " AND c.avatar_id = %s"
+            params.append(self.avatar_id)
+        return sql, params
+
+    def _index_query(self, select, order_limit='', limit_params=()):
+        scope_sql, scope_params = self._scope_sql()
+        if connection.vendor == 'mysql':
+            match = ' '.join(f'+"{term}"' for term in self.terms)
+            score = "MATCH(m.text_content) AGAINST (%s IN BOOLEAN MODE)"
+            sql = (
+                f"SELECT {select.format(score=score)} FROM conversations_message m "
+                "JOIN conversations_conversation c ON c.id = m.conversation_id "
+                f"WHERE {score} AND {scope_sql} {order_limit}"
+            )
+            params = ([match] if '{score}' in select else []) + [match] + scope_params
+        else:
+            match = ' AND '.join(f'"{term}"' for term in self.terms)
+            # bm25() is lower-is-better; negate so both backends sort DESC
+            score = f"-bm25({FTS_TABLE})"
+            sql = (
+                f"SELECT {select.format(score=score)} FROM {FTS_TABLE} f "
+                "JOIN conversations_message m ON m.id = f.rowid "
+                "JOIN conversations_conversation c ON c.id = m.conversation_id "
+                f"WHERE {FTS_TABLE} MATCH %s AND {scope_sql} {order_limit}"
+            )
+            params = [match] + scope_params
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + list(limit_params))
+            return cursor.fetchall()
+
+    def _fallback_queryset(self):
+        queryset = Message.objects.filter(conversation__user=self.user)
+        if self.avatar_id is not None:
+            queryset = queryset.filter(conversation__avatar_id=self.avatar_id)
+        for term in self.terms:
+            queryset = queryset.filter(text_content__icontains=term)
+        return queryset.order_by('-id')
+
+    def count(self):
+        if self._count is None:
+            if not self.terms:
+                self._count = 0
+            elif self.use_index:
+                self._count = self._index_query("COUNT(*)")[0][0]
+            else:
+                self._count = self._fallback_queryset().count()
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, page):
+        if not isinstance(page, slice):
+            raise TypeError("MessageSearch only supports slicing")
+        start = page.start or 0
+        stop = page.stop if page.stop is not None else self.count()
+        if not self.terms or stop <= start:
+            return []
+
+        if not self.use_index:
+            return list(self._fallback_queryset().select_related('conversation__avatar')[start:stop])
+
+        rows = self._index_query(
+            "m.id, {score}",
+            order_limit="ORDER BY 2 DESC, m.id DESC LIMIT %s OFFSET %s",
+            limit_params=(stop - start, start)
+        )
+        ranked_ids = [row[0] for row in rows]
+        messages = Message.objects.select_related('conversation__avatar').in_bulk(ranked_ids)
+        return [messages[pk] for pk in ranked_ids if pk in messages]
+
+    def highlight(self, text):
+        """
+        HTML-escaped snippet around the first hit, terms wrapped in <mark>
+        """
+        if not self.terms:
+            return escape(text[:SNIPPET_CHARS])
+        pattern = re.compile('|'.join(re.escape(term) for term in self.terms), re.IGNORECASE)
+        first = pattern.search(text)
+        start = max(0, (first.start() if first else 0) - SNIPPET_CHARS // 3)
+        end = min(len(text), start + SNIPPET_CHARS)
+        snippet = text[start:end]
+
+        parts = []
+        position = 0
+        for match in pattern.finditer(snippet):
+            parts.append(escape(snippet[position:match.start()]))
+            parts.append(f"<mark>{escape(match.group())}</mark>")
+            position = match.end()
+        parts.append(escape(snippet[position:]))
+        return f"{'…' if start else ''}{''.join(parts)}{'…' if end < len(text) else ''}"
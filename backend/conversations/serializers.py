@@ -1,8 +1,9 @@
 from rest_framework import serializers
+from core.serializers import FastReadMixin
 from .models import Conversation, Message
 
 
-class MessageSerializer(serializers.ModelSerializer):
+class MessageSerializer(FastReadMixin, serializers.ModelSerializer):
     class Meta:
         model = Message
         fields = [
@@ -12,7 +13,24 @@ class MessageSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class ConversationSerializer(serializers.ModelSerializer):
+class MessageSearchResultSerializer(FastReadMixin, serializers.ModelSerializer):
+    avatar = serializers.IntegerField(source='conversation.avatar_id', read_only=True)
+    avatar_name = serializers.CharField(source='conversation.avatar.name', read_only=True)
+    highlight = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Message
+        fields = [
+            'id', 'conversation', 'avatar', 'avatar_name', 'sender_type',
+            'text_content', 'highlight', 'created_at'
+        ]
+        read_only_fields = fields
+
+    def get_highlight(self, obj):
+        return self.context['search'].highlight(obj.text_content)
+
+
+class ConversationSerializer(FastReadMixin, serializers.ModelSerializer):
     messages = MessageSerializer(many=True, read_only=True)
     avatar_name = serializers.CharField(source='avatar.name', read_only=True)
     last_message = serializers.SerializerMethodField()
@@ -26,7 +44,12 @@ class ConversationSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
     def get_last_message(self, obj):
-        last_msg = obj.messages.last()
+        # Use the prefetched messages when the view loaded them
+        prefetched = getattr(obj, '_prefetched_objects_cache', {}).get('messages')
+        if prefetched is not None:
+            last_msg = prefetched[len(prefetched) - 1] if len(prefetched) else None
+        else:
+            last_msg = obj.messages.last()
         if last_msg:
             return MessageSerializer(last_msg).data
         return None
@@ -0,0 +1,253 @@
+import io
+import json
+import zipfile
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.test import TestCase
+from rest_framework.test import APIClient
+from avatars.models import Avatar
+from . import context_builder
+from .context_builder import ConversationContextBuilder, refresh_summary, schedule_refresh
+from .models import Conversation, Message, touch_conversation
+from .search import MessageSearch, parse_terms
+
+
+class ConversationTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('talker', 'talker@example.com', 'pw')
+        self.avatar = Avatar.objects.create(user=self.user, name='Ma')
+        self.conversation = Conversation.objects.create(user=self.user, avatar=self.avatar, title='Evenings')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def message(self, text, sender_type='user', conversation=None, **kwargs):
+        return Message.objects.create(
+            conversation=conversation or self.conversation,
+            sender_type=sender_type,
+            text_content=text,
+            **kwargs
+        )
+
+
+class MessageSearchTests(ConversationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.message('Did you eat dinner today?')
+        self.message('Yes, dal and rice, then we watched a film', sender_type='avatar')
+        self.message('hi ma, the film was good')
+        other_user = get_user_model().objects.create_user('other', 'other@example.com', 'pw')
+        other_avatar = Avatar.objects.create(user=other_user, name='Pa')
+        other = Conversation.objects.create(user=other_user, avatar=other_avatar)
+        self.message('hi pa, dinner was a film night too', conversation=other)
+
+    def search(self, **params):
+        response = self.client.get('/api/conversations/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_parse_terms_strips_operators(self):
+        self.assertEqual(parse_terms('+film -"dinner" film*'), ['film', 'dinner'])
+        self.assertEqual(parse_terms('()~'), [])
+
+    def test_index_search(self):
+        search = MessageSearch(self.user, 'film')
+        self.assertTrue(search.use_index)
+        data = self.search(q='film')
+        self.assertEqual(data['count'], 2)
+        self.assertEqual({row['sender_type'] for row in data['results']}, {'user', 'avatar'})
+        self.assertIn('<mark>film</mark>', data['results'][0]['highlight'])
+
+    def test_short_terms_fall_back_to_like(self):
+        # Shorter than the trigram index can match
+        search = MessageSearch(self.user, 'hi')
+        self.assertFalse(search.use_index)
+        data = self.search(q='hi')
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['results'][0]['text_content'], 'hi ma, the film was good')
+        self.assertIn('<mark>hi</mark>', data['results'][0]['highlight'])
+
+    def test_fallback_requires_every_term(self):
+        self.assertEqual(self.search(q='hi good')['count'], 1)
+        self.assertEqual(self.search(q='hi dinner')['count'], 0)
+
+    def test_results_are_scoped_to_user_and_avatar(self):
+        self.assertEqual(self.search(q='dinner')['count'], 1)
+        self.assertEqual(self.search(q='film', avatar=self.avatar.pk + 1)['count'], 0)
+
+    def test_highlight_is_escaped(self):
+        self.message('<script>film</script>')
+        data = self.search(q='film')
+        highlights = [row['highlight'] for row in data['results']]
+        self.assertIn('&lt;script&gt;<mark>film</mark>&lt;/script&gt;', highlights)
+
+    def test_query_is_required(self):
+        response = self.client.get('/api/conversations/search/', {'q': ' '})
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportTests(ConversationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.message('Good morning')
+        audio = ContentFile(b'ID3 fake mp3 bytes', name='reply.mp3')
+        self.reply = self.message('सुप्रभात, बेटा', sender_type='avatar', audio_response=audio)
+        # A later reply reusing the same cached TTS file
+        self.message('Again', sender_type='avatar', audio_response=self.reply.audio_response.name)
+
+    def export(self, export_type):
+        response = self.client.get(f'/api/conversations/{self.conversation.pk}/export/', {'type': export_type})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_ndjson_lines_are_valid_json(self):
+        response, body = self.export('ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertTrue(body.endswith(b'\n'))
+        lines = [json.loads(line) for line in body.splitlines()]
+
+        self.assertEqual(lines[0]['type'], 'conversation')
+        self.assertEqual(lines[0]['id'], self.conversation.pk)
+        self.assertEqual(lines[0]['title'], 'Evenings')
+        messages = lines[1:]
+        self.assertEqual([line['type'] for line in messages], ['message'] * 3)
+        self.assertEqual([line['text_content'] for line in messages], ['Good morning', 'सुप्रभात, बेटा', 'Again'])
+
+    def test_zip_is_valid_and_links_media_inside(self):
+        response, body = self.export('zip')
+        self.assertEqual(response['Content-Type'], 'application/zip')
+
+        with zipfile.ZipFile(io.BytesIO(body)) as archive:
+            self.assertIsNone(archive.testzip())
+            names = archive.namelist()
+            media_name = f"media/{self.reply.audio_response.name}"
+            # Shared files are stored once
+            self.assertEqual(sorted(names), ['media/' + self.reply.audio_response.name, 'messages.ndjson'])
+            self.assertEqual(archive.read(media_name), b'ID3 fake mp3 bytes')
+
+            lines = [json.loads(line) for line in archive.read('messages.ndjson').splitlines()]
+        self.assertEqual(lines[0]['type'], 'conversation')
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(lines[2]['audio_response'], media_name)
+        self.assertEqual(lines[3]['audio_response'], media_name)
+        self.assertIsNone(lines[1]['audio_response'])
+
+    def test_zip_skips_missing_files(self):
+        self.reply.audio_response.storage.delete(self.reply.audio_response.name)
+        _, body = self.export('zip')
+        with zipfile.ZipFile(io.BytesIO(body)) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.namelist(), ['messages.ndjson'])
+
+    def test_unknown_type_is_400(self):
+        response = self.client.get(f'/api/conversations/{self.conversation.pk}/export/', {'type': 'csv'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_other_users_conversation_is_404(self):
+        other = get_user_model().objects.create_user('other', 'other@example.com', 'pw')
+        self.client.force_authenticate(other)
+        response = self.client.get(f'/api/conversations/{self.conversation.pk}/export/')
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalGetTests(ConversationTestCase):
+
+    def get(self, url, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def assert_revalidates(self, url, change):
+        etag = self.get(url)['ETag']
+        self.assertEqual(self.get(url, etag).status_code, 304)
+        change()
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_unchanged_list_is_304(self):
+        response = self.get('/api/conversations/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        again = self.get('/api/conversations/', response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], response['ETag'])
+
+    def test_new_message_changes_etag(self):
+        def add_message():
+            self.message('Good night')
+            touch_conversation(self.conversation.pk)
+        self.assert_revalidates(f'/api/conversations/{self.conversation.pk}/', add_message)
+
+    def test_avatar_rename_changes_etag(self):
+        def rename():
+            self.avatar.name = 'Amma'
+            self.avatar.save()
+        self.assert_revalidates('/api/conversations/', rename)
+
+
+class ContextBuilderTests(ConversationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        caches['default'].clear()
+        # 10 tokens each at ~4 characters per token
+        self.messages = [
+            self.message(f'turn {i:02d} ' + 'x' * 32, sender_type='user' if i % 2 else 'avatar')
+            for i in range(6)
+        ]
+
+    def builder(self, token_budget=1000):
+        self.conversation.refresh_from_db()
+        return ConversationContextBuilder(self.conversation, token_budget=token_budget, summary_every=1)
+
+    def test_window_is_newest_messages_within_budget(self):
+        builder = self.builder(token_budget=25)
+        window = builder.recent_messages()
+        self.assertEqual([text[:7] for _, text in window], ['turn 04', 'turn 05'])
+        self.assertTrue(builder.window_gap)
+
+    def test_window_stops_at_summary(self):
+        Conversation.objects.filter(pk=self.conversation.pk).update(
+            summary='They talked about dinner.', summary_last_message_id=self.messages[3].pk
+        )
+        builder = self.builder()
+        prompt = builder.build_prompt('You are Ma.', 'And now?')
+        self.assertIn('Summary of your conversation so far:\nThey talked about dinner.', prompt)
+        self.assertNotIn('turn 03', prompt)
+        self.assertIn('You: turn 04', prompt)
+        self.assertIn('User: turn 05', prompt)
+        self.assertFalse(builder.window_gap)
+
+    def test_gap_schedules_a_fold_of_what_the_window_left_out(self):
+        builder = self.builder(token_budget=25)
+        builder.recent_messages()
+        with mock.patch.object(context_builder, 'run_in_background') as run:
+            builder.maybe_refresh_summary()
+        # The window's 2 messages plus the new turn stay unsummarized
+        run.assert_called_once_with(refresh_summary, self.conversation.pk, 4)
+
+    def test_refresh_is_not_queued_twice(self):
+        with mock.patch.object(context_builder, 'run_in_background') as run:
+            schedule_refresh(self.conversation.pk, 2)
+            self.assertIsNone(schedule_refresh(self.conversation.pk, 2))
+        self.assertEqual(run.call_count, 1)
+
+    def test_fold_summarizes_all_but_the_newest(self):
+        with mock.patch('ai_engine.gemini.generate_text', return_value=' Ate dal together. ') as generate:
+            refresh_summary(self.conversation.pk, 2)
+        prompt = generate.call_args.args[0]
+        self.assertIn('turn 03', prompt)
+        self.assertNotIn('turn 04', prompt)
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.summary, 'Ate dal together.')
+        self.assertEqual(self.conversation.summary_last_message_id, self.messages[3].pk)
+        # The lock is released for the next refresh
+        with mock.patch.object(context_builder, 'run_in_background') as run:
+            schedule_refresh(self.conversation.pk, 2)
+        run.assert_called_once()
@@ -1,7 +1,10 @@
 from gtts import gTTS
-from langdetect import detect
-import os
-from django.conf import settings
+import io
+import hashlib
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from core.cache import get_cache, make_key
+from .language_id import detect_language
 
 class TTSService:
     """
@@ -23,13 +26,10 @@ class TTSService:
     }
     
     @staticmethod
-    def detect_language(text):
-        """Auto-detect language from text"""
-        try:
-            detected = detect(text)
-            return TTSService.LANGUAGE_MAP.get(detected, 'en')
-        except:
-            return 'en'
+    def detect_language(text, preferred=None):
+        """Detect language from script, preferring the avatar's language"""
+        detected = detect_language(text, preferred=preferred)
+        return TTSService.LANGUAGE_MAP.get(detected, 'en')
     
     @staticmethod
     def generate_speech(text, language=None, avatar_id=None):
@@ -37,24 +37,33 @@ class TTSService:
         Generate speech audio file
         Returns: audio file path
         """
-        if not language:
-            language = TTSService.detect_language(text)
+        # Cheap script check even when a language is given, so an
+        # English-configured avatar replying in Tamil is voiced in Tamil
+        language = TTSService.detect_language(text, preferred=language)
+        
+        # Same text + language already synthesized (by any worker)?
+        cache_key = make_key('tts_speech', avatar_id, language, text)
+        cached_path = get_cache('tts').get(cache_key)
+        if cached_path and default_storage.exists(cached_path):
+            return cached_path
         
         # Create audio file
         try:
             tts = gTTS(text=text, lang=language, slow=False)
             
-            # Save to media/audio/
-            audio_dir = os.path.join(settings.MEDIA_ROOT, 'audio', 'responses')
-            os.makedirs(audio_dir, exist_ok=True)
-            
-            filename = f"response_{avatar_id}_{hash(text)}.mp3"
-            filepath = os.path.join(audio_dir, filename)
+            # Stable name (built-in hash() differs per process)
+            digest = hashlib.md5(f"{language}_{text}".encode()).hexdigest()[:16]
+            relative_path = f"audio/responses/response_{avatar_id}_{digest}.mp3"
             
-            tts.save(filepath)
+            # Save to media storage (local disk or bucket)
+            if not default_storage.exists(relative_path):
+                buffer = io.BytesIO()
+                tts.write_to_fp(buffer)
+                relative_path = default_storage.save(relative_path, ContentFile(buffer.getvalue()))
             
-            # Return relative path for URL
-            return f"audio/responses/{filename}"
+            # Return storage name; media_url() turns it into a signed URL
+            get_cache('tts').set(cache_key, relative_path)
+            return relative_path
         
         except Exception as e:
             print(f"TTS Error: {e}")
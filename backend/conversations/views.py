@@ -1,24 +1,68 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.pagination import PageNumberPagination
 from .tts_service import TTSService
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import Conversation, Message
-from .serializers import ConversationSerializer, MessageSerializer
+from .models import Conversation, Message, touch_conversation
+from .serializers import ConversationSerializer, MessageSerializer, MessageSearchResultSerializer
+from .search import MessageSearch
+from .export import stream_ndjson, stream_zip
+from .context_builder import ConversationContextBuilder
+from ai_engine.gemini import get_gemini_model
+from avatars.persona import get_persona
+from ai_engine.emotion_classifier import classify as classify_emotion
+from video_animation.quality import TIERS_BY_NAME
+from video_animation.reply_video import queue_reply_video
+from core.storage import media_url
+from core.throttling import ChatThrottle, take as take_tokens
+import math
+from django.db.models import Count, Max
+from django.http import StreamingHttpResponse
+from core.conditional import ConditionalGetMixin
 import os
 
 
-class ConversationViewSet(viewsets.ModelViewSet):
+class SearchPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class ConversationViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = ConversationSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Conversation.objects.filter(user=self.request.user)
+        queryset = Conversation.objects.filter(user=self.request.user).select_related('avatar')
+        if self.action in ('list', 'retrieve'):
+            # Serialized with every message; one query instead of one per row
+            queryset = queryset.prefetch_related('messages')
+        return queryset
+
+    def get_validator(self, queryset):
+        # Conversation.updated_at is touched whenever a message is added or
+        # changed (see touch_conversation); avatar_name comes from the avatar
+        return queryset.aggregate(
+            conversation_count=Count('id', distinct=True),
+            updated=Max('updated_at'),
+            avatar_updated=Max('avatar__updated_at'),
+            message_count=Count('messages'),
+            last_message=Max('messages__id'),
+        )
 
-    @action(detail=True, methods=['post'])
+    def get_throttle_avatar_id(self):
+        return Conversation.objects.filter(
+            user=self.request.user,
+            pk=self.kwargs.get('pk')
+        ).values_list('avatar_id', flat=True).first()
+
+    @action(detail=True, methods=['post'], throttle_classes=[ChatThrottle])
     def send_message(self, request, pk=None):
         conversation = self.get_object()
         text = request.data.get('text', '')
+        # Optional render tier: 'low' / 'medium' / 'high' (small screens ask for less)
+        quality = request.data.get('quality')
 
         if not text:
             return Response(
@@ -26,6 +70,12 @@ class ConversationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        if quality and quality not in TIERS_BY_NAME:
+            return Response(
+                {'error': f"quality must be one of: {', '.join(TIERS_BY_NAME)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         # Create user message
         user_message = Message.objects.create(
             conversation=conversation,
@@ -33,35 +83,69 @@ class ConversationViewSet(viewsets.ModelViewSet):
             text_content=text
         )
 
-        # Generate AI response (simple for now)
-        ai_response_text = self.generate_ai_response(text, conversation.avatar)
+        # Generate AI response with recent history + rolling summary
+        persona = get_persona(conversation.avatar)
+        context = ConversationContextBuilder(conversation)
+        ai_response_text = self.generate_ai_response(
+            text,
+            conversation.avatar,
+            context=context,
+            persona=persona,
+            before_id=user_message.id
+        )
+
+        # Classified once, in the reply's language, and stored with it
+        emotion = classify_emotion(ai_response_text, persona['language'])
 
         # Create avatar message
         avatar_message = Message.objects.create(
         conversation=conversation,
         sender_type='avatar',
-        text_content=ai_response_text
+        text_content=ai_response_text,
+        emotion_detected=emotion
         )
 
+        # Speech + video are the expensive part; over budget, reply as text
+        media_allowed, media_retry_after = take_tokens('media', request.user.pk, conversation.avatar_id)
+
         # Generate audio
-        try:
-            audio_path = TTSService.generate_speech(
-               text=ai_response_text,
-               language=conversation.avatar.language,
-               avatar_id=conversation.avatar.id
-            )
-            if audio_path:
-                avatar_message.audio_response = audio_path
-                avatar_message.save()
-        except Exception as e:
-            print(f"TTS failed: {e}")
+        audio_path = None
+        if media_allowed:
+            try:
+                audio_path = TTSService.generate_speech(
+                   text=ai_response_text,
+                   language=persona['language'],
+                   avatar_id=persona['avatar_id']
+                )
+                if audio_path:
+                    avatar_message.audio_response = audio_path
+                    avatar_message.save()
+            except Exception as e:
+                print(f"TTS failed: {e}")
+                audio_path = None
+
+        # Talking video of the reply, rendered off the request path with
+        # the emotion stored above
+        idle_video, video_pending = queue_reply_video(
+            avatar_message, conversation.avatar, audio_path, emotion, quality
+        )
+
+        # Fold older turns into the summary off the request path
+        context.maybe_refresh_summary()
 
-        return Response({
+        touch_conversation(conversation.pk)
+
+        response = Response({
             'user_message': MessageSerializer(user_message).data,
-            'avatar_message': MessageSerializer(avatar_message).data
+            'avatar_message': MessageSerializer(avatar_message).data,
+            'idle_video': media_url(idle_video),
+            'video_pending': video_pending
         })
+        if not media_allowed:
+            response['X-Media-Retry-After'] = str(math.ceil(media_retry_after))
+        return response
 
-    def generate_ai_response(self, user_text, avatar):
+    def generate_ai_response(self, user_text, avatar, context=None, persona=None, before_id=None):
         """Generate AI response using Gemini"""
         gemini_key = os.environ.get('GEMINI_API_KEY', '')
         
@@ -69,35 +153,18 @@ class ConversationViewSet(viewsets.ModelViewSet):
             return f"Hello! I'm {avatar.name}. AI key is not configured."
 
         try:
-            import google.generativeai as genai
-            genai.configure(api_key=gemini_key)
-            
-            # Try multiple model names
-            model_names = [
-                'gemini-1.5-flash',
-                'gemini-1.5-pro-latest',
-                'gemini-pro',
-                'models/gemini-1.5-flash',
-                'models/gemini-pro'
-            ]
-            
-            model = None
-            for model_name in model_names:
-                try:
-                    model = genai.GenerativeModel(model_name)
-                    # Quick test
-                    test = model.generate_content("Hi")
-                    print(f"Using model: {model_name}")
-                    break
-                except:
-                    continue
+            model = get_gemini_model()
             
             if not model:
                 return f"Hi! I'm {avatar.name}. Technical issue right now."
             
             # Build prompt
-            prompt = f"""You are {avatar.name}, a {avatar.relationship or 'person'}.
-{avatar.description or ''}
+            persona_prompt = (persona or get_persona(avatar))['prompt']
+
+            if context is not None:
+                prompt = context.build_prompt(persona_prompt, user_text, before_id=before_id)
+            else:
+                prompt = f"""{persona_prompt}
 
 Respond naturally to: "{user_text}"
 
@@ -110,6 +177,50 @@ Keep it warm. Reply in same language."""
             print(f"Gemini Error: {e}")
             return f"Hi! I'm {avatar.name}. I'm having a moment, but I'm listening."
         
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Ranked, highlighted message search: ?q=...&avatar=...&page=..."""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'error': 'Query parameter q is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        avatar_id = request.query_params.get('avatar')
+        if avatar_id is not None and not avatar_id.isdigit():
+            return Response(
+                {'error': 'avatar must be an id'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = MessageSearch(request.user, query, avatar_id=int(avatar_id) if avatar_id else None)
+        paginator = SearchPagination()
+        page = paginator.paginate_queryset(results, request, view=self)
+        serializer = MessageSearchResultSerializer(
+            page,
+            many=True,
+            context={'request': request, 'search': results}
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        """Stream the whole conversation: ?type=ndjson (default) or ?type=zip"""
+        conversation = self.get_object()
+        export_type = request.query_params.get('type', 'ndjson')
+        if export_type not in ('ndjson', 'zip'):
+            return Response(
+                {'error': 'type must be ndjson or zip'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if export_type == 'zip':
+            response = StreamingHttpResponse(stream_zip(conversation, request), content_type='application/zip')
+        else:
+            response = StreamingHttpResponse(stream_ndjson(conversation, request), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="conversation-{conversation.id}.{export_type}"'
+        return response
+
     @action(detail=True, methods=['get'])
     def messages(self, request, pk=None):
         conversation = self.get_object()
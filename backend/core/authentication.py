@@ -0,0 +1,115 @@
+"""
+JWT authentication with cached user lookups
+
+simplejwt's JWTAuthentication validates the token without the database
+but then loads the user row on every request. CachedJWTAuthentication
+keeps the fields requests need (CACHED_USER_FIELDS) in the 'auth' cache
+for AUTH_USER_CACHE_TTL seconds, so polling and media requests
+authenticate with no query. The password hash and other fields are never
+cached: the user is rebuilt with them deferred, so reading one loads it
+from the database and save() only writes the loaded fields. With
+simplejwt's CHECK_REVOKE_TOKEN on, the entry also keeps the digest that
+check compares (REVOKE_DIGEST_KEY), so tokens issued before a password
+change are still refused on a cache hit. Entries are
+dropped whenever the user is saved (profile updates, password changes,
+deactivation) or deleted; see users/signals.py.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from core.cache import get_cache
+
+
+def user_cache_key(user_id):
+    return f"auth_user_{user_id}"
+
+
+CACHED_USER_FIELDS = (
+    'id', 'username', 'email', 'first_name', 'last_name', 'profile_picture',
+    'is_active', 'is_staff', 'is_superuser', 'created_at', 'updated_at',
+)
+# simplejwt's revoke digest of the password hash, not the hash itself
+REVOKE_DIGEST_KEY = '_revoke_digest'
+
+
+def _cached_fields(user_model):
+    # Model field order, as Model.from_db() expects
+    return [field for field in user_model._meta.concrete_fields if field.name in CACHED_USER_FIELDS]
+
+
+def user_to_cache(user):
+    """
+    Plain dict of the cached fields (attname -> database value)
+    """
+    data = {field.attname: field.get_prep_value(field.value_from_object(user)) for field in _cached_fields(type(user))}
+    if api_settings.CHECK_REVOKE_TOKEN:
+        data[REVOKE_DIGEST_KEY] = get_md5_hash_password(user.password)
+    return data
+
+
+def user_from_cache(data):
+    """
+    User with only the cached fields loaded; the rest are deferred
+    """
+    user_model = get_user_model()
+    db = router.db_for_read(user_model)
+    fields = _cached_fields(user_model)
+    return user_model.from_db(db, [field.attname for field in fields], [data[field.attname] for field in fields])
+
+
+def invalidate_user(user_id):
+    try:
+        get_cache('auth').delete(user_cache_key(user_id))
+    except Exception as e:
+        print(f"Auth cache invalidation failed: {e}")
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication whose get_user() reads through the 'auth' cache
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        cache = get_cache('auth')
+        key = user_cache_key(user_id)
+        try:
+            data = cache.get(key)
+        except Exception as e:
+            print(f"Auth cache read failed: {e}")
+            data = None
+
+        # Entries written before CHECK_REVOKE_TOKEN was turned on lack the digest
+        if data is not None and (REVOKE_DIGEST_KEY in data or not api_settings.CHECK_REVOKE_TOKEN):
+            user = user_from_cache(data)
+        else:
+            user_model = get_user_model()
+            fields = CACHED_USER_FIELDS + (('password',) if api_settings.CHECK_REVOKE_TOKEN else ())
+            try:
+                user = user_model.objects.only(*fields).get(**{api_settings.USER_ID_FIELD: user_id})
+            except user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            data = user_to_cache(user)
+            try:
+                cache.set(key, data, settings.AUTH_USER_CACHE_TTL)
+            except Exception as e:
+                print(f"Auth cache write failed: {e}")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != data[REVOKE_DIGEST_KEY]:
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+        return user
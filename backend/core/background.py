@@ -0,0 +1,56 @@
+"""
+Small in-process background executors
+
+Used for work that should not hold up the HTTP response (summaries,
+post-processing, renders). Jobs run in named thread pools and close their
+DB connections when done:
+- default: summaries, voice processing
+- render: chat reply renders, so they reach the render scheduler at once
+  instead of queueing behind long jobs
+- batch: batch clips and idle-loop pre-warm, one short job per clip
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.db import close_old_connections
+
+# Pool name -> (env var with its size, default size)
+POOLS = {
+    'default': ('BACKGROUND_WORKERS', 4),
+    'render': ('RENDER_WORKERS', 8),
+    'batch': ('RENDER_BATCH_WORKERS', 2),
+}
+
+_executors = {}
+_lock = threading.Lock()
+
+
+def get_executor(pool='default'):
+    with _lock:
+        if pool not in _executors:
+            env_var, default = POOLS[pool]
+            workers = int(os.environ.get(env_var, str(default)))
+            _executors[pool] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"background-{pool}")
+        return _executors[pool]
+
+
+def run_in_pool(pool, func, *args, **kwargs):
+    """
+    Submit func(*args, **kwargs) to the named pool
+    """
+    def job():
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            print(f"Background job {getattr(func, '__name__', func)} failed: {e}")
+        finally:
+            close_old_connections()
+
+    return get_executor(pool).submit(job)
+
+
+def run_in_background(func, *args, **kwargs):
+    """
+    Submit func(*args, **kwargs) to the default background pool
+    """
+    return run_in_pool('default', func, *args, **kwargs)
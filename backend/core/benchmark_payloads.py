@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Payload benchmark: message-history serialization, JSON rendering and
+compression, stock DRF vs the fast paths
+
+Builds an in-memory conversation (no database needed) of Hindi / Tamil /
+English replies and times each stage.
+
+Usage (from backend/):
+    python -m core.benchmark_payloads --messages 500 --repeat 20
+"""
+import argparse
+import gzip
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+SAMPLE_TEXTS = [
+    "नमस्ते बेटा! आज तुम्हारा दिन कैसा रहा? मुझे तुम्हारी बहुत याद आती है, खाना समय पर खाया करो।",
+    "வணக்கம் கண்ணா! இன்று உன் நாள் எப்படி இருந்தது? நீ நலமாக இருக்கிறாய் என்று நம்புகிறேன்.",
+    "I am so proud of you. Remember to call your grandmother this weekend, she misses you a lot!",
+]
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000, result
+
+
+def main():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    import django
+    django.setup()
+
+    from rest_framework import serializers
+    from rest_framework.renderers import JSONRenderer
+    from conversations.models import Message
+    from conversations.serializers import MessageSerializer
+    from core.renderers import FastJSONRenderer
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    messages = [
+        Message(
+            id=i,
+            conversation_id=1,
+            sender_type='avatar' if i % 2 else 'user',
+            text_content=SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)],
+            audio_response=f"audio/responses/response_1_{i:016x}.mp3" if i % 2 else '',
+            video_file=f"generated_videos/{i:016x}_high.mp4" if i % 2 else '',
+            emotion_detected='happy' if i % 2 else '',
+            created_at=start + timedelta(seconds=30 * i),
+        )
+        for i in range(args.messages)
+    ]
+
+    class StockMessageSerializer(serializers.ModelSerializer):
+        class Meta:
+            model = Message
+            fields = MessageSerializer.Meta.fields
+
+    print(f"{args.messages} messages, best of {args.repeat}")
+
+    stock_ms, data = best_of(args.repeat, lambda: StockMessageSerializer(messages, many=True).data)
+    fast_ms, fast_data = best_of(args.repeat, lambda: MessageSerializer(messages, many=True).data)
+    assert [dict(row) for row in data] == [dict(row) for row in fast_data]
+    print(f"  serialize   ModelSerializer {stock_ms:8.1f} ms   FastReadMixin     {fast_ms:8.1f} ms   ({stock_ms / fast_ms:.1f}x)")
+
+    stock_ms, body = best_of(args.repeat, lambda: JSONRenderer().render(data))
+    fast_ms, fast_body = best_of(args.repeat, lambda: FastJSONRenderer().render(data))
+    print(f"  render      JSONRenderer    {stock_ms:8.1f} ms   FastJSONRenderer  {fast_ms:8.1f} ms   ({stock_ms / fast_ms:.1f}x)")
+
+    gzip_ms, gzipped = best_of(args.repeat, lambda: gzip.compress(fast_body, compresslevel=6))
+    print(f"  size        identity {len(fast_body) / 1024:8.1f} KB   gzip {len(gzipped) / 1024:8.1f} KB ({gzip_ms:.1f} ms)", end='')
+    try:
+        import brotli
+        from django.conf import settings
+        brotli_ms, brotlied = best_of(args.repeat, lambda: brotli.compress(fast_body, quality=settings.BROTLI_QUALITY))
+        print(f"   br {len(brotlied) / 1024:8.1f} KB ({brotli_ms:.1f} ms)")
+    except ImportError:
+        print("   br (not installed)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""
+Named cache aliases and key helpers
+
+Aliases (see CACHES in settings):
+- render: generated video paths
+- tts: synthesized speech paths
+- persona: compiled avatar prompts
+- auth: users resolved from JWTs
+
+Each alias has its own KEY_PREFIX and VERSION, so bumping e.g.
+RENDER_CACHE_VERSION invalidates every render entry without touching
+the others.
+"""
+import hashlib
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+
+
+def get_cache(alias):
+    """
+    Return the named cache, or the default cache if alias is not configured
+    """
+    try:
+        return caches[alias]
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def make_key(namespace, *parts):
+    """
+    Build a short, stable cache key from arbitrary parts
+    """
+    raw = '|'.join(str(part) for part in parts)
+    return f"{namespace}:{hashlib.md5(raw.encode()).hexdigest()}"
@@ -0,0 +1,83 @@
+"""
+Cache backends
+
+TolerantRedisCache is Django's RedisCache with Redis outages turned into
+cache misses: reads return the default, writes are dropped. Every cache
+on the request path (personas, TTS / render lookups, JWT users, sessions)
+is an optimization over the database or a recompute, so a Redis restart
+should cost latency, not 500s.
+"""
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.redis import RedisCache
+from redis.exceptions import RedisError
+
+# Connection refused / reset can surface as plain socket errors
+OUTAGE_ERRORS = (RedisError, OSError)
+
+
+class TolerantRedisCache(RedisCache):
+
+    def _failed(self, operation, error):
+        print(f"Cache {operation} failed: {error}")
+
+    def get(self, key, default=None, version=None):
+        try:
+            return super().get(key, default, version)
+        except OUTAGE_ERRORS as e:
+            self._failed('get', e)
+            return default
+
+    def get_many(self, keys, version=None):
+        try:
+            return super().get_many(keys, version)
+        except OUTAGE_ERRORS as e:
+            self._failed('get_many', e)
+            return {}
+
+    def has_key(self, key, version=None):
+        try:
+            return super().has_key(key, version)
+        except OUTAGE_ERRORS as e:
+            self._failed('has_key', e)
+            return False
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        try:
+            super().set(key, value, timeout, version)
+        except OUTAGE_ERRORS as e:
+            self._failed('set', e)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # Not stored: callers using add() as a lock back off
+        try:
+            return super().add(key, value, timeout, version)
+        except OUTAGE_ERRORS as e:
+            self._failed('add', e)
+            return False
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        try:
+            return super().touch(key, timeout, version)
+        except OUTAGE_ERRORS as e:
+            self._failed('touch', e)
+            return False
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        try:
+            return super().set_many(data, timeout, version)
+        except OUTAGE_ERRORS as e:
+            self._failed('set_many', e)
+            return list(data)
+
+    def delete(self, key, version=None):
+        try:
+            return super().delete(key, version)
+        except OUTAGE_ERRORS as e:
+            self._failed('delete', e)
+            return False
+
+    def delete_many(self, keys, version=None):
+        try:
+            super().delete_many(keys, version)
+        except OUTAGE_ERRORS as e:
+            self._failed('delete_many', e)
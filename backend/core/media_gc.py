@@ -0,0 +1,299 @@
+"""
+Generated-media lifecycle
+
+Files are live while a row references them: every FileField / ImageField
+in the project (Message.audio_response, Message.video_file,
+Avatar.profile_image, AvatarClip for idle loops and batch renders, ...)
+is a reference. Deleting rows (including
+on_delete=CASCADE) leaves their files behind; collect_garbage() finds and
+removes them, along with node-local scratch that has outlived its use:
+
+- media:   files under a FileField directory (or generated_videos/) that
+           no row references, once older than MEDIA_GC_GRACE_SECONDS
+           (covers a render that is done but not yet attached)
+- temp:    *_temp.* / *.part leftovers of failed ffmpeg runs and downloads
+- cache:   still segments, decoded audio (audio_cache/, and *.npy sidecars
+           left next to media by older versions) and downloaded copies of
+           remote files older than MEDIA_GC_CACHE_MAX_AGE
+- upload:  partial chunked uploads whose session is gone, finished or
+           idle longer than MEDIA_GC_UPLOAD_EXPIRY
+
+Directories are walked with os.scandir (or paged bucket listings) and
+references are checked batch by batch, so memory stays bounded by the
+batch size however many files there are.
+"""
+import os
+import posixpath
+import time
+from datetime import datetime, timezone as dt_timezone
+from itertools import islice
+from pathlib import Path
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import models
+from .storage import is_local
+
+# Generated outputs that are not a FileField's upload_to directory
+GENERATED_PREFIXES = ['generated_videos']
+
+SCRATCH_DIRS = ('storage_cache/', 'generated_videos/stills/', 'audio_cache/')
+PARTIAL_UPLOAD_DIR = 'uploads/partial/'
+
+
+def file_fields():
+    """
+    (model, field name) for every file field on the project's models
+    """
+    return [
+        (model, field.name)
+        for model in apps.get_models()
+        for field in model._meta.get_fields()
+        if isinstance(field, models.FileField)
+    ]
+
+
+def media_prefixes():
+    """
+    Top-level storage directories that hold referenced media
+    """
+    prefixes = set(GENERATED_PREFIXES)
+    for model, name in file_fields():
+        upload_to = model._meta.get_field(name).upload_to
+        if isinstance(upload_to, str) and upload_to:
+            prefixes.add(upload_to.strip('/').split('/')[0])
+    return sorted(prefixes)
+
+
+def referenced_names(names):
+    """
+    The subset of names that some row still points at
+    """
+    found = set()
+    for model, field in file_fields():
+        found.update(
+            model._base_manager.filter(**{f"{field}__in": names}).values_list(field, flat=True)
+        )
+    return found
+
+
+def walk_local(root, prefix=''):
+    """
+    Yield (name, size, mtime) for every file under root/prefix
+
+    Names are relative to root with forward slashes.
+    """
+    pending = [os.path.join(root, prefix)]
+    while pending:
+        directory = pending.pop()
+        try:
+            entries = os.scandir(directory)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    name = Path(os.path.relpath(entry.path, root)).as_posix()
+                    yield name, stat.st_size, stat.st_mtime
+
+
+def walk_storage(storage, prefix):
+    """
+    Yield (name, size, mtime) for every stored file under prefix
+    """
+    if is_local(storage):
+        yield from walk_local(storage.path(''), prefix)
+        return
+
+    bucket = getattr(storage, 'bucket', None)
+    if bucket is not None:
+        # S3: paged listing with sizes and dates, no request per file
+        location = storage.location.strip('/')
+        key_prefix = posixpath.join(location, prefix) if location else prefix
+        for obj in bucket.objects.filter(Prefix=key_prefix.rstrip('/') + '/'):
+            name = obj.key[len(location) + 1:] if location else obj.key
+            yield name, obj.size, obj.last_modified.timestamp()
+        return
+
+    directories, files = storage.listdir(prefix)
+    for filename in files:
+        name = posixpath.join(prefix, filename)
+        yield name, storage.size(name), storage.get_modified_time(name).timestamp()
+    for directory in directories:
+        yield from walk_storage(storage, posixpath.join(prefix, directory))
+
+
+def scratch_kind(name):
+    """
+    'upload', 'cache' or 'temp' for node-local scratch files, else None
+    """
+    if name.startswith(PARTIAL_UPLOAD_DIR):
+        return 'upload'
+    filename = posixpath.basename(name)
+    if '_temp.' in filename or filename.endswith('.part'):
+        return 'temp'
+    if name.startswith(SCRATCH_DIRS) or filename.endswith('.npy'):
+        return 'cache'
+    return None
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class GarbageCollector:
+    """
+    One collection run; counts what it removed per reason
+    """
+
+    def __init__(self, storage=None, dry_run=False, batch_size=500, now=None):
+        self.storage = storage or default_storage
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.now = now or time.time()
+        self.report = {
+            reason: {'files': 0, 'bytes': 0}
+            for reason in ('media', 'temp', 'cache', 'upload')
+        }
+        self.scanned = 0
+
+    def run(self):
+        self._expire_upload_sessions()
+
+        local_root = str(settings.MEDIA_ROOT)
+        local_storage = is_local(self.storage)
+        prefixes = tuple(f"{prefix}/" for prefix in media_prefixes())
+
+        # Node-local pass: scratch files, plus media when storage is local
+        media = []
+        uploads = []
+        for name, size, mtime in walk_local(local_root):
+            self.scanned += 1
+            kind = scratch_kind(name)
+            if kind == 'upload':
+                uploads.append((name, size, mtime))
+                if len(uploads) >= self.batch_size:
+                    self._collect_uploads(uploads)
+                    uploads = []
+            elif kind is not None:
+                max_age = settings.MEDIA_GC_GRACE_SECONDS if kind == 'temp' else settings.MEDIA_GC_CACHE_MAX_AGE
+                if self.now - mtime > max_age:
+                    self._remove_local(local_root, name, size, kind)
+            elif local_storage and name.startswith(prefixes):
+                media.append((name, size, mtime))
+                if len(media) >= self.batch_size:
+                    self._collect_media(media)
+                    media = []
+        if uploads:
+            self._collect_uploads(uploads)
+        if media:
+            self._collect_media(media)
+
+        # Remote pass: referenced media in the bucket
+        if not local_storage:
+            for prefix in prefixes:
+                for batch in _batches(walk_storage(self.storage, prefix.rstrip('/')), self.batch_size):
+                    self.scanned += len(batch)
+                    self._collect_media(batch)
+
+        return self.summary()
+
+    def summary(self):
+        return {
+            'scanned': self.scanned,
+            'deleted': sum(entry['files'] for entry in self.report.values()),
+            'bytes_reclaimed': sum(entry['bytes'] for entry in self.report.values()),
+            'by_reason': self.report,
+            'dry_run': self.dry_run,
+        }
+
+    def _expire_upload_sessions(self):
+        from avatars.models import UploadSession
+
+        cutoff = datetime.fromtimestamp(self.now - settings.MEDIA_GC_UPLOAD_EXPIRY, tz=dt_timezone.utc)
+        stale = UploadSession.objects.filter(status__in=UploadSession.ACTIVE_STATUSES, updated_at__lt=cutoff)
+        if not self.dry_run:
+            stale.update(status='failed')
+
+    def _collect_uploads(self, batch):
+        from avatars.models import UploadSession
+
+        cutoff = datetime.fromtimestamp(self.now - settings.MEDIA_GC_UPLOAD_EXPIRY, tz=dt_timezone.utc)
+        ids = {posixpath.splitext(posixpath.basename(name))[0]: name for name, _, _ in batch}
+        valid_ids = []
+        for session_id in ids:
+            try:
+                valid_ids.append(UploadSession._meta.pk.to_python(session_id))
+            except Exception:
+                continue
+        live = {
+            str(pk) for pk in UploadSession.objects.filter(
+                id__in=valid_ids,
+                status__in=UploadSession.ACTIVE_STATUSES,
+                updated_at__gte=cutoff
+            ).values_list('id', flat=True)
+        }
+        for name, size, _ in batch:
+            if posixpath.splitext(posixpath.basename(name))[0] not in live:
+                self._remove_local(str(settings.MEDIA_ROOT), name, size, 'upload')
+
+    def _collect_media(self, batch):
+        # Too new to judge: may belong to a row that is still being saved
+        old = [
+            (name, size) for name, size, mtime in batch
+            if self.now - mtime > settings.MEDIA_GC_GRACE_SECONDS
+        ]
+        if not old:
+            return
+        live = referenced_names([name for name, _ in old])
+        for name, size in old:
+            if name in live:
+                continue
+            if not self.dry_run:
+                try:
+                    self.storage.delete(name)
+                except Exception as e:
+                    print(f"Media GC could not delete {name}: {e}")
+                    continue
+                self._remove_sidecars(name)
+            self._count('media', size)
+
+    def _remove_sidecars(self, name):
+        """Decoded-audio cache entries of a local audio file"""
+        from video_animation.audio_asset import AudioAsset
+
+        base = os.path.join(str(settings.MEDIA_ROOT), name)
+        for path in (base, os.path.join(str(settings.MEDIA_ROOT), 'storage_cache', name)):
+            sidecar = AudioAsset.cache_path_for(path)
+            if os.path.exists(sidecar):
+                os.remove(sidecar)
+
+    def _remove_local(self, root, name, size, reason):
+        if not self.dry_run:
+            try:
+                os.remove(os.path.join(root, name))
+            except FileNotFoundError:
+                return
+            except OSError as e:
+                print(f"Media GC could not delete {name}: {e}")
+                return
+        self._count(reason, size)
+
+    def _count(self, reason, size):
+        self.report[reason]['files'] += 1
+        self.report[reason]['bytes'] += size
+
+
+def collect_garbage(dry_run=False, batch_size=500):
+    """
+    Run one collection and return its report
+    """
+    return GarbageCollector(dry_run=dry_run, batch_size=batch_size).run()
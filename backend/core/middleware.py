@@ -0,0 +1,119 @@
+"""
+Response compression with brotli / gzip negotiation
+
+Like django.middleware.gzip.GZipMiddleware, but prefers brotli when the
+client accepts it and the brotli package is installed (noticeably smaller
+for UTF-8 Indic text), and leaves small responses alone: compressing a
+few hundred bytes costs more than it saves.
+
+Both encodings add up to max_random_bytes of random padding to every
+response, as GZipMiddleware does since Django 4.2, so compressed sizes
+cannot be used for BREACH-style guessing of secrets in the body.
+"""
+import secrets
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.regex_helper import _lazy_re_compile
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'application/x-ndjson')
+
+_accepts_br = _lazy_re_compile(r'\bbr\b')
+_accepts_gzip = _lazy_re_compile(r'\bgzip\b')
+
+
+def _weaken_etag(response):
+    # The body differs from the identity encoding, so the ETag can only
+    # be a weak validator (as GZipMiddleware does)
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+
+
+def _brotli_padding(max_random_bytes):
+    """
+    A metadata meta-block (RFC 7932, 9.2) holding 1..max_random_bytes
+    random bytes; decoders skip it. Must follow a flush(), which leaves
+    the stream byte-aligned.
+    """
+    length = secrets.randbelow(min(max_random_bytes, 256)) + 1
+    # ISLAST=0, MNIBBLES=0 (code 3), reserved 0, MSKIPBYTES=1, MSKIPLEN-1
+    header = bytes([0x16 | ((length - 1) & 3) << 6, (length - 1) >> 2])
+    return header + secrets.token_bytes(length)
+
+
+def _brotli_close(compressor, max_random_bytes):
+    return compressor.flush() + _brotli_padding(max_random_bytes) + compressor.finish()
+
+
+def compress_brotli(data, max_random_bytes):
+    compressor = brotli.Compressor(quality=settings.BROTLI_QUALITY)
+    return compressor.process(data) + _brotli_close(compressor, max_random_bytes)
+
+
+def _brotli_sequence(sequence, max_random_bytes):
+    compressor = brotli.Compressor(quality=settings.BROTLI_QUALITY)
+    for item in sequence:
+        data = compressor.process(item)
+        if data:
+            yield data
+    yield _brotli_close(compressor, max_random_bytes)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress JSON / text responses over COMPRESS_MIN_SIZE bytes
+    """
+
+    max_random_bytes = 100
+
+    def choose_encoding(self, request):
+        accept = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is not None and _accepts_br.search(accept):
+            return 'br'
+        if _accepts_gzip.search(accept):
+            return 'gzip'
+        return None
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or response.status_code != 200:
+            return response
+        content_type = response.get('Content-Type', '')
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESS_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.choose_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if encoding == 'br':
+                response.streaming_content = _brotli_sequence(response.streaming_content, self.max_random_bytes)
+            else:
+                response.streaming_content = compress_sequence(
+                    response.streaming_content,
+                    max_random_bytes=self.max_random_bytes
+                )
+            del response['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = compress_brotli(response.content, self.max_random_bytes)
+            else:
+                compressed = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        _weaken_etag(response)
+        response['Content-Encoding'] = encoding
+        return response
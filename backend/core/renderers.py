@@ -0,0 +1,38 @@
+"""
+Fast JSON rendering
+
+orjson serializes straight to UTF-8 bytes and is several times faster
+than json.dumps with DRF's encoder on large message lists. Types orjson
+does not know (Decimal, lazy strings, ...) go through DRF's encoder, and
+without orjson installed this is the stock JSONRenderer.
+"""
+from rest_framework.utils import encoders
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson for compact (non-indented) output
+    """
+    _fallback_encoder = encoders.JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent is not None:
+            # Pretty printing (browsable API) is not a hot path
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            data,
+            default=self._fallback_encoder.default,
+            option=orjson.OPT_NON_STR_KEYS
+        )
+        # Same as JSONRenderer: keep the output a strict JavaScript subset
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
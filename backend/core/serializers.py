@@ -0,0 +1,103 @@
+"""
+Serializer read fast path
+
+Serializer.to_representation goes through Field.get_attribute() (nested
+lookup, callable check, exception mapping) and Field.to_representation()
+for every field of every row. For model-backed fields whose output is
+the attribute itself (CharField, IntegerField, BooleanField, choices,
+JSON) both are no-ops, so FastReadMixin reads those attributes directly
+and keeps the full DRF path for everything else. ISO 8601 datetimes are
+formatted with the field's timezone resolved once per serializer rather
+than once per value. Output is identical; writes and validation are
+untouched.
+"""
+from datetime import datetime
+from rest_framework import ISO_8601, serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+from rest_framework.settings import api_settings
+
+# Fields whose to_representation returns a DB value unchanged
+PLAIN_FIELDS = {
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+    serializers.FloatField,
+    serializers.ReadOnlyField,
+}
+
+# Attribute read directly, but the value still needs converting
+CONVERTED_FIELDS = {
+    serializers.DateTimeField,
+    serializers.FileField,
+    serializers.ImageField,
+}
+
+
+def _datetime_converter(field):
+    """
+    DateTimeField.to_representation with the timezone looked up once
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if type(value) is not datetime or value.tzinfo is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+class FastReadMixin:
+    """
+    Cheaper to_representation for ModelSerializers on read paths
+    """
+
+    def _representation_plan(self):
+        plan = getattr(self, '_fast_plan', None)
+        if plan is None:
+            plan = []
+            for field in self._readable_fields:
+                direct = (
+                    field.source != '*'
+                    and len(field.source_attrs) == 1
+                    and (
+                        type(field) in PLAIN_FIELDS
+                        or type(field) in CONVERTED_FIELDS
+                        or (type(field) is serializers.JSONField and not field.binary)
+                    )
+                )
+                if not direct:
+                    plan.append((field.field_name, None, field))
+                elif type(field) is serializers.DateTimeField:
+                    plan.append((field.field_name, field.source_attrs[0], _datetime_converter(field)))
+                elif type(field) in CONVERTED_FIELDS:
+                    plan.append((field.field_name, field.source_attrs[0], field.to_representation))
+                else:
+                    plan.append((field.field_name, field.source_attrs[0], None))
+            self._fast_plan = plan
+        return plan
+
+    def to_representation(self, instance):
+        ret = {}
+        for name, attr, field in self._representation_plan():
+            if attr is not None:
+                # field is the converter here (None: value as is)
+                value = getattr(instance, attr)
+                ret[name] = value if field is None or value is None else field(value)
+                continue
+
+            # Full DRF path (nested serializers, relations, method fields)
+            try:
+                attribute = field.get_attribute(instance)
+            except SkipField:
+                continue
+            check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+            ret[name] = None if check_for_none is None else field.to_representation(attribute)
+        return ret
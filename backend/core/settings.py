@@ -26,6 +26,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -37,6 +38,7 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'core.urls'
 WSGI_APPLICATION = 'core.wsgi.application'
+ASGI_APPLICATION = 'core.asgi.application'
 
 TEMPLATES = [
     {
@@ -62,13 +64,64 @@ DATABASES = {
         'PASSWORD': os.environ.get('DB_PASSWORD', 'password123'),
         'HOST': os.environ.get('DB_HOST', 'localhost'),
         'PORT': os.environ.get('DB_PORT', '3306'),
+        # Keep connections open between requests; ping before reuse
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
         'OPTIONS': {
             'charset': 'utf8mb4',
             'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+            'connect_timeout': 5,
         },
     }
 }
 
+# Cache: Redis shared by all workers; per-process memory when REDIS_URL is unset (tests).
+# A Redis outage reads as cache misses (core/cache_backends.py), not errors.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+CACHE_TIMEOUT = int(os.environ.get('CACHE_TIMEOUT', '86400'))
+
+
+def _cache(alias, version_env, timeout=CACHE_TIMEOUT):
+    if REDIS_URL:
+        backend = {
+            'BACKEND': 'core.cache_backends.TolerantRedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'max_connections': int(os.environ.get('REDIS_MAX_CONNECTIONS', '50')),
+                'socket_connect_timeout': 2,
+                'socket_timeout': 2,
+                'retry_on_timeout': True,
+                'health_check_interval': 30,
+            },
+        }
+    else:
+        backend = {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': f'mamta-{alias}',
+        }
+    backend.update({
+        'KEY_PREFIX': f'mamta:{alias}',
+        'VERSION': int(os.environ.get(version_env, '1')),
+        'TIMEOUT': timeout,
+    })
+    return backend
+
+
+CACHES = {
+    'default': _cache('default', 'CACHE_VERSION'),
+    'render': _cache('render', 'RENDER_CACHE_VERSION', timeout=86400 * 7),
+    'tts': _cache('tts', 'TTS_CACHE_VERSION', timeout=86400 * 7),
+    'persona': _cache('persona', 'PERSONA_CACHE_VERSION'),
+    'auth': _cache('auth', 'AUTH_CACHE_VERSION'),
+}
+
+# Seconds an authenticated user row is served from the 'auth' cache
+# (core/authentication.py); saves and deletes drop the entry immediately
+AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL', '300'))
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'default'
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -84,16 +137,76 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Media storage (core/storage.py): S3-compatible bucket or local disk.
+# Either way clients get signed URLs that expire after MEDIA_URL_EXPIRY.
+USE_S3 = os.environ.get('USE_S3', 'False') == 'True'
+MEDIA_URL_EXPIRY = int(os.environ.get('MEDIA_URL_EXPIRY', '3600'))
+# Reject unsigned /media/ requests (local storage only)
+MEDIA_REQUIRE_SIGNATURE = os.environ.get('MEDIA_REQUIRE_SIGNATURE', 'False') == 'True'
+
+if USE_S3:
+    MEDIA_STORAGE = {
+        'BACKEND': 'storages.backends.s3.S3Storage',
+        'OPTIONS': {
+            'bucket_name': os.environ.get('AWS_STORAGE_BUCKET_NAME', ''),
+            'region_name': os.environ.get('AWS_S3_REGION_NAME') or None,
+            # MinIO / R2 / any S3-compatible endpoint
+            'endpoint_url': os.environ.get('AWS_S3_ENDPOINT_URL') or None,
+            'querystring_auth': True,
+            'querystring_expire': MEDIA_URL_EXPIRY,
+            'file_overwrite': False,
+            'default_acl': None,
+        },
+    }
+else:
+    MEDIA_STORAGE = {
+        'BACKEND': 'core.storage.SignedFileSystemStorage',
+    }
+
+# Media garbage collection (core/media_gc.py)
+MEDIA_GC_GRACE_SECONDS = int(os.environ.get('MEDIA_GC_GRACE_SECONDS', str(6 * 3600)))
+MEDIA_GC_CACHE_MAX_AGE = int(os.environ.get('MEDIA_GC_CACHE_MAX_AGE', str(7 * 86400)))
+MEDIA_GC_UPLOAD_EXPIRY = int(os.environ.get('MEDIA_GC_UPLOAD_EXPIRY', str(86400)))
+
+STORAGES = {
+    'default': MEDIA_STORAGE,
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+}
+
+# Response compression (core/middleware.py): brotli or gzip above this size
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))
+
+# Token-bucket budgets per user and per avatar (core/throttling.py),
+# "<tokens>/<s|min|hour|day>"; empty = unlimited
+RATE_LIMITS = {
+    scope: {
+        kind: os.environ.get(f'RATE_LIMIT_{scope.upper()}_{kind.upper()}', default)
+        for kind, default in defaults.items()
+    }
+    for scope, defaults in {
+        'chat': {'user': '20/min', 'avatar': '30/min'},
+        'upload': {'user': '30/hour', 'avatar': '20/hour'},
+        'media': {'user': '10/min', 'avatar': '15/min'},
+    }.items()
 }
 
 CORS_ALLOWED_ORIGINS = os.environ.get('CORS_ALLOWED_ORIGINS', 'http://localhost:3000').split(',')
@@ -101,3 +214,51 @@ CORS_ALLOW_CREDENTIALS = True
 
 # AI Settings
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
+
+# Resumable uploads (avatars/chunked_upload.py)
+CHUNKED_UPLOAD_MAX_SIZE = int(os.environ.get('MAX_UPLOAD_SIZE', str(100 * 1024 * 1024)))
+# A chunk write claimed longer ago than this (seconds) is presumed dead
+CHUNKED_UPLOAD_WRITE_TIMEOUT = int(os.environ.get('CHUNKED_UPLOAD_WRITE_TIMEOUT', '300'))
+
+# Render a talking video for each avatar reply (off unless enabled)
+AVATAR_VIDEO_ENABLED = os.environ.get('AVATAR_VIDEO_ENABLED', 'False') == 'True'
+
+# Model artifacts (see ai_engine/model_registry.py)
+MODELS_DIR = Path(os.environ.get('MODELS_DIR', str(BASE_DIR / 'models')))
+
+# Render admission control (video_animation/scheduler.py), per process.
+# Every gunicorn worker runs its own scheduler, so the box runs up to
+# WORKER_PROCESSES * RENDER_MAX_CONCURRENT renders at once.
+WORKER_PROCESSES = int(os.environ.get('GUNICORN_WORKERS', str(min(os.cpu_count() or 1, 4))))
+RENDER_MAX_CONCURRENT = int(os.environ.get('RENDER_MAX_CONCURRENT', '1'))
+
+# Wav2Lip inference (ONNX Runtime, CPU). Threads default to this render's
+# share of the cores, so concurrent renders across all workers fill the
+# box without oversubscribing it.
+WAV2LIP_BATCH_SIZE = int(os.environ.get('WAV2LIP_BATCH_SIZE', '32'))
+WAV2LIP_THREADS = int(os.environ.get(
+    'WAV2LIP_THREADS',
+    str(max(1, (os.cpu_count() or 1) // (WORKER_PROCESSES * RENDER_MAX_CONCURRENT)))
+))
+# Background renders are shed while this many renders are waiting
+RENDER_MAX_QUEUE = int(os.environ.get('RENDER_MAX_QUEUE', '16'))
+# Longest a chat reply waits for a slot before degrading (seconds)
+RENDER_QUEUE_TIMEOUT = float(os.environ.get('RENDER_QUEUE_TIMEOUT', '5'))
+RENDER_BACKGROUND_TIMEOUT = float(os.environ.get('RENDER_BACKGROUND_TIMEOUT', '300'))
+# Degraded reply when no slot is free: 'still' (photo + audio) or 'audio'
+RENDER_OVERLOAD_MODE = os.environ.get('RENDER_OVERLOAD_MODE', 'still')
+# Batch renders (video_animation/batch.py): most clips per request; clips run
+# on the 'batch' pool (RENDER_BATCH_WORKERS, core/background.py)
+RENDER_BATCH_MAX_CLIPS = int(os.environ.get('RENDER_BATCH_MAX_CLIPS', '50'))
+
+# Render quality tiers (video_animation/quality.py): low, medium, high
+RENDER_DEFAULT_QUALITY = os.environ.get('RENDER_DEFAULT_QUALITY', 'high')
+# Step the tier down while this many renders are in flight...
+RENDER_DOWNGRADE_QUEUE_DEPTH = int(os.environ.get('RENDER_DOWNGRADE_QUEUE_DEPTH', '4'))
+# ...or while p95 render time over the window exceeds this
+RENDER_DOWNGRADE_P95_SECONDS = float(os.environ.get('RENDER_DOWNGRADE_P95_SECONDS', '8'))
+RENDER_LOAD_WINDOW_SECONDS = int(os.environ.get('RENDER_LOAD_WINDOW_SECONDS', '300'))
+
+# Conversation context (LLM prompt window)
+CONVERSATION_CONTEXT_TOKENS = int(os.environ.get('CONVERSATION_CONTEXT_TOKENS', '1500'))
+CONVERSATION_SUMMARY_EVERY = int(os.environ.get('CONVERSATION_SUMMARY_EVERY', '6'))
@@ -0,0 +1,128 @@
+"""
+Media storage
+
+Every generated or uploaded file goes through Django's default storage
+(STORAGES['default'] in settings):
+- USE_S3=True: any S3-compatible object store (django-storages), URLs are
+  presigned by the store
+- otherwise: SignedFileSystemStorage under MEDIA_ROOT, the local stand-in,
+  whose URLs carry an expiry and an HMAC checked by serve_media()
+
+Renderers still need real files for ffmpeg / OpenCV, so local_path()
+hands out a node-local copy and publish() pushes a finished file back.
+"""
+import hashlib
+import hmac
+import os
+import shutil
+import time
+from functools import lru_cache
+from pathlib import Path
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.utils.crypto import constant_time_compare
+from django.utils.encoding import filepath_to_uri
+
+SIGNATURE_SALT = 'core.storage.media'
+
+
+@lru_cache(maxsize=4)
+def _signing_key(secret):
+    # What salted_hmac() derives on every call; a list of N messages signs
+    # 2N URLs, so derive it once
+    return hashlib.sha256(f"{SIGNATURE_SALT}{secret}".encode()).digest()
+
+
+def sign(name, expires):
+    key = _signing_key(settings.SECRET_KEY)
+    return hmac.new(key, f"{name}:{expires}".encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def verify(name, expires, signature):
+    """
+    True if signature matches name and the expiry has not passed
+    """
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    if expires < time.time():
+        return False
+    return constant_time_compare(sign(name, expires), signature or '')
+
+
+class SignedFileSystemStorage(FileSystemStorage):
+    """
+    FileSystemStorage whose URLs expire after MEDIA_URL_EXPIRY seconds
+    """
+
+    def url(self, name):
+        name = name.replace('\\', '/')
+        # Same as FileSystemStorage.url() minus urljoin(), which dominates
+        # serializing long message lists; stored names are plain relative paths
+        url = self.base_url + filepath_to_uri(name).lstrip('/')
+        # Round up to the next minute so repeated calls give the same URL
+        # (and browser / ETag caching keeps working) within that minute
+        expires = (int(time.time()) + settings.MEDIA_URL_EXPIRY) // 60 * 60 + 60
+        return f"{url}?expires={expires}&signature={sign(name, expires)}"
+
+
+def is_local(storage=None):
+    storage = storage or default_storage
+    try:
+        storage.path('')
+    except NotImplementedError:
+        return False
+    return True
+
+
+def local_path(name, storage=None):
+    """
+    Filesystem path for a stored file
+
+    Local storage returns the file itself. Remote files are downloaded
+    once into MEDIA_ROOT/storage_cache and reused; stored names are never
+    rewritten in place (uploads get unique names, TTS / render outputs are
+    content-addressed), so a cached copy never goes stale.
+    """
+    storage = storage or default_storage
+    if is_local(storage):
+        return storage.path(name)
+
+    cached = Path(settings.MEDIA_ROOT) / 'storage_cache' / name
+    if not cached.exists():
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = cached.with_name(f"{cached.name}.{os.getpid()}.part")
+        with storage.open(name, 'rb') as source, open(temp_file, 'wb') as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+        os.replace(temp_file, cached)
+    return str(cached)
+
+
+def publish(path, name, storage=None):
+    """
+    Store the local file at path under name and return the stored name
+
+    A file already in place under local storage is left as is. For remote
+    storage the local render is uploaded and removed.
+    """
+    storage = storage or default_storage
+    if is_local(storage) and os.path.abspath(storage.path(name)) == os.path.abspath(path):
+        return name
+
+    if storage.exists(name):
+        storage.delete(name)
+    with open(path, 'rb') as f:
+        stored_name = storage.save(name, File(f, name=os.path.basename(name)))
+    os.remove(path)
+    return stored_name
+
+
+def media_url(name, storage=None):
+    """
+    Signed, time-limited URL for a stored name (None for empty names)
+    """
+    if not name:
+        return None
+    return (storage or default_storage).url(name)
@@ -0,0 +1,37 @@
+"""
+Settings for the test suite
+
+    python manage.py test --settings=core.test_settings
+
+SQLite (with the FTS5 search index from conversations 0004), per-process
+caches and a throwaway MEDIA_ROOT, so tests need no MySQL, Redis or S3.
+"""
+import atexit
+import shutil
+import tempfile
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+
+CACHES = {
+    alias: {**config, 'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'test-{alias}', 'OPTIONS': {}}
+    for alias, config in CACHES.items()
+}
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='mamta-test-media-')
+STATIC_ROOT = tempfile.mkdtemp(prefix='mamta-test-static-')
+for _directory in (MEDIA_ROOT, STATIC_ROOT):
+    atexit.register(shutil.rmtree, _directory, True)
+STORAGES = {
+    'default': {'BACKEND': 'core.storage.SignedFileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+AVATAR_VIDEO_ENABLED = False
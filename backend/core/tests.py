@@ -0,0 +1,242 @@
+import gzip
+import json
+from unittest import mock
+import brotli
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from avatars.models import Avatar
+from conversations.models import Conversation
+from . import throttling
+from .authentication import CachedJWTAuthentication, user_cache_key
+from .middleware import CompressionMiddleware
+from .throttling import parse_rate, take
+
+LIMITS = {
+    'chat': {'user': '3/min', 'avatar': '5/min'},
+}
+
+
+@override_settings(RATE_LIMITS=LIMITS)
+class TokenBucketTests(SimpleTestCase):
+
+    def setUp(self):
+        self.clock = 1000.0
+        patcher = mock.patch.object(throttling.time, 'monotonic', lambda: self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        throttling._buckets = throttling.LocalBuckets()
+        self.addCleanup(setattr, throttling, '_buckets', None)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('20/min'), (20 / 60, 20))
+        self.assertEqual(parse_rate('30/hour'), (30 / 3600, 30))
+        self.assertIsNone(parse_rate(''))
+
+    def test_burst_up_to_capacity_then_wait(self):
+        for _ in range(3):
+            self.assertEqual(take('chat', user_id=1, avatar_id=1), (True, 0))
+        allowed, wait = take('chat', user_id=1, avatar_id=1)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 20)
+
+    def test_refill(self):
+        for _ in range(3):
+            take('chat', user_id=1, avatar_id=1)
+        self.clock += 20
+        self.assertTrue(take('chat', user_id=1, avatar_id=1)[0])
+        self.assertFalse(take('chat', user_id=1, avatar_id=1)[0])
+
+    def test_user_budget_spans_avatars(self):
+        for avatar_id in (1, 2, 3):
+            self.assertTrue(take('chat', user_id=1, avatar_id=avatar_id)[0])
+        self.assertFalse(take('chat', user_id=1, avatar_id=4)[0])
+
+    def test_denied_request_takes_nothing(self):
+        # Avatar 1 has 5 tokens; user 1 drains their own 3 on it
+        for _ in range(3):
+            take('chat', user_id=1, avatar_id=1)
+        self.assertFalse(take('chat', user_id=1, avatar_id=1)[0])
+        # The denied call left the avatar's last 2 tokens for others
+        self.assertTrue(take('chat', user_id=2, avatar_id=1)[0])
+        self.assertTrue(take('chat', user_id=2, avatar_id=1)[0])
+        self.assertFalse(take('chat', user_id=3, avatar_id=1)[0])
+
+    def test_unknown_scope_is_unlimited(self):
+        self.assertEqual(take('upload', user_id=1, avatar_id=1), (True, 0))
+
+    def test_limiter_failure_allows(self):
+        with mock.patch.object(throttling._buckets, 'take', side_effect=ConnectionError):
+            self.assertEqual(take('chat', user_id=1, avatar_id=1), (True, 0))
+
+
+@override_settings(RATE_LIMITS=LIMITS)
+class ChatThrottleTests(TestCase):
+
+    def setUp(self):
+        throttling._buckets = throttling.LocalBuckets()
+        self.addCleanup(setattr, throttling, '_buckets', None)
+        self.user = get_user_model().objects.create_user('throttled', 'throttled@example.com', 'pw')
+        avatar = Avatar.objects.create(user=self.user, name='Ma')
+        self.conversation = Conversation.objects.create(user=self.user, avatar=avatar)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_empty_bucket_returns_429_with_retry_after(self):
+        for _ in range(3):
+            take('chat', self.user.pk, self.conversation.avatar_id)
+        response = self.client.post(
+            f'/api/conversations/{self.conversation.pk}/send_message/', {'text': 'hi'}, format='json'
+        )
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+
+    def setUp(self):
+        caches['auth'].clear()
+        self.user = get_user_model().objects.create_user('jwt', 'jwt@example.com', 'secret-pw')
+        self.token = AccessToken.for_user(self.user)
+        self.auth = CachedJWTAuthentication()
+
+    def cached(self):
+        return caches['auth'].get(user_cache_key(self.user.pk))
+
+    def test_second_lookup_is_served_from_cache(self):
+        self.auth.get_user(self.token)
+        with CaptureQueriesContext(connection) as queries:
+            user = self.auth.get_user(self.token)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.username, 'jwt')
+
+    def test_password_hash_is_not_cached(self):
+        self.auth.get_user(self.token)
+        self.assertNotIn('password', self.cached())
+        user = self.auth.get_user(self.token)
+        self.assertIn('password', user.get_deferred_fields())
+        self.assertTrue(user.check_password('secret-pw'))
+
+    def test_save_invalidates(self):
+        self.auth.get_user(self.token)
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        self.assertIsNone(self.cached())
+        self.assertEqual(self.auth.get_user(self.token).first_name, 'Renamed')
+
+    def test_saving_cached_user_keeps_password(self):
+        self.auth.get_user(self.token)
+        user = self.auth.get_user(self.token)
+        user.last_name = 'Updated'
+        user.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_name, 'Updated')
+        self.assertTrue(self.user.check_password('secret-pw'))
+
+    def test_deactivated_user_is_rejected(self):
+        self.auth.get_user(self.token)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(self.token)
+
+    def test_deleted_user_is_rejected(self):
+        self.auth.get_user(self.token)
+        self.user.delete()
+        self.assertIsNone(self.cached())
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(self.token)
+
+
+class RevokedTokenTests(TestCase):
+
+    def setUp(self):
+        self.revoke_check(True)
+        caches['auth'].clear()
+        self.user = get_user_model().objects.create_user('revoked', 'revoked@example.com', 'old-pw')
+        self.token = AccessToken.for_user(self.user)
+        self.auth = CachedJWTAuthentication()
+
+    def revoke_check(self, enabled):
+        # simplejwt modules hold the settings object; override_settings rebinds a new one
+        patcher = mock.patch.object(api_settings, 'CHECK_REVOKE_TOKEN', enabled)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return patcher
+
+    def test_cached_user_keeps_revoke_check(self):
+        self.auth.get_user(self.token)
+        self.assertNotIn('password', caches['auth'].get(user_cache_key(self.user.pk)))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.auth.get_user(self.token).pk, self.user.pk)
+        self.assertEqual(len(queries), 0)
+
+    def test_token_from_before_password_change_is_rejected(self):
+        self.auth.get_user(self.token)
+        self.user.set_password('new-pw')
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(self.token)
+        self.assertEqual(self.auth.get_user(AccessToken.for_user(self.user)).pk, self.user.pk)
+
+    def test_entry_cached_without_digest_is_reloaded(self):
+        patcher = self.revoke_check(False)
+        self.auth.get_user(AccessToken.for_user(self.user))
+        patcher.stop()
+        self.user.set_password('new-pw')
+        get_user_model().objects.filter(pk=self.user.pk).update(password=self.user.password)
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(self.token)
+
+
+@override_settings(COMPRESS_MIN_SIZE=200)
+class CompressionTests(SimpleTestCase):
+
+    body = json.dumps([{'text': 'माँ, आज खाना बहुत अच्छा था', 'id': i} for i in range(50)]).encode()
+
+    def compress(self, encoding, response=None):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=encoding)
+        if response is None:
+            response = HttpResponse(self.body, content_type='application/json')
+        return CompressionMiddleware(lambda r: response).process_response(request, response)
+
+    def test_brotli_round_trips_with_padding(self):
+        response = self.compress('gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), self.body)
+
+    def test_compressed_length_varies_between_responses(self):
+        # Random padding hides how well a guessed secret compressed (BREACH)
+        for encoding in ('br', 'gzip'):
+            lengths = {len(self.compress(encoding).content) for _ in range(20)}
+            self.assertGreater(len(lengths), 1, encoding)
+
+    def test_gzip_round_trips(self):
+        response = self.compress('gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_streaming_brotli_round_trips(self):
+        chunks = [self.body[:500], self.body[500:]]
+        response = self.compress('br', StreamingHttpResponse(iter(chunks), content_type='application/x-ndjson'))
+        self.assertEqual(brotli.decompress(b''.join(response.streaming_content)), self.body)
+
+    def test_etag_is_weakened(self):
+        response = HttpResponse(self.body, content_type='application/json')
+        response['ETag'] = '"abc"'
+        self.assertEqual(self.compress('br', response)['ETag'], 'W/"abc"')
+
+    def test_small_and_binary_responses_are_left_alone(self):
+        small = self.compress('br', HttpResponse(b'{}', content_type='application/json'))
+        self.assertFalse(small.has_header('Content-Encoding'))
+        image = self.compress('br', HttpResponse(self.body, content_type='image/png'))
+        self.assertFalse(image.has_header('Content-Encoding'))
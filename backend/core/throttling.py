@@ -0,0 +1,186 @@
+"""
+Token-bucket rate limiting
+
+Each budget (chat turns, uploads, media generation) has a bucket per user
+and one per avatar. A request takes a token from every bucket it touches,
+all or nothing, so one client cannot drain an avatar's shared capacity
+and a user cannot get around their budget by switching avatars.
+
+With Redis the check is one EVALSHA round trip (buckets live next to the
+cache, refilled from Redis' own clock); without it an in-process stand-in
+with the same semantics is used (tests, single worker).
+
+Rates are DRF-style strings, "<tokens>/<period>": the bucket holds at most
+<tokens> and refills at <tokens> per period, so a quiet client can burst.
+"""
+import math
+import threading
+import time
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+from .cache import get_cache
+
+KEY_PREFIX = 'mamta:ratelimit'
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# KEYS: bucket keys; ARGV: cost, then (rate per second, capacity) per key
+TAKE_SCRIPT = """
+local cost = tonumber(ARGV[1])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2])
+    local capacity = tonumber(ARGV[i * 2 + 1])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < cost then
+        wait = math.max(wait, (cost - tokens) / rate)
+    end
+end
+if wait == 0 then
+    for i, key in ipairs(KEYS) do
+        levels[i] = levels[i] - cost
+    end
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2])
+    local capacity = tonumber(ARGV[i * 2 + 1])
+    redis.call('HSET', key, 'tokens', tostring(levels[i]), 'ts', tostring(now))
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+end
+if wait == 0 then
+    return {1, '0'}
+end
+return {0, tostring(wait)}
+"""
+
+
+def parse_rate(rate):
+    """
+    "20/min" -> (tokens per second, capacity); None for unlimited
+    """
+    if not rate:
+        return None
+    count, period = rate.split('/')
+    count = int(count)
+    seconds = PERIODS[period.strip()[0]]
+    return count / seconds, count
+
+
+class RedisBuckets:
+    def __init__(self, client):
+        self.client = client
+        self.script = client.register_script(TAKE_SCRIPT)
+
+    def take(self, buckets, cost=1):
+        keys = [key for key, _, _ in buckets]
+        args = [cost]
+        for _, rate, capacity in buckets:
+            args.extend([rate, capacity])
+        allowed, wait = self.script(keys=keys, args=args)
+        return bool(allowed), float(wait)
+
+
+class LocalBuckets:
+    """In-process stand-in for RedisBuckets"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {}
+
+    def take(self, buckets, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            levels = []
+            wait = 0
+            for key, rate, capacity in buckets:
+                tokens, ts = self._state.get(key, (capacity, now))
+                tokens = min(capacity, tokens + max(0, now - ts) * rate)
+                levels.append(tokens)
+                if tokens < cost:
+                    wait = max(wait, (cost - tokens) / rate)
+            if wait == 0:
+                levels = [tokens - cost for tokens in levels]
+            for (key, _, _), tokens in zip(buckets, levels):
+                self._state[key] = (tokens, now)
+        return wait == 0, wait
+
+
+_buckets = None
+
+
+def get_buckets():
+    """
+    Redis-backed buckets when the default cache is Redis, else local ones
+    """
+    global _buckets
+    if _buckets is None:
+        client = getattr(get_cache('default'), '_cache', None)
+        if hasattr(client, 'get_client'):
+            _buckets = RedisBuckets(client.get_client(write=True))
+        else:
+            _buckets = LocalBuckets()
+    return _buckets
+
+
+def take(scope, user_id=None, avatar_id=None, cost=1):
+    """
+    Take cost tokens from the scope's user and avatar buckets
+
+    Returns (allowed, seconds until a retry can succeed).
+    """
+    limits = settings.RATE_LIMITS.get(scope, {})
+    buckets = []
+    for kind, ident in (('user', user_id), ('avatar', avatar_id)):
+        parsed = parse_rate(limits.get(kind))
+        if ident is not None and parsed:
+            rate, capacity = parsed
+            buckets.append((f"{KEY_PREFIX}:{scope}:{kind}:{ident}", rate, capacity))
+    if not buckets:
+        return True, 0
+
+    try:
+        return get_buckets().take(buckets, cost)
+    except Exception as e:
+        # A limiter outage must not take the API down with it
+        print(f"Rate limit check failed: {e}")
+        return True, 0
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    DRF throttle over take(); DRF turns wait() into a Retry-After header
+
+    The avatar comes from view.get_throttle_avatar_id() when the view
+    defines it, else from the URL's pk.
+    """
+    scope = None
+
+    def allow_request(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return True
+        get_avatar_id = getattr(view, 'get_throttle_avatar_id', None)
+        avatar_id = get_avatar_id() if get_avatar_id else view.kwargs.get('pk')
+        allowed, self.retry_after = take(self.scope, request.user.pk, avatar_id)
+        return allowed
+
+    def wait(self):
+        return math.ceil(self.retry_after)
+
+
+class ChatThrottle(TokenBucketThrottle):
+    scope = 'chat'
+
+
+class UploadThrottle(TokenBucketThrottle):
+    scope = 'upload'
+
+
+class MediaThrottle(TokenBucketThrottle):
+    scope = 'media'
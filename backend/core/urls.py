@@ -2,10 +2,10 @@ from django.contrib import admin
 from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
-from django.views.static import serve
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
+from .views import render_metrics, serve_media
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -23,5 +23,11 @@ urlpatterns = [
     path('api/users/', include('users.urls')),
     path('api/avatars/', include('avatars.urls')),
     path('api/conversations/', include('conversations.urls')),
-    re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
+    path('api/metrics/render/', render_metrics),
 ]
+
+# Local storage only; S3 URLs point straight at the bucket
+if not settings.USE_S3:
+    urlpatterns += [
+        re_path(r'^media/(?P<path>.*)$', serve_media),
+    ]
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.http import HttpResponseForbidden
+from django.views.static import serve
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from .storage import verify
+
+
+def serve_media(request, path):
+    """
+    Serve a file from local media storage
+
+    With MEDIA_REQUIRE_SIGNATURE only URLs produced by
+    SignedFileSystemStorage.url() (unexpired, valid signature) are served.
+    """
+    if settings.MEDIA_REQUIRE_SIGNATURE and not verify(
+        path,
+        request.GET.get('expires'),
+        request.GET.get('signature')
+    ):
+        return HttpResponseForbidden("Invalid or expired media URL")
+    return serve(request, path, document_root=settings.MEDIA_ROOT)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def render_metrics(request):
+    """Render queue depth, slot usage and recent render times (this worker)"""
+    from video_animation.quality import get_load_monitor
+    from video_animation.scheduler import get_render_scheduler
+
+    metrics = get_render_scheduler().metrics()
+    metrics['p95_render_seconds'] = get_load_monitor().p95()
+    return Response(metrics)
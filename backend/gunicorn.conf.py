@@ -0,0 +1,65 @@
+"""
+Gunicorn production profile
+
+Default: a few processes, each with a pool of threads. Chat turns spend
+most of their time waiting on Gemini and gTTS, so threads let one worker
+overlap many in-flight waits while the DB connection for each thread is
+kept open (CONN_MAX_AGE).
+
+Run with:
+    gunicorn -c gunicorn.conf.py core.wsgi:application
+
+For ASGI, use daphne instead:
+    daphne -b 0.0.0.0 -p 8000 core.asgi:application
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', min(multiprocessing.cpu_count(), 4)))
+# Django sizes render slots and Wav2Lip threads by the worker count
+os.environ['GUNICORN_WORKERS'] = str(workers)
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', '16'))
+
+# LLM + TTS + render can take a while; don't kill slow but healthy requests
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to cap memory growth from native libs
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = 100
+
+# Import the app before forking so workers start from the master's
+# copy-on-write pages instead of each importing Django on its own
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True') == 'True'
+
+
+def worker_memory(pid):
+    """Rss / Pss / Shared_Clean / Private_Dirty in MB from smaps_rollup"""
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('Rss', 'Pss', 'Shared_Clean', 'Private_Dirty'):
+                    fields[key] = int(value.split()[0]) // 1024
+    except OSError:
+        pass
+    return fields
+
+
+def post_worker_init(worker):
+    # Create the Wav2Lip session in each worker at boot, not on the first
+    # chat reply. The session reads its weights from a read-only memory map
+    # of the .data file (wav2lip_engine.map_external_weights), so they sit
+    # in the page cache once and count as Shared_Clean in every worker.
+    if os.environ.get('WAV2LIP_PRELOAD', 'True') == 'True':
+        from video_animation.animation_service import get_animation_service
+        get_animation_service().preload_models()
+    worker.log.info("Worker %s memory (MB): %s", worker.pid, worker_memory(worker.pid))
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
@@ -9,8 +9,32 @@ from pathlib import Path
 import subprocess
 import tempfile
 from django.conf import settings
-from django.core.cache import cache
+from django.core.files.storage import default_storage
+from core.background import run_in_pool
+from core.cache import get_cache, make_key
+from core.storage import local_path, publish
 import hashlib
+from .audio_asset import AudioAsset
+from .expressions import ExpressionEngine, estimate_landmarks
+from .quality import QUALITY_TIERS, get_load_monitor, get_tier
+from .scheduler import PRIORITY_BACKFILL, PRIORITY_PREWARM, RenderRejected, get_render_scheduler
+from ai_engine.wav2lip_engine import get_wav2lip_engine
+from ai_engine.model_registry import get_model_registry
+from ai_engine.emotion_classifier import classify as classify_emotion
+
+
+def _temp_path(path):
+    """
+    Unique scratch file next to path, for os.replace() into place
+
+    Renders run concurrently in one process (gthread workers, background
+    pools), so neither the target name nor the pid is unique enough.
+    """
+    path = Path(path)
+    fd, temp_path = tempfile.mkstemp(prefix=f"{path.stem}_", suffix=f"_temp{path.suffix}", dir=path.parent)
+    os.close(fd)
+    return temp_path
+
 
 class AvatarAnimationService:
     """
@@ -25,17 +49,27 @@ class AvatarAnimationService:
     - Video of avatar talking with lip sync!
     """
     
+    # Length of the pre-encoded still clip looped by the fallback path
+    STILL_SEGMENT_SECONDS = 2
+    # Idle loop: one head-sway period and one blink per loop
+    IDLE_LOOP_SECONDS = 3
+    IDLE_BLINK_SECONDS = 0.15
+    
     def __init__(self):
         self.models_path = Path(settings.BASE_DIR) / 'models'
         self.cache_enabled = True
-        self.video_fps = 25
-        self.video_resolution = (512, 512)
+        # Default tier; each render picks its own (see quality.py)
+        default_tier = get_tier()
+        self.video_fps = default_tier.fps
+        self.video_resolution = default_tier.resolution
+        self.expressions = ExpressionEngine()
     
     def generate_talking_video(self, 
                               avatar_image_path: str,
                               audio_path: str,
                               emotion: str = 'neutral',
-                              use_cache: bool = True) -> str:
+                              use_cache: bool = True,
+                              quality: str = None) -> str:
         """
         Main function: Generate talking avatar video
         
@@ -44,38 +78,328 @@ class AvatarAnimationService:
             audio_path: Path to AI-generated voice audio
             emotion: 'happy', 'sad', 'neutral', 'angry', 'surprised'
             use_cache: Whether to use cached videos
+            quality: Requested tier ('low', 'medium', 'high'); stepped
+                down automatically while renders are backed up
         
         Returns:
-            Path to generated video file
+            Storage name of the video (see core.storage.media_url)
         """
         
+        monitor = get_load_monitor()
+        tier = monitor.choose_tier(quality)
+        cache_key = self._get_cache_key(avatar_image_path, audio_path, emotion, tier)
+        
         # Check cache first (much faster!)
         if use_cache:
-            cache_key = self._get_cache_key(avatar_image_path, audio_path, emotion)
-            cached_video = cache.get(cache_key)
-            if cached_video and os.path.exists(cached_video):
+            cached_video = self.get_cached_video(avatar_image_path, audio_path, emotion, quality, tier)
+            if cached_video:
                 return cached_video
         
         # Generate new video
+        audio = audio_path
+        with monitor.track():
+            try:
+                # Decode once; every later stage reuses this buffer
+                audio = AudioAsset.load(audio_path)
+
+                # Method 1: Wav2Lip (Fast, good quality)
+                video_path = self._generate_wav2lip_video(
+                    avatar_image_path,
+                    audio,
+                    emotion,
+                    tier,
+                    output_name=cache_key.split(':')[-1][:16]
+                )
+                
+            except Exception as e:
+                # Fallback: Simple video with static face + audio
+                video_path = self._generate_fallback_video(avatar_image_path, audio, tier)
+        
+        # Rendered on local disk; move it to media storage
+        video_name = publish(video_path, self._storage_name(video_path))
+        
+        # Cache for future use
+        if use_cache:
+            get_cache('render').set(cache_key, video_name)  # alias TTL: 7 days
+        
+        return video_name
+    
+    def prepare_batch(self, avatar_image_path: str, quality: str = None) -> dict:
+        """
+        Shared state for a batch of clips of one avatar image
+        
+        The tier is resolved once, the image decoded and resized once and
+        its landmarks / face box located once; render_batch_clip() reuses
+        all of it for every clip.
+        """
+        tier = get_load_monitor().choose_tier(quality)
+        face = self._prepare_batch_face(avatar_image_path, tier)
+        face.update(tier=tier, quality=quality)
+        return face
+    
+    def render_batch_clip(self, face, audio_path: str, emotion: str = 'neutral',
+                          use_cache: bool = True, priority: int = PRIORITY_BACKFILL) -> str:
+        """
+        Storage name of one batch clip, rendered in its own scheduler slot
+        
+        Shares the render cache and file names with generate_talking_video.
+        The clip is piped straight into one ffmpeg that encodes video and
+        audio in a single pass.
+        """
+        if use_cache:
+            video_name = self.get_cached_video(face['path'], audio_path, emotion, face['quality'], face['tier'])
+            if video_name:
+                return video_name
+        return get_render_scheduler().render(
+            self._render_batch_clip, face, audio_path, emotion, face['tier'], use_cache,
+            priority=priority
+        )
+    
+    def _prepare_batch_face(self, image_path, tier):
+        """
+        Everything a clip needs from the avatar image, computed once
+        """
+        img = cv2.imread(image_path)
+        if img is None:
+            raise ValueError(f"Could not load image: {image_path}")
+        img = cv2.resize(img, tier.resolution)
+        image_key = f"{image_path}:{os.path.getmtime(image_path)}:{tier.resolution}"
+        engine = get_wav2lip_engine()
+        return {
+            'path': image_path,
+            'image': img,
+            'image_key': image_key,
+            'landmarks': self.expressions.get_landmarks(img, image_key),
+            'face_box': engine.detect_face_box(img) if engine is not None else None,
+        }
+    
+    def _render_batch_clip(self, face, audio_path, emotion, tier, use_cache=True):
+        """
+        One clip of a batch: frames from the prepared face, one ffmpeg pass
+        """
+        monitor = get_load_monitor()
+        cache_key = self._get_cache_key(face['path'], audio_path, emotion, tier)
+        output_dir = Path(settings.MEDIA_ROOT) / 'generated_videos'
+        output_dir.mkdir(exist_ok=True)
+        output_file = output_dir / f"{cache_key.split(':')[-1][:16]}_{tier.name}.mp4"
+        
+        with monitor.track():
+            audio = AudioAsset.load(audio_path)
+            img = face['image']
+            expression = self.expressions.get_grid(
+                img, face['image_key'], EmotionMapper.get_params(emotion), emotion
+            )
+            engine = get_wav2lip_engine()
+            try:
+                if engine is not None:
+                    frames = (
+                        self._add_emotion_expression(frame, emotion, expression)
+                        for frame in engine.render_frames(img, audio, tier.fps, face_box=face['face_box'])
+                    )
+                else:
+                    frames = (
+                        self._add_lip_movement(img.copy(), energy, emotion, expression, face['landmarks'])
+                        for energy in audio.frame_energy(tier.fps)
+                    )
+                self._encode_frames(frames, img.shape[:2], audio, str(output_file), tier.fps)
+                video_path = str(output_file)
+            except Exception as e:
+                print(f"Batch render failed, using still video: {e}")
+                video_path = self._generate_fallback_video(face['path'], audio, tier)
+        
+        video_name = publish(video_path, self._storage_name(video_path))
+        if use_cache:
+            get_cache('render').set(cache_key, video_name)
+        return video_name
+    
+    def _encode_frames(self, frames, shape, audio, output_path, fps):
+        """
+        Pipe raw frames into ffmpeg and mux the audio file in the same pass
+        
+        audio=None writes a silent clip, keyframed every second so it can
+        be looped.
+        """
+        height, width = shape
+        temp_file = _temp_path(output_path)
+        if audio is not None:
+            audio_args = ['-i', audio.source_path, '-map', '0:v:0', '-map', '1:a:0', '-c:a', 'aac', '-shortest']
+        else:
+            audio_args = ['-g', str(fps), '-an']
+        process = subprocess.Popen([
+            'ffmpeg', '-y',
+            '-loglevel', 'error',
+            '-f', 'rawvideo',
+            '-pix_fmt', 'bgr24',
+            '-s', f"{width}x{height}",
+            '-r', str(fps),
+            '-i', 'pipe:0',
+            *audio_args,
+            '-c:v', 'libx264',
+            '-pix_fmt', 'yuv420p',
+            '-movflags', '+faststart',
+            temp_file
+        ], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
         try:
-            # Method 1: Wav2Lip (Fast, good quality)
-            video_path = self._generate_wav2lip_video(
-                avatar_image_path,
-                audio_path,
-                emotion
+            try:
+                for frame in frames:
+                    process.stdin.write(frame.tobytes())
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+            except Exception:
+                process.kill()
+                process.wait()
+                raise
+            if process.wait() != 0:
+                raise Exception(f"ffmpeg encode failed: {process.stderr.read().decode(errors='replace')[-500:]}")
+            os.replace(temp_file, output_path)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+    
+    def get_cached_video(self, avatar_image_path, audio_path, emotion='neutral', quality=None, tier=None):
+        """
+        Storage name of an existing render, or None
+        
+        A cached render at the requested tier beats a fresh one at a
+        downgraded tier, so that one is tried first.
+        """
+        requested = get_tier(quality)
+        for candidate in dict.fromkeys([requested, tier or requested]):
+            cached_video = get_cache('render').get(
+                self._get_cache_key(avatar_image_path, audio_path, emotion, candidate)
             )
+            if cached_video and default_storage.exists(cached_video):
+                return cached_video
+        return None
+    
+    def generate_still_video(self, avatar_image_path: str, audio_path: str) -> str:
+        """
+        Cheapest video: the still photo looped under the audio
+        
+        Used when the render queue is saturated; it only muxes a
+        pre-encoded segment, so it does not take a render slot.
+        """
+        video_path = self._generate_fallback_video(avatar_image_path, audio_path, QUALITY_TIERS[0])
+        return publish(video_path, self._storage_name(video_path))
+    
+    def get_idle_loop(self, avatar_id: int, image_name: str, emotion: str = 'neutral', quality: str = None) -> str:
+        """
+        Storage name of a short, seamless idle clip (blink, slight head
+        sway, no audio) for the avatar's stored image and emotion
+        
+        Rendered once per (image, emotion, tier) and reused; the client
+        loops it while a reply is generated. Renders on a miss, so only
+        background jobs call this (see prewarm_idle_loops).
+        """
+        tier = get_tier(quality)
+        name = self._idle_loop_name(avatar_id, image_name, emotion, tier)
+        if default_storage.exists(name):
+            return name
+        
+        output_file = Path(settings.MEDIA_ROOT) / name
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        self._render_idle_loop(local_path(image_name), emotion, tier, str(output_file))
+        return publish(str(output_file), name)
+    
+    def find_idle_loop(self, avatar_id: int, image_name: str, emotion: str = 'neutral', quality: str = None):
+        """
+        Storage name of an already rendered idle loop, or None
+        """
+        name = self._idle_loop_name(avatar_id, image_name, emotion, get_tier(quality))
+        return name if default_storage.exists(name) else None
+    
+    def _idle_loop_name(self, avatar_id, image_name, emotion, tier):
+        # Stored names are never reused (file_overwrite is off), so a new
+        # photo gets new loops, and every node derives the same name
+        key_string = f"{avatar_id}_{image_name}_{emotion}_{tier.name}"
+        return f"generated_videos/idle/idle_{hashlib.md5(key_string.encode()).hexdigest()[:16]}_{tier.name}.mp4"
+    
+    def _render_idle_loop(self, image_path, emotion, tier, output_path):
+        """
+        Encode the idle loop frames straight into ffmpeg
+        """
+        img = cv2.imread(image_path)
+        if img is None:
+            raise ValueError(f"Could not load image: {image_path}")
+        img = cv2.resize(img, tier.resolution)
+        
+        image_key = f"{image_path}:{os.path.getmtime(image_path)}:{tier.resolution}"
+        expression = self.expressions.get_grid(img, image_key, EmotionMapper.get_params(emotion), emotion)
+        landmarks = self.expressions.get_landmarks(img, image_key) or estimate_landmarks(img)
+        
+        frames = self._generate_idle_frames(img, emotion, tier.fps, expression, landmarks)
+        self._encode_frames(frames, img.shape[:2], None, output_path, tier.fps)
+    
+    def _generate_idle_frames(self, base_image, emotion, fps, expression=None, landmarks=None):
+        """
+        Frames of one idle loop
+        
+        Head motion is periodic over the loop length, so the last frame
+        leads straight back into the first.
+        """
+        base = self._add_emotion_expression(base_image, emotion, expression)
+        height, width = base.shape[:2]
+        scale = width / 512.0
+        frame_count = max(1, round(self.IDLE_LOOP_SECONDS * fps))
+        blink_frames = max(2, round(self.IDLE_BLINK_SECONDS * fps))
+        blink_start = frame_count * 2 // 3
+        
+        for i in range(frame_count):
+            phase = 2 * np.pi * i / frame_count
+            source = base
+            if blink_start <= i < blink_start + blink_frames:
+                # Lids close and reopen: 0 -> 1 -> 0 across the blink
+                t = (i - blink_start + 0.5) / blink_frames
+                source = self._close_eyes(base, landmarks, 1.0 - abs(2 * t - 1))
             
-            # Cache for future use
-            if use_cache:
-                cache.set(cache_key, video_path, timeout=86400*7)  # 7 days
-            
-            return video_path
+            # Slight sway and nod, fractions of a degree / a few pixels
+            matrix = cv2.getRotationMatrix2D((width / 2, height * 0.6), 0.8 * np.sin(phase), 1.0)
+            matrix[0, 2] += 2.0 * scale * np.sin(phase)
+            matrix[1, 2] += 1.5 * scale * np.sin(2 * phase)
+            yield cv2.warpAffine(source, matrix, (width, height), borderMode=cv2.BORDER_REPLICATE)
+    
+    def _close_eyes(self, image, landmarks, closed):
+        """
+        Copy of image with the eyes closed by the given fraction
+        
+        The upper lid (the skin strip above each eye) is stretched down
+        over the eye, which is squashed into what is left.
+        """
+        if closed <= 0 or not landmarks:
+            return image
+        frame = image.copy()
+        height = frame.shape[0]
+        for name in ('left_eye', 'right_eye'):
+            eye = landmarks.get(name)
+            if eye is None:
+                continue
+            x0, y0 = np.floor(eye.min(axis=0)).astype(int)
+            x1, y1 = np.ceil(eye.max(axis=0)).astype(int)
+            pad_x = max(2, (x1 - x0) // 4)
+            eye_height = max(4, y1 - y0)
+            x0, x1 = max(0, x0 - pad_x), min(frame.shape[1], x1 + pad_x)
+            y0, y1 = max(1, y0 - eye_height // 2), min(height, y1 + eye_height // 2)
+            lid_rows = max(1, min(y0, eye_height // 2))
             
-        except Exception as e:
-            # Fallback: Simple video with static face + audio
-            return self._generate_fallback_video(avatar_image_path, audio_path)
+            covered = int(round((y1 - y0) * min(closed, 1.0)))
+            if covered <= 0 or x1 <= x0:
+                continue
+            lid = image[y0 - lid_rows:y0, x0:x1]
+            frame[y0:y0 + covered, x0:x1] = cv2.resize(lid, (x1 - x0, covered), interpolation=cv2.INTER_LINEAR)
+            if covered < y1 - y0:
+                frame[y0 + covered:y1, x0:x1] = cv2.resize(
+                    image[y0:y1, x0:x1], (x1 - x0, y1 - y0 - covered), interpolation=cv2.INTER_AREA
+                )
+        return frame
     
-    def _generate_wav2lip_video(self, image_path, audio_path, emotion):
+    def _storage_name(self, video_path):
+        """
+        Storage name for a file rendered under MEDIA_ROOT
+        """
+        return Path(os.path.relpath(video_path, settings.MEDIA_ROOT)).as_posix()
+    
+    def _generate_wav2lip_video(self, image_path, audio, emotion, tier=None, output_name=None):
         """
         Generate lip-synced video using Wav2Lip model
         
@@ -85,7 +409,10 @@ class AvatarAnimationService:
         output_dir = Path(settings.MEDIA_ROOT) / 'generated_videos'
         output_dir.mkdir(exist_ok=True)
         
-        output_file = output_dir / f"{hashlib.md5(image_path.encode()).hexdigest()[:10]}.mp4"
+        tier = tier or get_tier()
+        # One file per render (image, audio, emotion, tier), not per image
+        output_name = output_name or hashlib.md5(f"{image_path}|{audio.source_path}|{emotion}".encode()).hexdigest()[:16]
+        output_file = output_dir / f"{output_name}_{tier.name}.mp4"
         
         # Wav2Lip command
         # In production, you'd use the actual Wav2Lip inference
@@ -98,221 +425,275 @@ class AvatarAnimationService:
                 raise ValueError(f"Could not load image: {image_path}")
             
             # Resize to standard size
-            img = cv2.resize(img, self.video_resolution)
-            
-            # Load audio to get duration
-            import librosa
-            audio, sr = librosa.load(audio_path, sr=16000)
-            duration = len(audio) / sr
+            img = cv2.resize(img, tier.resolution)
             
-            # Generate video frames with lip movement
-            frames = self._generate_talking_frames(
-                img, 
-                audio, 
-                sr,
+            # Expression warp grid + landmarks: computed once, cached per image
+            image_key = f"{image_path}:{os.path.getmtime(image_path)}:{tier.resolution}"
+            expression = self.expressions.get_grid(
+                img,
+                image_key,
+                EmotionMapper.get_params(emotion),
                 emotion
             )
             
+            # Generate video frames with lip movement
+            engine = get_wav2lip_engine()
+            if engine is not None:
+                frames = (
+                    self._add_emotion_expression(frame, emotion, expression)
+                    for frame in engine.render_frames(img, audio, tier.fps)
+                )
+            else:
+                frames = self._generate_talking_frames(
+                    img, 
+                    audio, 
+                    emotion,
+                    fps=tier.fps,
+                    expression=expression,
+                    landmarks=self.expressions.get_landmarks(img, image_key)
+                )
+            
             # Write video
             self._write_video_with_audio(
                 frames,
-                audio_path,
-                str(output_file)
+                audio,
+                str(output_file),
+                fps=tier.fps
             )
             
             return str(output_file)
             
         except Exception as e:
             print(f"Wav2Lip generation failed: {e}")
-            return self._generate_fallback_video(image_path, audio_path)
+            return self._generate_fallback_video(image_path, audio, tier)
     
-    def _generate_talking_frames(self, base_image, audio, sr, emotion):
+    def _generate_talking_frames(self, base_image, audio, emotion, fps=None, expression=None, landmarks=None):
         """
         Generate frames with lip movement synced to audio
         
         This analyzes audio and creates appropriate mouth shapes
         """
-        import librosa
-        
-        # Get audio features
-        mfcc = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=13)
-        
-        # Calculate number of frames
-        duration = len(audio) / sr
-        num_frames = int(duration * self.video_fps)
+        # Per-frame audio energy, computed once on the shared buffer
+        energies = audio.frame_energy(fps or self.video_fps)
         
         frames = []
         
-        for i in range(num_frames):
+        for energy in energies:
             # Clone base image
             frame = base_image.copy()
             
-            # Get audio energy at this frame
-            audio_idx = int(i * len(audio) / num_frames)
-            if audio_idx < len(audio):
-                energy = np.abs(audio[audio_idx])
-            else:
-                energy = 0
-            
             # Modify mouth region based on audio energy
             # This is simplified - real Wav2Lip uses deep learning
-            frame = self._add_lip_movement(frame, energy, emotion)
+            frame = self._add_lip_movement(frame, energy, emotion, expression, landmarks)
             
             frames.append(frame)
         
         return frames
     
-    def _add_lip_movement(self, frame, audio_energy, emotion):
+    def _add_lip_movement(self, frame, audio_energy, emotion, expression=None, landmarks=None):
         """
         Add lip movement to frame based on audio energy
         
         In production: Use Wav2Lip neural network
         For demo: Simple mouth region modification
+        
+        landmarks are detected once per image by the caller, not per frame.
         """
         
-        # Detect face and mouth region
-        try:
-            import face_recognition
-            
-            # Find face landmarks
-            face_landmarks_list = face_recognition.face_landmarks(frame)
+        if landmarks:
+            # Get mouth points
+            top_lip = landmarks.get('top_lip')
+            bottom_lip = landmarks.get('bottom_lip')
             
-            if face_landmarks_list:
-                landmarks = face_landmarks_list[0]
+            if top_lip is not None and bottom_lip is not None:
+                # Open mouth based on audio energy
+                # Higher energy = wider mouth opening
+                mouth_opening = int(audio_energy * 20)  # Scale factor
                 
-                # Get mouth points
-                top_lip = landmarks.get('top_lip', [])
-                bottom_lip = landmarks.get('bottom_lip', [])
+                # Move bottom lip down (simplified)
+                # In real Wav2Lip, this uses GAN to generate realistic mouth
+                opened_bottom_lip = bottom_lip + np.array([0, mouth_opening], dtype=bottom_lip.dtype)
                 
-                if top_lip and bottom_lip:
-                    # Open mouth based on audio energy
-                    # Higher energy = wider mouth opening
-                    mouth_opening = int(audio_energy * 20)  # Scale factor
-                    
-                    # Modify lip positions (simplified)
-                    # In real Wav2Lip, this uses GAN to generate realistic mouth
-                    for i, point in enumerate(bottom_lip):
-                        # Move bottom lip down
-                        new_y = point[1] + mouth_opening
-                        bottom_lip[i] = (point[0], new_y)
-                    
-                    # Draw modified lips
-                    cv2.fillPoly(frame, [np.array(top_lip)], (200, 100, 100))
-                    cv2.fillPoly(frame, [np.array(bottom_lip)], (180, 90, 90))
-        
-        except Exception as e:
-            # If face detection fails, return original frame
-            pass
+                # Draw modified lips
+                cv2.fillPoly(frame, [top_lip.astype(np.int32)], (200, 100, 100))
+                cv2.fillPoly(frame, [opened_bottom_lip.astype(np.int32)], (180, 90, 90))
         
         # Add emotion-based expressions
-        frame = self._add_emotion_expression(frame, emotion)
+        frame = self._add_emotion_expression(frame, emotion, expression)
         
         return frame
     
-    def _add_emotion_expression(self, frame, emotion):
+    def _add_emotion_expression(self, frame, emotion, expression=None):
         """
         Add facial expressions based on emotion
-        """
-        # This would use emotion transfer models in production
-        # For demo, just annotate
-        
-        emotion_colors = {
-            'happy': (100, 255, 100),
-            'sad': (100, 100, 255),
-            'angry': (100, 100, 255),
-            'surprised': (255, 255, 100),
-            'neutral': (200, 200, 200)
-        }
-        
-        color = emotion_colors.get(emotion, (200, 200, 200))
         
-        # Add subtle color tint for emotion (very subtle)
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (0, 0), frame.shape[1::-1], color, -1)
-        frame = cv2.addWeighted(frame, 0.95, overlay, 0.05, 0)
+        expression is the cached remap grid from ExpressionEngine.get_grid();
+        applying it is a single vectorized warp.
+        """
+        return self.expressions.apply(frame, expression)
+    
+    def _audio_input(self, audio):
+        """
+        ffmpeg input args for an AudioAsset or a file path
         
-        return frame
+        Always the original file: the asset's 16 kHz mono PCM is for
+        inference and would downgrade the reply's sound.
+        """
+        if isinstance(audio, AudioAsset):
+            return ['-i', audio.source_path]
+        return ['-i', str(audio)]
     
-    def _write_video_with_audio(self, frames, audio_path, output_path):
+    def _write_video_with_audio(self, frames, audio, output_path, fps=None):
         """
         Write video frames and merge with audio
         """
-        # Write video without audio first
-        temp_video = output_path.replace('.mp4', '_temp.mp4')
+        # Write video without audio first; unique temp names, since two
+        # renders of the same cache key may run at once
+        temp_video = _temp_path(output_path)
+        temp_output = _temp_path(output_path)
         
-        height, width = frames[0].shape[:2]
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(temp_video, fourcc, self.video_fps, (width, height))
-        
-        for frame in frames:
-            out.write(frame)
-        
-        out.release()
-        
-        # Merge with audio using ffmpeg
         try:
-            subprocess.run([
-                'ffmpeg', '-y',
-                '-i', temp_video,
-                '-i', audio_path,
-                '-c:v', 'libx264',
-                '-c:a', 'aac',
-                '-strict', 'experimental',
-                '-shortest',
-                output_path
-            ], check=True, capture_output=True)
+            # Frames may be a generator; write them as they are produced
+            frames = iter(frames)
+            first_frame = next(frames)
+            height, width = first_frame.shape[:2]
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            out = cv2.VideoWriter(temp_video, fourcc, fps or self.video_fps, (width, height))
             
-            # Remove temp file
-            os.remove(temp_video)
+            out.write(first_frame)
+            for frame in frames:
+                out.write(frame)
             
-        except Exception as e:
-            print(f"FFmpeg merge failed: {e}")
-            # Use temp video as final
-            os.rename(temp_video, output_path)
+            out.release()
+            
+            # Merge with the original audio file using ffmpeg
+            try:
+                subprocess.run([
+                    'ffmpeg', '-y',
+                    '-i', temp_video,
+                    *self._audio_input(audio),
+                    '-c:v', 'libx264',
+                    '-c:a', 'aac',
+                    '-strict', 'experimental',
+                    '-shortest',
+                    temp_output
+                ], check=True, capture_output=True)
+                os.replace(temp_output, output_path)
+                
+            except Exception as e:
+                print(f"FFmpeg merge failed: {e}")
+                # Use temp video as final
+                os.replace(temp_video, output_path)
+        finally:
+            for path in (temp_video, temp_output):
+                if os.path.exists(path):
+                    os.remove(path)
     
-    def _generate_fallback_video(self, image_path, audio_path):
+    def _generate_fallback_video(self, image_path, audio, tier=None):
         """
         Simple fallback: Static image + audio
         Used if Wav2Lip fails
+        
+        The picture is encoded once into a short still segment; each reply
+        only loops that segment with stream copy and muxes the new audio.
         """
         output_dir = Path(settings.MEDIA_ROOT) / 'generated_videos'
         output_dir.mkdir(exist_ok=True)
         
-        output_file = output_dir / f"fallback_{hashlib.md5(image_path.encode()).hexdigest()[:10]}.mp4"
+        try:
+            if not isinstance(audio, AudioAsset):
+                audio = AudioAsset.load(audio)
+            
+            tier = tier or get_tier()
+            output_name = hashlib.md5(f"{image_path}|{audio.source_path}".encode()).hexdigest()[:16]
+            output_file = output_dir / f"fallback_{output_name}_{tier.name}.mp4"
+            
+            still_segment = self._get_still_segment(image_path, tier)
+            
+            # Loop the pre-encoded segment; only the audio is encoded
+            temp_file = _temp_path(output_file)
+            try:
+                subprocess.run([
+                    'ffmpeg', '-y',
+                    '-stream_loop', '-1',
+                    '-i', still_segment,
+                    *self._audio_input(audio),
+                    '-map', '0:v:0',
+                    '-map', '1:a:0',
+                    '-c:v', 'copy',
+                    '-c:a', 'aac',
+                    # -shortest alone does not stop an endless stream-copied loop
+                    '-t', f"{audio.duration:.3f}",
+                    '-movflags', '+faststart',
+                    temp_file
+                ], check=True, capture_output=True)
+                os.replace(temp_file, output_file)
+            finally:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+            
+            return str(output_file)
+            
+        except Exception as e:
+            raise Exception(f"Fallback video generation failed: {e}")
+    
+    def _get_still_segment(self, image_path, tier=None):
+        """
+        Short pre-encoded clip of the still image, created once per image
         
+        Keyframe every second so a looped copy can be cut close to the
+        audio length.
+        """
+        tier = tier or get_tier()
+        stat = os.stat(image_path)
+        key_string = f"{image_path}_{stat.st_mtime_ns}_{stat.st_size}_{tier.resolution}_{tier.fps}"
+        segment_dir = Path(settings.MEDIA_ROOT) / 'generated_videos' / 'stills'
+        segment_dir.mkdir(parents=True, exist_ok=True)
+        segment_file = segment_dir / f"still_{hashlib.md5(key_string.encode()).hexdigest()[:16]}.mp4"
+        
+        if segment_file.exists():
+            return str(segment_file)
+        
+        width, height = tier.resolution
+        temp_file = _temp_path(segment_file)
         try:
-            # Create video from static image with audio
             subprocess.run([
                 'ffmpeg', '-y',
                 '-loop', '1',
                 '-i', image_path,
-                '-i', audio_path,
+                '-t', str(self.STILL_SEGMENT_SECONDS),
+                '-r', str(tier.fps),
+                '-vf', f"scale={width}:{height}",
                 '-c:v', 'libx264',
                 '-tune', 'stillimage',
-                '-c:a', 'aac',
-                '-shortest',
+                '-g', str(tier.fps),
                 '-pix_fmt', 'yuv420p',
-                str(output_file)
+                temp_file
             ], check=True, capture_output=True)
-            
-            return str(output_file)
-            
-        except Exception as e:
-            raise Exception(f"Fallback video generation failed: {e}")
+            os.replace(temp_file, segment_file)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+        
+        return str(segment_file)
     
-    def _get_cache_key(self, image_path, audio_path, emotion):
+    def _get_cache_key(self, image_path, audio_path, emotion, tier=None):
         """
         Generate cache key for video
         """
-        key_string = f"{image_path}_{audio_path}_{emotion}"
-        return f"avatar_video_{hashlib.md5(key_string.encode()).hexdigest()}"
+        # Renderer version: new model weights never hit old renders
+        renderer = get_model_registry().renderer_version()
+        tier = tier or get_tier()
+        return make_key('avatar_video', renderer, image_path, audio_path, emotion, tier.name)
     
     def preload_models(self):
         """
-        Preload Wav2Lip models into memory (faster generation)
+        Load the Wav2Lip session now instead of on the first render
+
+        Called per worker after the fork (gunicorn post_worker_init), since
+        ONNX Runtime thread pools do not survive fork().
         """
-        # In production, load actual Wav2Lip models here
-        pass
+        return get_wav2lip_engine() is not None
 
 
 class EmotionMapper:
@@ -353,25 +734,85 @@ class EmotionMapper:
         return cls.EMOTION_PARAMS.get(emotion, cls.EMOTION_PARAMS['neutral'])
     
     @classmethod
-    def detect_emotion_from_text(cls, text: str) -> str:
+    def detect_emotion_from_text(cls, text: str, language: str = None) -> str:
         """
         Detect emotion from AI response text
-        """
-        text_lower = text.lower()
         
-        # Simple keyword-based detection
-        # In production, use sentiment analysis model
-        
-        if any(word in text_lower for word in ['happy', 'joy', 'wonderful', 'great', 'love']):
-            return 'happy'
-        elif any(word in text_lower for word in ['sad', 'sorry', 'miss', 'unfortunately']):
-            return 'sad'
-        elif any(word in text_lower for word in ['angry', 'upset', 'frustrated']):
-            return 'angry'
-        elif any(word in text_lower for word in ['wow', 'amazing', 'really', '!']):
-            return 'surprised'
-        else:
-            return 'neutral'
+        Single-pass multilingual keyword match, see ai_engine.emotion_classifier
+        """
+        return classify_emotion(text, language)
+
+
+def idle_loop_for(avatar, emotion='neutral', quality=None):
+    """
+    Storage name of the avatar's idle loop if it is ready, else None
+
+    Never renders on the request path: a missing loop is queued for
+    pre-warm and the next request finds it.
+    """
+    if not settings.AVATAR_VIDEO_ENABLED or not avatar.profile_image:
+        return None
+    try:
+        name = get_animation_service().find_idle_loop(avatar.pk, avatar.profile_image.name, emotion, quality)
+    except Exception as e:
+        print(f"Idle loop lookup failed: {e}")
+        return None
+    if name is None:
+        prewarm_idle_loops(avatar, quality, [emotion])
+    return name
+
+
+# A queued idle loop holds its pre-warm lock at most this long (seconds)
+IDLE_PREWARM_LOCK_TIMEOUT = 300
+
+
+def _idle_prewarm_lock_key(avatar_id, image_name, emotion, quality):
+    return make_key('idle_prewarm', avatar_id, image_name, emotion, get_tier(quality).name)
+
+
+def prewarm_idle_loops(avatar, quality=None, emotions=None):
+    """
+    Queue the avatar's idle loops (every emotion by default) ahead of use
+    
+    One short job per loop on the 'batch' pool; each renders through the
+    scheduler at pre-warm priority, so chat renders are never kept
+    waiting by it. A loop already queued or rendering on any node is not
+    queued again.
+    """
+    if not settings.AVATAR_VIDEO_ENABLED or not avatar.profile_image:
+        return
+    image_name = avatar.profile_image.name
+    for emotion in emotions or EmotionMapper.EMOTION_PARAMS:
+        lock_key = _idle_prewarm_lock_key(avatar.pk, image_name, emotion, quality)
+        if get_cache('default').add(lock_key, 1, IDLE_PREWARM_LOCK_TIMEOUT):
+            run_in_pool('batch', _prewarm_idle_loop, avatar.pk, image_name, emotion, quality)
+
+
+def _prewarm_idle_loop(avatar_id, image_name, emotion, quality):
+    from avatars.models import AvatarClip
+
+    try:
+        name = get_render_scheduler().render(
+            get_animation_service().get_idle_loop,
+            avatar_id,
+            image_name,
+            emotion,
+            quality,
+            priority=PRIORITY_PREWARM
+        )
+    except RenderRejected as e:
+        print(f"Idle loop pre-warm skipped: {e}")
+        return
+    finally:
+        get_cache('default').delete(_idle_prewarm_lock_key(avatar_id, image_name, emotion, quality))
+    # The row keeps the loop from the media GC; a new photo's loop replaces it
+    AvatarClip.objects.update_or_create(
+        avatar_id=avatar_id,
+        kind='idle',
+        emotion=emotion,
+        quality=get_tier(quality).name,
+        defaults={'video_file': name}
+    )
 
 
 # Singleton instance
@@ -0,0 +1,173 @@
+"""
+Decoded audio shared across the render pipeline
+
+The TTS reply is decoded once into float32 PCM and reused by the duration
+and feature stages instead of each stage decoding the mp3 again. The PCM
+is 16 kHz mono, for inference only; muxing uses the original file.
+"""
+import hashlib
+import os
+import subprocess
+import tempfile
+import numpy as np
+from django.conf import settings
+
+
+class AudioAsset:
+    """
+    Mono float32 PCM buffer for one audio file
+
+    The decoded samples are cached as a `.npy` under MEDIA_ROOT/audio_cache
+    (never next to user media) and memory-mapped on later loads, so repeat
+    renders skip decoding entirely.
+    """
+
+    SAMPLE_RATE = 16000
+
+    def __init__(self, source_path, samples, sample_rate=SAMPLE_RATE):
+        self.source_path = str(source_path)
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self._features = {}
+
+    @classmethod
+    def load(cls, audio_path, sample_rate=SAMPLE_RATE, cache=True):
+        """
+        Load PCM for audio_path, decoding only if no fresh cache exists
+
+        cache=False decodes without reading or writing the cache (one-off
+        decodes such as voice samples).
+        """
+        audio_path = str(audio_path)
+        if not cache:
+            return cls(audio_path, cls._decode(audio_path, sample_rate), sample_rate)
+        cache_path = cls.cache_path_for(audio_path, sample_rate)
+
+        if cls._cache_is_fresh(audio_path, cache_path):
+            try:
+                samples = np.load(cache_path, mmap_mode='r')
+                return cls(audio_path, samples, sample_rate)
+            except (OSError, ValueError):
+                pass
+
+        samples = cls._decode(audio_path, sample_rate)
+        cls._write_cache(cache_path, samples)
+        return cls(audio_path, samples, sample_rate)
+
+    @staticmethod
+    def cache_path_for(audio_path, sample_rate=SAMPLE_RATE):
+        digest = hashlib.md5(os.path.abspath(str(audio_path)).encode()).hexdigest()
+        return os.path.join(str(settings.MEDIA_ROOT), 'audio_cache', f"{digest}.pcm{sample_rate // 1000}k.npy")
+
+    @staticmethod
+    def _cache_is_fresh(audio_path, cache_path):
+        try:
+            return os.path.getmtime(cache_path) >= os.path.getmtime(audio_path)
+        except OSError:
+            return False
+
+    @staticmethod
+    def _decode(audio_path, sample_rate):
+        """
+        Decode straight to mono float32 at sample_rate with ffmpeg
+
+        ffmpeg's resampler is much faster than librosa's default path;
+        librosa is only used if ffmpeg is unavailable.
+        """
+        try:
+            result = subprocess.run([
+                'ffmpeg', '-v', 'error',
+                '-i', audio_path,
+                '-f', 'f32le',
+                '-ac', '1',
+                '-ar', str(sample_rate),
+                'pipe:1'
+            ], check=True, capture_output=True)
+            return np.frombuffer(result.stdout, dtype=np.float32).copy()
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"FFmpeg decode failed, using librosa: {e}")
+            import librosa
+            audio, _ = librosa.load(audio_path, sr=sample_rate, res_type='soxr_hq')
+            return audio.astype(np.float32)
+
+    @staticmethod
+    def _write_cache(cache_path, samples):
+        tmp_path = None
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(suffix='.part', dir=os.path.dirname(cache_path))
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, samples)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"Could not cache decoded audio: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+    def num_frames(self, fps):
+        return int(self.duration * fps)
+
+    def frame_energy(self, fps):
+        """
+        Peak amplitude per video frame, computed once per fps
+        """
+        key = ('energy', fps)
+        if key not in self._features:
+            num_frames = self.num_frames(fps)
+            if num_frames == 0:
+                self._features[key] = np.zeros(0, dtype=np.float32)
+            else:
+                bounds = (np.arange(num_frames + 1) * len(self.samples)) // num_frames
+                magnitude = np.abs(np.asarray(self.samples))
+                self._features[key] = np.maximum.reduceat(magnitude, bounds[:-1])
+        return self._features[key]
+
+    def mel_spectrogram(self):
+        """
+        80-band log-mel spectrogram with Wav2Lip's parameters, shape (80, T)
+
+        16 kHz, 800-sample window, 200-sample hop (80 mel frames per second),
+        normalized to [-4, 4].
+        """
+        key = ('mel',)
+        if key not in self._features:
+            from librosa.filters import mel as mel_filters
+
+            n_fft, hop = 800, 200
+            wav = np.asarray(self.samples, dtype=np.float32)
+            # Pre-emphasis
+            wav = np.append(wav[:1], wav[1:] - 0.97 * wav[:-1])
+            padded = np.pad(wav, n_fft // 2, mode='reflect')
+            num_windows = 1 + (len(padded) - n_fft) // hop
+            windows = np.lib.stride_tricks.as_strided(
+                padded,
+                shape=(num_windows, n_fft),
+                strides=(padded.strides[0] * hop, padded.strides[0])
+            )
+            window = np.hanning(n_fft + 1)[:-1].astype(np.float32)
+            magnitude = np.abs(np.fft.rfft(windows * window, axis=1)).T
+
+            basis = mel_filters(sr=self.sample_rate, n_fft=n_fft, n_mels=80, fmin=55, fmax=7600)
+            mel_db = 20 * np.log10(np.maximum(1e-5, basis @ magnitude)) - 20
+            self._features[key] = np.clip(8 * ((mel_db + 100) / 100) - 4, -4, 4).astype(np.float32)
+        return self._features[key]
+
+    def mel_windows(self, fps, step=16):
+        """
+        One (80, step) mel window per video frame, shape (frames, 80, step)
+        """
+        key = ('mel_windows', fps, step)
+        if key not in self._features:
+            mel = self.mel_spectrogram()
+            num_frames = self.num_frames(fps)
+            if mel.shape[1] < step:
+                mel = np.pad(mel, ((0, 0), (0, step - mel.shape[1])), mode='edge')
+            last_start = mel.shape[1] - step
+            starts = np.minimum((80.0 * np.arange(num_frames) / fps).astype(int), last_start)
+            index = starts[:, None] + np.arange(step)[None, :]
+            self._features[key] = np.ascontiguousarray(mel[:, index].transpose(1, 0, 2))
+        return self._features[key]
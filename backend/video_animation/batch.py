@@ -0,0 +1,182 @@
+"""
+Batch renders for one avatar
+
+Pre-warming stock phrases or re-rendering an avatar's replies after a
+photo change is one batch rather than one render call per clip: the
+avatar image is prepared once (AvatarAnimationService.prepare_batch) and
+shared by every clip.
+
+Each clip is its own short job on the 'batch' pool (core/background.py)
+and takes its own render slot at backfill priority, so a batch never
+holds a thread or a slot for longer than one clip.
+
+Progress lives in the 'render' cache under the batch id, updated as each
+clip finishes, so any worker can answer a status request.
+"""
+import threading
+import uuid
+from core.background import run_in_pool
+from core.cache import get_cache
+from core.storage import local_path
+from ai_engine.emotion_classifier import classify as classify_emotion
+from avatars.models import AvatarClip
+from avatars.persona import get_persona
+from conversations.models import Message, touch_conversation
+from conversations.tts_service import TTSService
+from .animation_service import get_animation_service
+
+BATCH_STATUS_TIMEOUT = 86400
+
+
+def batch_cache_key(batch_id):
+    return f"render_batch_{batch_id}"
+
+
+def get_batch(batch_id):
+    return get_cache('render').get(batch_cache_key(batch_id))
+
+
+def _save(batch):
+    get_cache('render').set(batch_cache_key(batch['id']), batch, timeout=BATCH_STATUS_TIMEOUT)
+
+
+def delete_stale_clips(avatar, kinds):
+    """
+    Delete the avatar's kept clips of the given kinds, e.g. after a new photo
+
+    Clips of a batch that is still queued or running are kept: its status
+    lists them and the client is about to fetch them.
+    """
+    clips = avatar.clips.filter(kind__in=kinds)
+    active = [
+        batch_id
+        for batch_id in clips.exclude(batch_id='').values_list('batch_id', flat=True).distinct()
+        if (get_batch(batch_id) or {}).get('status') in ('queued', 'running')
+    ]
+    return clips.exclude(batch_id__in=active).delete()
+
+
+def create_batch(avatar, texts=(), message_ids=(), quality=None):
+    """
+    Record a queued batch and return it; start_batch() queues the work
+
+    texts are spoken with the avatar's voice first; message_ids are
+    avatar replies whose existing audio is rendered again and attached.
+    """
+    clips = [{'text': text, 'message': None} for text in texts]
+    clips += [{'text': None, 'message': message_id} for message_id in message_ids]
+    batch = {
+        'id': uuid.uuid4().hex,
+        'avatar': avatar.pk,
+        'quality': quality,
+        'status': 'queued',
+        'total': len(clips),
+        'done': 0,
+        'failed': 0,
+        'clips': [dict(clip, emotion=None, video=None, error=None) for clip in clips],
+    }
+    _save(batch)
+    return batch
+
+
+def start_batch(batch, avatar):
+    """
+    Queue one job per clip of the batch on the 'batch' pool
+    """
+    run = BatchRun(batch, avatar)
+    for index in range(batch['total']):
+        run_in_pool('batch', run.render_clip, index)
+    if not batch['total']:
+        batch['status'] = 'done'
+        _save(batch)
+    return run
+
+
+class BatchRun:
+    """
+    State shared by the clip jobs of one batch
+    """
+
+    def __init__(self, batch, avatar):
+        self.batch = batch
+        self.avatar = avatar
+        self._lock = threading.Lock()
+        self._face = None
+        self._persona = None
+
+    def _prepared(self):
+        # First clip job prepares the image; the rest wait for it
+        with self._lock:
+            if self._face is None:
+                self._persona = get_persona(self.avatar)
+                self._face = get_animation_service().prepare_batch(
+                    local_path(self.avatar.profile_image.name),
+                    self.batch['quality']
+                )
+            return self._face, self._persona
+
+    def render_clip(self, index):
+        clip = self.batch['clips'][index]
+        with self._lock:
+            if self.batch['status'] == 'queued':
+                self.batch['status'] = 'running'
+                _save(self.batch)
+
+        message = None
+        video_name, error = None, None
+        try:
+            face, persona = self._prepared()
+            if clip['message']:
+                message = Message.objects.filter(
+                    pk=clip['message'],
+                    conversation__avatar=self.avatar,
+                    sender_type='avatar'
+                ).first()
+                if message is None or not message.audio_response:
+                    raise ValueError("Message has no audio")
+                audio_name = message.audio_response.name
+                emotion = message.emotion_detected or 'neutral'
+            else:
+                audio_name = TTSService.generate_speech(
+                    text=clip['text'],
+                    language=persona['language'],
+                    avatar_id=persona['avatar_id']
+                )
+                if not audio_name:
+                    raise ValueError("Speech synthesis failed")
+                emotion = classify_emotion(clip['text'], persona['language'])
+            clip['emotion'] = emotion
+            video_name = get_animation_service().render_batch_clip(face, local_path(audio_name), emotion)
+
+            if message is not None:
+                message.video_file = video_name
+                message.save(update_fields=['video_file'])
+                touch_conversation(message.conversation_id)
+            else:
+                # Keeps the clip and its speech from the media GC
+                AvatarClip.objects.get_or_create(
+                    avatar=self.avatar,
+                    kind='batch',
+                    video_file=video_name,
+                    defaults={
+                        'batch_id': self.batch['id'],
+                        'text': clip['text'],
+                        'emotion': emotion,
+                        'quality': face['tier'].name,
+                        'audio_file': audio_name,
+                    }
+                )
+        except Exception as e:
+            print(f"Batch clip {index} failed: {e}")
+            error = str(e)
+
+        with self._lock:
+            clip['video'] = video_name
+            if video_name is None:
+                clip['error'] = error or 'Render failed'
+                self.batch['failed'] += 1
+            else:
+                self.batch['done'] += 1
+            if self.batch['done'] + self.batch['failed'] == self.batch['total']:
+                self.batch['status'] = 'done'
+            _save(self.batch)
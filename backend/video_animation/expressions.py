@@ -0,0 +1,178 @@
+"""
+Landmark-anchored expression warps
+
+Turns EmotionMapper parameters (mouth_curve, eye_opening, eyebrow_raise)
+into a smooth displacement field around the face landmarks. The field is
+converted to cv2.remap grids once per (avatar image, emotion, intensity
+bucket) and cached, so applying an expression to a frame is one
+vectorized remap.
+"""
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+
+class ExpressionEngine:
+    """
+    Builds and caches remap grids for facial expressions
+    """
+
+    # Intensities are rounded to this step so nearby values share a grid
+    INTENSITY_STEP = 0.25
+    MAX_CACHED_GRIDS = 32
+
+    def __init__(self):
+        self._grids = OrderedDict()
+        self._landmarks = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def intensity_bucket(cls, intensity):
+        intensity = min(max(float(intensity), 0.0), 1.0)
+        return round(round(intensity / cls.INTENSITY_STEP) * cls.INTENSITY_STEP, 2)
+
+    def get_grid(self, image, image_key, params, emotion, intensity=1.0):
+        """
+        Cached (map1, map2) for cv2.remap, or None for a no-op expression
+        """
+        bucket = self.intensity_bucket(intensity)
+        key = (image_key, image.shape[:2], emotion, bucket)
+
+        with self._lock:
+            if key in self._grids:
+                self._grids.move_to_end(key)
+                return self._grids[key]
+
+        landmarks = self.get_landmarks(image, image_key) or estimate_landmarks(image)
+        grid = self._build_grid(image.shape[:2], landmarks, params, bucket)
+
+        with self._lock:
+            self._grids[key] = grid
+            while len(self._grids) > self.MAX_CACHED_GRIDS:
+                self._grids.popitem(last=False)
+        return grid
+
+    def apply(self, frame, grid):
+        if grid is None:
+            return frame
+        map1, map2 = grid
+        return cv2.remap(frame, map1, map2, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+    def get_landmarks(self, image, image_key):
+        """
+        Detected landmarks for an image (None if no face), detected once
+        """
+        key = (image_key, image.shape[:2])
+        with self._lock:
+            if key in self._landmarks:
+                return self._landmarks[key]
+
+        landmarks = detect_landmarks(image)
+
+        with self._lock:
+            self._landmarks[key] = landmarks
+            while len(self._landmarks) > self.MAX_CACHED_GRIDS:
+                self._landmarks.popitem(last=False)
+        return landmarks
+
+    def _build_grid(self, shape, landmarks, params, intensity):
+        """
+        Sum Gaussian displacements around anchor points into remap grids
+        """
+        anchors = expression_anchors(landmarks, params, intensity)
+        if not anchors:
+            return None
+
+        height, width = shape
+        ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+        dx = np.zeros((height, width), dtype=np.float32)
+        dy = np.zeros((height, width), dtype=np.float32)
+
+        for (px, py), (vx, vy), sigma in anchors:
+            weight = np.exp(-((xs - px) ** 2 + (ys - py) ** 2) / (2.0 * sigma * sigma))
+            dx += vx * weight
+            dy += vy * weight
+
+        # remap samples backwards: output pixel x reads input pixel x - d(x)
+        map1, map2 = cv2.convertMaps(xs - dx, ys - dy, cv2.CV_16SC2)
+        return map1, map2
+
+
+def detect_landmarks(image):
+    """
+    Landmark dict in face_recognition layout, or None if no face is found
+    """
+    try:
+        import face_recognition
+        found = face_recognition.face_landmarks(image[:, :, ::-1])
+        if found:
+            return {name: np.array(points, dtype=np.float32) for name, points in found[0].items()}
+    except Exception:
+        pass
+    return None
+
+
+def estimate_landmarks(image):
+    """
+    Landmark positions for a centered portrait, used when detection fails
+    """
+    h, w = image.shape[:2]
+    cx = w / 2.0
+
+    def points(*coords):
+        return np.array([(x * w, y * h) for x, y in coords], dtype=np.float32)
+
+    return {
+        'left_eyebrow': points((0.32, 0.36), (0.38, 0.34), (0.44, 0.35)),
+        'right_eyebrow': points((0.56, 0.35), (0.62, 0.34), (0.68, 0.36)),
+        'left_eye': points((0.34, 0.42), (0.38, 0.40), (0.42, 0.40), (0.46, 0.42), (0.42, 0.43), (0.38, 0.43)),
+        'right_eye': points((0.54, 0.42), (0.58, 0.40), (0.62, 0.40), (0.66, 0.42), (0.62, 0.43), (0.58, 0.43)),
+        'top_lip': points((0.40, 0.68), (cx / w, 0.66), (0.60, 0.68)),
+        'bottom_lip': points((0.60, 0.68), (cx / w, 0.71), (0.40, 0.68)),
+    }
+
+
+def expression_anchors(landmarks, params, intensity):
+    """
+    List of (point, displacement, sigma) for the given expression params
+    """
+    anchors = []
+    needed = ('left_eye', 'right_eye', 'top_lip')
+    if intensity <= 0 or not all(name in landmarks for name in needed):
+        return anchors
+
+    left_eye = landmarks['left_eye']
+    right_eye = landmarks['right_eye']
+    eye_distance = float(np.linalg.norm(right_eye.mean(axis=0) - left_eye.mean(axis=0))) or 1.0
+
+    # Smile / frown: lift or drop the mouth corners
+    mouth_curve = params.get('mouth_curve', 0.0) * intensity
+    if mouth_curve:
+        mouth = np.concatenate([landmarks['top_lip'], landmarks.get('bottom_lip', landmarks['top_lip'])])
+        left_corner = mouth[mouth[:, 0].argmin()]
+        right_corner = mouth[mouth[:, 0].argmax()]
+        lift = -mouth_curve * 0.08 * eye_distance
+        sigma = 0.18 * eye_distance
+        anchors.append((tuple(left_corner), (-abs(lift) * 0.3, lift), sigma))
+        anchors.append((tuple(right_corner), (abs(lift) * 0.3, lift), sigma))
+
+    # Wider / narrower eyes: move lids away from / towards the eye centre
+    eye_opening = (params.get('eye_opening', 1.0) - 1.0) * intensity
+    if eye_opening:
+        for eye in (left_eye, right_eye):
+            centre = eye.mean(axis=0)
+            eye_height = max(float(eye[:, 1].max() - eye[:, 1].min()), 0.04 * eye_distance)
+            shift = eye_opening * 0.6 * eye_height
+            sigma = 0.12 * eye_distance
+            anchors.append(((centre[0], eye[:, 1].min()), (0.0, -shift), sigma))
+            anchors.append(((centre[0], eye[:, 1].max()), (0.0, shift * 0.5), sigma))
+
+    # Raised / lowered eyebrows
+    eyebrow_raise = params.get('eyebrow_raise', 0.0) * intensity
+    if eyebrow_raise:
+        for name in ('left_eyebrow', 'right_eyebrow'):
+            for point in landmarks.get(name, []):
+                anchors.append((tuple(point), (0.0, -eyebrow_raise * 0.1 * eye_distance), 0.1 * eye_distance))
+
+    return anchors
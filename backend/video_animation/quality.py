@@ -0,0 +1,96 @@
+"""
+Render quality tiers and load-aware tier selection
+
+Clients ask for a tier by name; under load the tier is stepped down one
+level for each signal over its threshold:
+- renders running or queued >= RENDER_DOWNGRADE_QUEUE_DEPTH
+- p95 render time over the last RENDER_LOAD_WINDOW_SECONDS
+  > RENDER_DOWNGRADE_P95_SECONDS
+
+Once load drops, samples age out of the window and requests get their
+tier back.
+"""
+import threading
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
+import numpy as np
+from django.conf import settings
+from .scheduler import get_render_scheduler
+
+QualityTier = namedtuple('QualityTier', ['name', 'resolution', 'fps'])
+
+# Lowest first
+QUALITY_TIERS = [
+    QualityTier('low', (256, 256), 15),
+    QualityTier('medium', (384, 384), 20),
+    QualityTier('high', (512, 512), 25),
+]
+
+TIERS_BY_NAME = {tier.name: tier for tier in QUALITY_TIERS}
+
+
+def get_tier(name=None):
+    """
+    Tier by name, or the configured default for unknown / missing names
+    """
+    return TIERS_BY_NAME.get(name) or TIERS_BY_NAME[settings.RENDER_DEFAULT_QUALITY]
+
+
+class RenderLoadMonitor:
+    """
+    Renders in flight and recent render durations for this process
+    """
+
+    def __init__(self, max_samples=200):
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._samples = deque(maxlen=max_samples)  # (finished_at, seconds)
+
+    @contextmanager
+    def track(self):
+        with self._lock:
+            self._in_flight += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            finished = time.monotonic()
+            with self._lock:
+                self._in_flight -= 1
+                self._samples.append((finished, finished - started))
+
+    def queue_depth(self):
+        """Renders running or waiting for a slot (see scheduler.py)"""
+        return max(self._in_flight, get_render_scheduler().depth())
+
+    def p95(self):
+        """
+        95th percentile render time in the load window, or None
+        """
+        cutoff = time.monotonic() - settings.RENDER_LOAD_WINDOW_SECONDS
+        with self._lock:
+            durations = [seconds for finished, seconds in self._samples if finished >= cutoff]
+        if not durations:
+            return None
+        return float(np.percentile(durations, 95))
+
+    def choose_tier(self, requested=None):
+        """
+        The requested tier, stepped down once per overloaded signal
+        """
+        tier = get_tier(requested)
+        steps = 0
+        if self.queue_depth() >= settings.RENDER_DOWNGRADE_QUEUE_DEPTH:
+            steps += 1
+        p95 = self.p95()
+        if p95 is not None and p95 > settings.RENDER_DOWNGRADE_P95_SECONDS:
+            steps += 1
+        return QUALITY_TIERS[max(QUALITY_TIERS.index(tier) - steps, 0)]
+
+
+_load_monitor = RenderLoadMonitor()
+
+
+def get_load_monitor():
+    return _load_monitor
@@ -0,0 +1,64 @@
+"""
+Talking video for a chat reply
+
+send_message hands over the reply's stored speech and emotion; the render
+runs on the 'render' pool (never queued behind batch, pre-warm or summary
+jobs) and through the render scheduler at interactive priority. The
+client loops the avatar's idle clip until Message.video_file is set.
+
+Under saturation the reply degrades instead of waiting: a still video,
+or no video at all (RENDER_OVERLOAD_MODE).
+"""
+from django.conf import settings
+from core.background import run_in_pool
+from core.storage import local_path
+from conversations.models import touch_conversation
+from .animation_service import get_animation_service, idle_loop_for
+from .scheduler import PRIORITY_INTERACTIVE, RenderRejected, get_render_scheduler
+
+
+def queue_reply_video(avatar_message, avatar, audio_name, emotion, quality=None):
+    """
+    Queue the reply render; returns (idle loop to show meanwhile, queued)
+    """
+    if not settings.AVATAR_VIDEO_ENABLED or not audio_name or not avatar.profile_image:
+        return None, False
+    idle_video = idle_loop_for(avatar, emotion, quality)
+    run_in_pool('render', render_reply_video, avatar_message, avatar, audio_name, emotion, quality)
+    return idle_video, True
+
+
+def render_reply_video(avatar_message, avatar, audio_name, emotion, quality=None,
+                       priority=PRIORITY_INTERACTIVE):
+    """Render the reply video and attach it to the message"""
+    if not settings.AVATAR_VIDEO_ENABLED:
+        return
+    service = get_animation_service()
+    try:
+        image_path = local_path(avatar.profile_image.name)
+        speech_path = local_path(audio_name)
+
+        # Cache hits skip the render queue entirely
+        video_name = service.get_cached_video(image_path, speech_path, emotion, quality)
+        if video_name is None:
+            try:
+                video_name = get_render_scheduler().render(
+                    service.generate_talking_video,
+                    image_path,
+                    speech_path,
+                    emotion=emotion,
+                    quality=quality,
+                    priority=priority
+                )
+            except RenderRejected as e:
+                # Saturated: degrade instead of making everyone wait
+                print(f"Render degraded ({settings.RENDER_OVERLOAD_MODE}): {e}")
+                if settings.RENDER_OVERLOAD_MODE != 'still':
+                    return
+                video_name = service.generate_still_video(image_path, speech_path)
+
+        avatar_message.video_file = video_name
+        avatar_message.save(update_fields=['video_file'])
+        touch_conversation(avatar_message.conversation_id)
+    except Exception as e:
+        print(f"Video render failed: {e}")
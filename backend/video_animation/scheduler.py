@@ -0,0 +1,149 @@
+"""
+Render admission control
+
+Every render goes through RenderScheduler.render(): at most
+RENDER_MAX_CONCURRENT renders run at once per process (WAV2LIP_THREADS is
+sized so all workers' slots together match the core count), and waiting
+renders are admitted by priority (live chat, then pre-warm, then
+backfill), oldest first within a class.
+
+Under saturation:
+- interactive renders wait at most RENDER_QUEUE_TIMEOUT seconds, then
+  the caller degrades (still video or audio only, RENDER_OVERLOAD_MODE)
+- background renders are shed outright once RENDER_MAX_QUEUE renders
+  are waiting, and give up after RENDER_BACKGROUND_TIMEOUT
+"""
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_PREWARM = 1
+PRIORITY_BACKFILL = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: 'interactive',
+    PRIORITY_PREWARM: 'prewarm',
+    PRIORITY_BACKFILL: 'backfill',
+}
+
+
+class RenderRejected(Exception):
+    """No render slot: the queue is full or the wait timed out"""
+
+
+class RenderScheduler:
+    """
+    Bounded, priority-ordered render slots for this process
+    """
+
+    def __init__(self, max_concurrent, max_queue):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        self._running = 0
+        self._waiting = []  # heap of (priority, sequence)
+        self._sequence = itertools.count()
+        self._counters = {
+            name: {'admitted': 0, 'rejected': 0}
+            for name in PRIORITY_NAMES.values()
+        }
+
+    def running(self):
+        return self._running
+
+    def waiting(self):
+        return len(self._waiting)
+
+    def depth(self):
+        """Renders running plus waiting"""
+        with self._cond:
+            return self._running + len(self._waiting)
+
+    def _acquire(self, priority, timeout):
+        name = PRIORITY_NAMES[priority]
+        with self._cond:
+            # Background work is shed first; live chat may always queue
+            if priority != PRIORITY_INTERACTIVE and len(self._waiting) >= self.max_queue:
+                self._counters[name]['rejected'] += 1
+                raise RenderRejected(f"Render queue full ({len(self._waiting)} waiting)")
+
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiting, ticket)
+            deadline = time.monotonic() + timeout
+            while self._running >= self.max_concurrent or self._waiting[0] != ticket:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._counters[name]['rejected'] += 1
+                    # The head may have changed
+                    self._cond.notify_all()
+                    raise RenderRejected(f"No render slot within {timeout:.1f}s")
+                self._cond.wait(remaining)
+
+            heapq.heappop(self._waiting)
+            self._running += 1
+            self._counters[name]['admitted'] += 1
+            self._cond.notify_all()
+
+    def _release(self):
+        with self._cond:
+            self._running -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority=PRIORITY_INTERACTIVE, timeout=None):
+        """
+        Hold one render slot; raises RenderRejected if none is granted
+        """
+        if timeout is None:
+            timeout = (
+                settings.RENDER_QUEUE_TIMEOUT if priority == PRIORITY_INTERACTIVE
+                else settings.RENDER_BACKGROUND_TIMEOUT
+            )
+        self._acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def render(self, func, *args, priority=PRIORITY_INTERACTIVE, timeout=None, **kwargs):
+        """
+        Run func(*args, **kwargs) in a render slot
+        """
+        with self.slot(priority, timeout):
+            return func(*args, **kwargs)
+
+    def metrics(self):
+        with self._cond:
+            waiting = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _ in self._waiting:
+                waiting[PRIORITY_NAMES[priority]] += 1
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'running': self._running,
+                'waiting': waiting,
+                'queue_depth': self._running + len(self._waiting),
+                'counters': {name: dict(counts) for name, counts in self._counters.items()},
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_render_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RenderScheduler(
+                    settings.RENDER_MAX_CONCURRENT,
+                    settings.RENDER_MAX_QUEUE
+                )
+    return _scheduler
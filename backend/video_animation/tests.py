@@ -0,0 +1,201 @@
+import threading
+import time
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from avatars.models import Avatar, AvatarClip
+from core import throttling
+from conversations.models import Conversation, Message
+from . import batch, reply_video
+from .quality import get_tier
+from .scheduler import (
+    PRIORITY_BACKFILL, PRIORITY_INTERACTIVE, PRIORITY_PREWARM,
+    RenderRejected, RenderScheduler
+)
+
+
+class RenderSchedulerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.scheduler = RenderScheduler(max_concurrent=1, max_queue=3)
+        self.order = []
+        self.threads = []
+
+    def tearDown(self):
+        for thread in self.threads:
+            thread.join(timeout=5)
+
+    def queue(self, label, priority):
+        """Start a render that records its label, once it is waiting"""
+        waiting = self.scheduler.waiting()
+        thread = threading.Thread(
+            target=self.scheduler.render,
+            args=(self.order.append, label),
+            kwargs={'priority': priority, 'timeout': 5}
+        )
+        thread.start()
+        self.threads.append(thread)
+        self.wait_for(lambda: self.scheduler.waiting() == waiting + 1)
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail("Timed out waiting for the scheduler")
+            time.sleep(0.005)
+
+    def test_waiting_renders_run_by_priority_then_age(self):
+        with self.scheduler.slot(PRIORITY_INTERACTIVE):
+            self.queue('backfill-1', PRIORITY_BACKFILL)
+            self.queue('prewarm-1', PRIORITY_PREWARM)
+            self.queue('backfill-2', PRIORITY_BACKFILL)
+            self.queue('interactive-1', PRIORITY_INTERACTIVE)
+            self.queue('interactive-2', PRIORITY_INTERACTIVE)
+        self.wait_for(lambda: len(self.order) == 5)
+        self.assertEqual(
+            self.order,
+            ['interactive-1', 'interactive-2', 'prewarm-1', 'backfill-1', 'backfill-2']
+        )
+
+    def test_background_renders_are_shed_when_queue_is_full(self):
+        with self.scheduler.slot(PRIORITY_INTERACTIVE):
+            for i in range(3):
+                self.queue(f'backfill-{i}', PRIORITY_BACKFILL)
+            with self.assertRaises(RenderRejected):
+                self.scheduler.render(self.order.append, 'shed', priority=PRIORITY_PREWARM, timeout=5)
+            # Live chat may still queue behind a full background queue
+            self.queue('interactive', PRIORITY_INTERACTIVE)
+        self.wait_for(lambda: len(self.order) == 4)
+        self.assertEqual(self.order[0], 'interactive')
+        self.assertNotIn('shed', self.order)
+        self.assertEqual(self.scheduler.metrics()['counters']['prewarm']['rejected'], 1)
+
+    def test_interactive_wait_times_out(self):
+        with self.scheduler.slot(PRIORITY_INTERACTIVE):
+            with self.assertRaises(RenderRejected):
+                self.scheduler.render(self.order.append, 'late', timeout=0.05)
+        self.assertEqual(self.scheduler.waiting(), 0)
+        self.assertEqual(self.order, [])
+
+    def test_timed_out_head_does_not_block_the_queue(self):
+        with self.scheduler.slot(PRIORITY_INTERACTIVE):
+            self.queue('backfill', PRIORITY_BACKFILL)
+            with self.assertRaises(RenderRejected):
+                self.scheduler.render(self.order.append, 'late', timeout=0.05)
+        self.wait_for(lambda: self.order == ['backfill'])
+        self.assertEqual(self.scheduler.running(), 0)
+
+
+@override_settings(AVATAR_VIDEO_ENABLED=True, RENDER_OVERLOAD_MODE='still')
+class ReplyVideoTests(TestCase):
+
+    def setUp(self):
+        user = get_user_model().objects.create_user('viewer', 'viewer@example.com', 'pw')
+        self.avatar = Avatar.objects.create(user=user, name='Ma', profile_image='avatars/profiles/face.png')
+        conversation = Conversation.objects.create(user=user, avatar=self.avatar)
+        self.message = Message.objects.create(
+            conversation=conversation, sender_type='avatar', text_content='Khush raho', emotion_detected='happy'
+        )
+        self.service = mock.Mock()
+        self.service.get_cached_video.return_value = None
+        self.scheduler = mock.Mock()
+        for target, value in (
+            ('get_animation_service', self.service),
+            ('get_render_scheduler', self.scheduler),
+            ('local_path', None),
+        ):
+            patcher = mock.patch.object(reply_video, target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def render(self):
+        reply_video.render_reply_video(self.message, self.avatar, 'audio/responses/r.mp3', 'happy')
+        self.message.refresh_from_db()
+
+    def test_renders_at_interactive_priority_with_stored_emotion(self):
+        self.scheduler.render.return_value = 'generated_videos/reply.mp4'
+        self.render()
+        self.assertEqual(self.message.video_file.name, 'generated_videos/reply.mp4')
+        kwargs = self.scheduler.render.call_args.kwargs
+        self.assertEqual((kwargs['emotion'], kwargs['priority']), ('happy', PRIORITY_INTERACTIVE))
+
+    def test_saturated_render_degrades_to_still(self):
+        self.scheduler.render.side_effect = RenderRejected('busy')
+        self.service.generate_still_video.return_value = 'generated_videos/still.mp4'
+        self.render()
+        self.assertEqual(self.message.video_file.name, 'generated_videos/still.mp4')
+
+    @override_settings(AVATAR_VIDEO_ENABLED=False)
+    def test_nothing_is_queued_when_disabled(self):
+        with mock.patch.object(reply_video, 'run_in_pool') as run_in_pool:
+            result = reply_video.queue_reply_video(self.message, self.avatar, 'audio/responses/r.mp3', 'happy')
+        self.assertEqual(result, (None, False))
+        run_in_pool.assert_not_called()
+
+
+class BatchRenderTests(TestCase):
+
+    def setUp(self):
+        throttling._buckets = None
+        self.user = get_user_model().objects.create_user('batcher', 'batcher@example.com', 'pw')
+        self.avatar = Avatar.objects.create(user=self.user, name='Ma', profile_image='avatars/profiles/face.png')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.service = mock.Mock()
+        self.service.prepare_batch.return_value = {'tier': get_tier(None)}
+        self.service.render_batch_clip.side_effect = ['generated_videos/one.mp4', RuntimeError('no face')]
+        self.run_in_pool = self.patch(batch, 'run_in_pool')
+        self.patch(batch, 'get_animation_service', return_value=self.service)
+        self.patch(batch, 'classify_emotion', return_value='happy')
+        self.patch(batch.TTSService, 'generate_speech', return_value='audio_responses/speech.mp3')
+
+    def patch(self, target, name, **kwargs):
+        patcher = mock.patch.object(target, name, **kwargs)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def url(self, batch_id=''):
+        suffix = f'{batch_id}/' if batch_id else ''
+        return f'/api/avatars/{self.avatar.pk}/renders/{suffix}'
+
+    def start(self, texts):
+        response = self.client.post(self.url(), {'texts': texts}, format='json')
+        self.assertEqual(response.status_code, 202)
+        return response.data['id']
+
+    def run_jobs(self):
+        for call in self.run_in_pool.call_args_list:
+            pool, job, *args = call.args
+            self.assertEqual(pool, 'batch')
+            job(*args)
+
+    def test_status_counts_finished_and_failed_clips(self):
+        batch_id = self.start(['namaste', 'khush raho'])
+        self.assertEqual(self.run_in_pool.call_count, 2)
+        data = self.client.get(self.url(batch_id)).data
+        self.assertEqual((data['status'], data['total'], data['done']), ('queued', 2, 0))
+
+        self.run_jobs()
+        data = self.client.get(self.url(batch_id)).data
+        self.assertEqual((data['status'], data['done'], data['failed']), ('done', 1, 1))
+        self.assertIn('generated_videos/one.mp4', data['clips'][0]['video'])
+        self.assertEqual(data['clips'][1]['error'], 'no face')
+        # The image is prepared once for the whole batch
+        self.service.prepare_batch.assert_called_once()
+        clip = AvatarClip.objects.get(avatar=self.avatar)
+        self.assertEqual((clip.kind, clip.batch_id, clip.emotion), ('batch', batch_id, 'happy'))
+
+    def test_empty_batch_is_done(self):
+        created = batch.create_batch(self.avatar)
+        batch.start_batch(created, self.avatar)
+        self.run_in_pool.assert_not_called()
+        data = self.client.get(self.url(created['id'])).data
+        self.assertEqual((data['status'], data['total']), ('done', 0))
+
+    def test_other_avatars_batch_is_404(self):
+        other = Avatar.objects.create(user=self.user, name='Pa', profile_image='avatars/profiles/pa.png')
+        batch_id = batch.create_batch(other, ['namaste'])['id']
+        self.assertEqual(self.client.get(self.url(batch_id)).status_code, 404)
+        self.assertEqual(self.client.get(self.url('0' * 32)).status_code, 404)
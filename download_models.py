@@ -1,29 +1,47 @@
 #!/usr/bin/env python3
 """
 Download pre-trained models for avatar animation
+
+Artifacts, sources and checksums are defined in
+backend/ai_engine/model_registry.py. Use --from-dir to install from a
+local directory with no network access.
 """
+import argparse
 import os
-import urllib.request
-
-MODELS = {
-    'wav2lip': 'https://github.com/Rudrabha/Wav2Lip/releases/download/models/wav2lip_gan.pth',
-    # Add more model URLs as needed
-}
-
-def download_models():
-    os.makedirs('models', exist_ok=True)
-    
-    for name, url in MODELS.items():
-        print(f"Downloading {name}...")
-        filepath = f"models/{name}.pth"
-        if os.path.exists(filepath):
-            print(f"  {name} already exists, skipping...")
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from ai_engine.model_registry import ARTIFACTS, ModelRegistry, ModelIntegrityError  # noqa: E402
+
+
+def download_models(models_dir, source_dir=None, export_onnx=False):
+    registry = ModelRegistry(models_dir)
+
+    for name, spec in ARTIFACTS.items():
+        if not spec.get('url') and source_dir is None:
             continue
+        print(f"Fetching {name}...")
+        try:
+            checksum = registry.fetch(name, source_dir=source_dir)
+            print(f"  ✓ {name} ok (sha256 {checksum[:12]})")
+        except (OSError, ModelIntegrityError) as e:
+            print(f"  ✗ {name} failed (will use fallback): {e}")
+
+    if export_onnx and not registry.exists('wav2lip_gan_onnx'):
+        print("Exporting wav2lip_gan to ONNX...")
         try:
-            urllib.request.urlretrieve(url, filepath)
-            print(f"  ✓ {name} downloaded")
-        except:
-            print(f"  ✗ {name} download failed (will use fallback)")
+            checksum = registry.export_wav2lip_onnx()
+            print(f"  ✓ wav2lip_gan_onnx ok (sha256 {checksum[:12]})")
+        except Exception as e:
+            print(f"  ✗ ONNX export failed: {e}")
+
 
 if __name__ == '__main__':
-    download_models()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--models-dir', default=os.environ.get('MODELS_DIR', os.path.join(BACKEND_DIR, 'models')))
+    parser.add_argument('--from-dir', help='install artifacts from this local directory (no network)')
+    parser.add_argument('--export-onnx', action='store_true', help='export the ONNX model after download')
+    args = parser.parse_args()
+    download_models(args.models_dir, source_dir=args.from_dir, export_onnx=args.export_onnx)
@@ -3,6 +3,10 @@ import { useParams, useNavigate } from 'react-router-dom';
 import axios from 'axios';
 
 const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000/api';
+const API_ORIGIN = API_URL.replace(/\/api\/?$/, '');
+
+// Media URLs come signed from the API (absolute, or relative to the API host)
+const mediaUrl = (url) => (/^https?:\/\//.test(url) ? url : `${API_ORIGIN}${url.startsWith('/') ? '' : '/media/'}${url}`);
 
 export default function Chat() {
     const { avatarId } = useParams();
@@ -110,7 +114,7 @@ export default function Chat() {
                             {/* Audio Player - NEW */}
                             {m.audio_response && (
                                 <div style={s.audioPlayer}>
-                                    <audio controls style={s.audioControl} src={`http://localhost:8000/media/${m.audio_response}`}>
+                                    <audio controls style={s.audioControl} src={mediaUrl(m.audio_response)}>
                                         Your browser does not support audio.
                                     </audio>
                                 </div>